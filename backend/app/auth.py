@@ -1,23 +1,49 @@
+import asyncio
+import hashlib
+import time
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+from .lru import LRUCache
 
 SECRET_KEY = os.getenv("SECRET_KEY", "a_very_secret_key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", "300"))
+# bcrypt hash of the demo user's password; hashed from "test" at startup when unset
+DEMO_PASSWORD_HASH = os.getenv("DEMO_PASSWORD_HASH")
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Verified claims by sha256 of the token, so the tokens themselves are not kept around
+_claims_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+_password_hashes: dict[str, str] = {}
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+async def load_password_hashes():
+    """Hashes are computed (or read from DEMO_PASSWORD_HASH) once, not per login."""
+    if not _password_hashes:
+        _password_hashes["test"] = DEMO_PASSWORD_HASH or await asyncio.to_thread(get_password_hash, "test")
+
+async def authenticate_user(username: str, password: str) -> bool:
+    # In a real app, you'd look the hash up in the DB
+    await load_password_hashes()
+    hashed_password = _password_hashes.get(username)
+    if hashed_password is None:
+        return False
+    # bcrypt is deliberately slow; keep it off the event loop
+    return await asyncio.to_thread(verify_password, password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -28,6 +54,19 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def decode_token(token: str) -> dict:
+    """jwt.decode with verified claims cached until TOKEN_CACHE_TTL or the token's exp, whichever is first."""
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _claims_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        ttl = TOKEN_CACHE_TTL
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        if ttl > 0:
+            _claims_cache.set(key, payload, ttl=ttl)
+    return payload
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,7 +74,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
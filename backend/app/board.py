@@ -0,0 +1,108 @@
+"""
+Materialized Kanban board kept in Redis by the code that changes leads.
+
+Every insert, enrichment and stage change is written through to:
+  board:lead                 hash lead id -> card JSON (every Lead column except the body and content hash)
+  board:<order>:<stage>      sorted set of lead ids per stage, by score or created_at
+  board:<order>              the same across all stages
+so a page of the board is a ZREVRANK, a ZREVRANGE and an HMGET regardless of
+table size, and never waits for a cache to expire. `board:ready` is set once
+a full rebuild has loaded every lead; until then reads go to Postgres.
+
+Writers only queue commands, so the same helpers work on sync and asyncio
+pipelines.
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable
+
+import orjson
+
+BOARD_PREFIX = "board"
+ORDERS = ("score", "created_at")
+CARD_EXCLUDED = ("body", "content_hash")
+
+
+def member(lead_id: int) -> str:
+    # Zero-padded so equal sort values fall back to lead id order, like the SQL query
+    return f"{lead_id:012d}"
+
+
+def sort_value(card: dict, order: str) -> float:
+    if order == "score":
+        return card["score"] or 0.0
+    created_at = card["created_at"]
+    if not created_at:
+        return 0.0
+    return datetime.fromisoformat(created_at).replace(tzinfo=timezone.utc).timestamp()
+
+
+def card_from_lead(lead) -> dict:
+    """Card for a Lead row, or for a dict of Lead column values including its id."""
+    values = lead if isinstance(lead, dict) else {c.key: getattr(lead, c.key) for c in lead.__table__.columns}
+    card = {k: v for k, v in values.items() if k not in CARD_EXCLUDED}
+    if isinstance(card.get("created_at"), datetime):
+        card["created_at"] = card["created_at"].isoformat()
+    return card
+
+
+class LeadBoard:
+    def __init__(self, prefix: str = BOARD_PREFIX):
+        self.prefix = prefix
+
+    def _set(self, order: str, stage: str | None) -> str:
+        return f"{self.prefix}:{order}:{stage}" if stage else f"{self.prefix}:{order}"
+
+    def write(self, pipe, card: dict, old_stage: str | None = None):
+        """Queues the upsert of one card; `old_stage` removes it from the column it left."""
+        lead_id = card["id"]
+        pipe.hset(f"{self.prefix}:lead", lead_id, orjson.dumps(card))
+        for order in ORDERS:
+            value = sort_value(card, order)
+            pipe.zadd(self._set(order, card["stage"]), {member(lead_id): value})
+            pipe.zadd(self._set(order, None), {member(lead_id): value})
+            if old_stage and old_stage != card["stage"]:
+                pipe.zrem(self._set(order, old_stage), member(lead_id))
+
+    def rebuild(self, client, cards: Iterable[dict], chunk_size: int = 1000) -> int:
+        """Reloads the whole board from `cards`, e.g. every lead streamed from the table."""
+        client.delete(f"{self.prefix}:ready")
+        keys = list(client.scan_iter(match=f"{self.prefix}:*", count=1000))
+        if keys:
+            client.delete(*keys)
+        count = 0
+        pipe = client.pipeline(transaction=False)
+        for card in cards:
+            self.write(pipe, card)
+            count += 1
+            if count % chunk_size == 0:
+                pipe.execute()
+        pipe.set(f"{self.prefix}:ready", 1)
+        pipe.execute()
+        return count
+
+    async def read_page(self, client, stage: str | None, order: str, first: int,
+                        after_id: int | None = None) -> list[dict] | None:
+        """
+        Up to first + 1 cards after `after_id`, highest first, or None when the
+        board cannot answer (not built yet, or the cursor's lead left the column).
+        """
+        key = self._set(order, stage)
+        pipe = client.pipeline(transaction=False)
+        pipe.exists(f"{self.prefix}:ready")
+        if after_id is not None:
+            pipe.zrevrank(key, member(after_id))
+        ready, *rank = await pipe.execute()
+        if not ready or (rank and rank[0] is None):
+            return None
+        start = rank[0] + 1 if rank else 0
+        members = await client.zrevrange(key, start, start + first)
+        if not members:
+            return []
+        cards = await client.hmget(f"{self.prefix}:lead", [int(m) for m in members])
+        if any(card is None for card in cards):
+            return None
+        return [orjson.loads(card) for card in cards]
+
+
+lead_board = LeadBoard()
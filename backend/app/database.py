@@ -1,9 +1,35 @@
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 
 DB_URL = os.getenv("DATABASE_URL", "postgresql+psycopg://postgres:pass@db:5432/inbound")
+# psycopg 3 serves both engines from the same URL; override to use e.g. asyncpg
+ASYNC_DB_URL = os.getenv("ASYNC_DATABASE_URL", DB_URL)
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Sync engine for Celery workers and scripts
 engine = create_engine(DB_URL, pool_pre_ping=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+# Async engine for the FastAPI/GraphQL path, so queries never block the event loop
+async_engine = create_async_engine(
+    ASYNC_DB_URL,
+    pool_pre_ping=True,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+async def get_async_session():
+    """FastAPI dependency yielding a session that is closed even if the request fails."""
+    async with AsyncSessionLocal() as session:
+        yield session
+
+async_session = asynccontextmanager(get_async_session)
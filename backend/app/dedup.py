@@ -0,0 +1,213 @@
+"""
+Near-duplicate lookup for inbound e-mails.
+
+Replaces the full-table fuzzy scan in the worker with a Redis-backed index:
+leads are blocked by their sender address, its local part and its domain
+(so a typo on either side of the @ still lands in a shared block) and
+bucketed by MinHash/LSH signatures of their subject. Only the candidates found
+in those buckets are checked with the original fuzz.ratio thresholds, so the
+duplicate decision itself is unchanged while lookup cost no longer grows with
+the table. Sender blocks keep only the most recent leads, so a high-volume
+sender cannot make a lookup walk its whole history.
+"""
+
+import hashlib
+import os
+import random
+import re
+import struct
+import zlib
+from email.utils import parseaddr
+from typing import Iterable
+
+from fuzzywuzzy import fuzz
+
+SENDER_THRESHOLD = 80
+SUBJECT_THRESHOLD = 70
+
+# 32 bands of 3 rows: subjects with a trigram Jaccard similarity of 0.5
+# collide in at least one band ~99% of the time, unrelated ones (<0.1) ~3%.
+LSH_BANDS = 32
+LSH_ROWS = 3
+
+# Most recent lead ids kept per sender block
+SENDER_BLOCK_SIZE = int(os.getenv("DEDUP_SENDER_BLOCK_SIZE", "200"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x1EAD)  # Fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(LSH_BANDS * LSH_ROWS)
+]
+
+_REPLY_PREFIX = re.compile(r"^((re|fw|fwd|res|enc)\s*:\s*)+", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sender(sender: str) -> str:
+    """Blocking key for a sender: the bare, lower-cased e-mail address."""
+    _, address = parseaddr(sender or "")
+    return (address or sender or "").strip().lower()
+
+
+def sender_blocks(sender: str) -> list[str]:
+    """
+    Blocks a sender falls in: the whole address, its local part on any domain,
+    and the first and last two characters of the local part on its domain.
+    Near-identical senders differ in few characters, so they share at least one.
+    """
+    address = normalize_sender(sender)
+    local, at, domain = address.rpartition("@")
+    if not at or not local:
+        return [f"a:{address}"]
+    return list(dict.fromkeys([f"a:{address}", f"l:{local}", f"d:{domain}:^{local[:2]}", f"d:{domain}:{local[-2:]}$"]))
+
+
+def normalize_subject(subject: str) -> str:
+    subject = _WHITESPACE.sub(" ", (subject or "").lower()).strip()
+    return _REPLY_PREFIX.sub("", subject)
+
+
+def shingles(text: str, size: int = 3) -> set[str]:
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def minhash(text: str) -> list[int]:
+    hashes = [zlib.crc32(s.encode("utf-8")) for s in shingles(text)]
+    return [
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def band_keys(subject: str) -> list[str]:
+    signature = minhash(normalize_subject(subject))
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f">{LSH_ROWS}Q", *rows), digest_size=8).hexdigest()
+        keys.append(f"{band}:{digest}")
+    return keys
+
+
+def is_duplicate(sender: str, subject: str, other_sender: str, other_subject: str) -> bool:
+    # Same comparison the worker has always used
+    sender_match = fuzz.ratio(sender.lower(), other_sender.lower())
+    subject_match = fuzz.ratio(subject.lower(), other_subject.lower())
+    return sender_match > SENDER_THRESHOLD and subject_match > SUBJECT_THRESHOLD
+
+
+class DedupIndex:
+    """
+    Redis layout (all keys under `prefix`):
+      <prefix>:sender:<block>   sorted set of the newest lead ids in a sender block, scored by id
+      <prefix>:b:<band>:<hash>  set of lead ids sharing an LSH band
+      <prefix>:fp               hash lead id -> "sender\\nsubject" used for verification
+    """
+
+    def __init__(self, redis_client, prefix: str = "dedup"):
+        self.redis = redis_client
+        self.prefix = prefix
+
+    def _sender_keys(self, sender: str) -> list[str]:
+        return [f"{self.prefix}:sender:{block}" for block in sender_blocks(sender)]
+
+    def _band_keys(self, subject: str) -> list[str]:
+        return [f"{self.prefix}:b:{key}" for key in band_keys(subject)]
+
+    def _queue_lookups(self, pipe, emails: list[tuple[str, str]]) -> list[int]:
+        """Queues the block reads for each e-mail; returns how many replies each one gets."""
+        counts = []
+        for sender, subject in emails:
+            sender_keys = self._sender_keys(sender)
+            pipe.sunion(self._band_keys(subject))
+            for key in sender_keys:
+                pipe.zrange(key, 0, -1)
+            counts.append(1 + len(sender_keys))
+        return counts
+
+    @staticmethod
+    def _group(replies: list, counts: list[int]) -> list[list[int]]:
+        candidates, start = [], 0
+        for count in counts:
+            candidates.append(sorted({int(i) for reply in replies[start:start + count] for i in reply}))
+            start += count
+        return candidates
+
+    def candidates(self, sender: str, subject: str) -> list[int]:
+        pipe = self.redis.pipeline(transaction=False)
+        counts = self._queue_lookups(pipe, [(sender, subject)])
+        return self._group(pipe.execute(), counts)[0]
+
+    def find_duplicate(self, sender: str, subject: str) -> int | None:
+        """Returns the id of the oldest indexed lead this e-mail duplicates, if any."""
+        return self.find_duplicates([(sender, subject)])[0]
+
+    def find_duplicates(self, emails: list[tuple[str, str]]) -> list[int | None]:
+        """Batch variant of find_duplicate: two pipelined round-trips for any number of e-mails."""
+        if not emails:
+            return []
+        pipe = self.redis.pipeline(transaction=False)
+        counts = self._queue_lookups(pipe, emails)
+        candidates = self._group(pipe.execute(), counts)
+        ids = sorted({i for group in candidates for i in group})
+        if not ids:
+            return [None] * len(emails)
+        return self._resolve(emails, candidates, ids, self.redis.hmget(f"{self.prefix}:fp", ids))
+
+    def _resolve(self, emails: list[tuple[str, str]], candidates: list[list[int]], ids: list[int],
+                 raw_fingerprints: list) -> list[int | None]:
+        fingerprints = {}
+        for lead_id, fingerprint in zip(ids, raw_fingerprints):
+            if fingerprint is not None:
+                if isinstance(fingerprint, bytes):
+                    fingerprint = fingerprint.decode("utf-8")
+                fingerprints[lead_id] = fingerprint.partition("\n")[::2]
+        return [
+            next((i for i in group if i in fingerprints
+                  and is_duplicate(sender, subject, *fingerprints[i])), None)
+            for (sender, subject), group in zip(emails, candidates)
+        ]
+
+    def add(self, lead_id: int, sender: str, subject: str, pipe=None):
+        p = pipe if pipe is not None else self.redis.pipeline(transaction=False)
+        for key in self._band_keys(subject):
+            p.sadd(key, lead_id)
+        for key in self._sender_keys(sender):
+            p.zadd(key, {lead_id: lead_id})
+            p.zremrangebyrank(key, 0, -SENDER_BLOCK_SIZE - 1)
+        p.hset(f"{self.prefix}:fp", lead_id, f"{sender}\n{subject}")
+        if pipe is None:
+            p.execute()
+
+    def rebuild(self, leads: Iterable[tuple[int, str, str]], chunk_size: int = 1000) -> int:
+        """Indexes (id, sender, subject) rows, e.g. streamed from the leads table."""
+        count = 0
+        pipe = self.redis.pipeline(transaction=False)
+        for lead_id, sender, subject in leads:
+            self.add(lead_id, sender or "", subject or "", pipe=pipe)
+            count += 1
+            if count % chunk_size == 0:
+                pipe.execute()
+        pipe.execute()
+        return count
+
+
+class AsyncDedupIndex(DedupIndex):
+    """The same index on a redis.asyncio client; add() only queues commands, so pass it an async pipeline."""
+
+    async def find_duplicate(self, sender: str, subject: str) -> int | None:
+        return (await self.find_duplicates([(sender, subject)]))[0]
+
+    async def find_duplicates(self, emails: list[tuple[str, str]]) -> list[int | None]:
+        if not emails:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            counts = self._queue_lookups(pipe, emails)
+            candidates = self._group(await pipe.execute(), counts)
+        ids = sorted({i for group in candidates for i in group})
+        if not ids:
+            return [None] * len(emails)
+        return self._resolve(emails, candidates, ids, await self.redis.hmget(f"{self.prefix}:fp", ids))
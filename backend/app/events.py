@@ -0,0 +1,45 @@
+"""
+Lead update events on the lead_updates Redis Stream.
+
+Events are compact deltas: the lead id, its version and only the fields that
+changed. E-mail bodies are never included; clients fetch them from
+GET /leads/{id}/body when they need one. Events are serialized with orjson and
+stored gzip-compressed when larger than LEAD_EVENT_GZIP_THRESHOLD bytes (big
+entity dicts); SSE clients always receive plain JSON. A client applies an
+event only if its version is newer than the copy it holds.
+"""
+
+import gzip
+import os
+
+import orjson
+
+# Lead updates go through a capped Redis Stream rather than Pub/Sub, so SSE
+# clients can resume from their Last-Event-ID after a reconnect.
+LEAD_UPDATES_STREAM = "lead_updates"
+LEAD_UPDATES_MAXLEN = int(os.getenv("LEAD_UPDATES_MAXLEN", "1000"))
+LEAD_EVENT_GZIP_THRESHOLD = int(os.getenv("LEAD_EVENT_GZIP_THRESHOLD", "1024"))
+
+def lead_event(lead_id: int, version: int, **changes) -> dict:
+    return {"id": lead_id, "version": version, **{k: v for k, v in changes.items() if k != "body"}}
+
+def card_event(card: dict) -> dict:
+    """Event for a newly stored lead: every card field, at its current version."""
+    fields = {k: v for k, v in card.items() if k not in ("id", "version")}
+    return lead_event(card["id"], card.get("version") or 1, **fields)
+
+def encode_event(event: dict) -> dict[str, bytes]:
+    data = orjson.dumps(event)
+    if len(data) > LEAD_EVENT_GZIP_THRESHOLD:
+        return {"gz": gzip.compress(data, compresslevel=5, mtime=0)}
+    return {"data": data}
+
+def decode_event(fields: dict) -> str:
+    """JSON text of a stream entry, whether the client decodes responses or not."""
+    compressed = fields.get(b"gz", fields.get("gz"))
+    data = gzip.decompress(compressed) if compressed is not None else fields.get(b"data", fields.get("data"))
+    return data.decode() if isinstance(data, bytes) else data
+
+def publish_lead_update(client, event: dict):
+    """Appends one event; `client` may be a Redis client or a pipeline."""
+    return client.xadd(LEAD_UPDATES_STREAM, encode_event(event), maxlen=LEAD_UPDATES_MAXLEN, approximate=True)
@@ -1,40 +1,220 @@
+import base64
+import json
+import time
+from datetime import datetime
+from enum import Enum
+
+import redis.asyncio as redis
 import strawberry
-from fastapi import Depends
-from .schemas import LeadOut
-from .database import SessionLocal
+from sqlalchemy import select, tuple_
+from strawberry.scalars import JSON
+from strawberry.types import Info
+from strawberry.types.nodes import SelectedField
+from .database import async_session
 from .models import Lead
 from .auth import get_current_user
-from aiocache import cached, Cache
+from .board import card_from_lead, lead_board
+from .events import lead_event, publish_lead_update
+from .logging_config import get_logger
+from .redis_pool import async_pipeline, get_async_redis
+from aiocache import caches
+
+logger = get_logger(__name__)
+
+LEADS_CACHE_TTL = 60
+MAX_PAGE_SIZE = 200
+
+@strawberry.type(name="Lead")
+class LeadNode:
+    id: int
+    email_id: str | None = None
+    sender: str | None = None
+    subject: str | None = None
+    body: str | None = None
+    score: float | None = None
+    stage: str | None = None
+    source: str | None = None
+    intent: str | None = None
+    entities: JSON | None = None
+    created_at: datetime | None = None
+    version: int | None = None
+    score_model: str | None = None
+    score_prompt_version: str | None = None
+
+@strawberry.type
+class LeadEdge:
+    cursor: str
+    node: LeadNode
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: str | None
+
+@strawberry.type
+class LeadConnection:
+    edges: list[LeadEdge]
+    page_info: PageInfo
+
+@strawberry.enum
+class LeadOrder(Enum):
+    SCORE = "score"
+    CREATED_AT = "created_at"
+
+# GraphQL field name -> column, for projecting only what the client selected
+LEAD_COLUMNS = {
+    "emailId": Lead.email_id,
+    "sender": Lead.sender,
+    "subject": Lead.subject,
+    "body": Lead.body,
+    "score": Lead.score,
+    "stage": Lead.stage,
+    "source": Lead.source,
+    "intent": Lead.intent,
+    "entities": Lead.entities,
+    "createdAt": Lead.created_at,
+    "version": Lead.version,
+    "scoreModel": Lead.score_model,
+    "scorePromptVersion": Lead.score_prompt_version,
+}
+
+async def _current_user(info: Info) -> dict:
+    scheme, _, token = info.context["request"].headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise PermissionError("Not authenticated")
+    return await get_current_user(token)
+
+def _fields(selections) -> list[SelectedField]:
+    """The fields in `selections`, with named and inline fragments expanded."""
+    fields = []
+    for selection in selections:
+        if isinstance(selection, SelectedField):
+            fields.append(selection)
+        else:
+            fields.extend(_fields(selection.selections))
+    return fields
+
+def _selected_node_fields(info: Info) -> list[str]:
+    fields = set()
+    for connection_field in info.selected_fields:
+        for edge_field in _fields(connection_field.selections):
+            if edge_field.name != "edges":
+                continue
+            for node_field in _fields(edge_field.selections):
+                if node_field.name == "node":
+                    fields.update(f.name for f in _fields(node_field.selections) if f.name in LEAD_COLUMNS)
+    return sorted(fields)
+
+def encode_cursor(value, lead_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, lead_id]).encode()).decode()
+
+def decode_cursor(cursor: str, order_by: LeadOrder) -> tuple:
+    value, lead_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if order_by is LeadOrder.CREATED_AT:
+        value = datetime.fromisoformat(value)
+    return value, lead_id
+
+async def _fetch_page(stage: str | None, first: int, after: str | None, order_by: LeadOrder, fields: list[str]) -> dict:
+    sort_column = Lead.score if order_by is LeadOrder.SCORE else Lead.created_at
+    columns = [Lead.id, sort_column.label("sort_key")] + [LEAD_COLUMNS[f] for f in fields]
+    q = select(*columns)
+    if stage:
+        q = q.where(Lead.stage == stage)
+    if after:
+        q = q.where(tuple_(sort_column, Lead.id) < decode_cursor(after, order_by))
+    # Fetch one extra row to learn whether another page exists
+    q = q.order_by(sort_column.desc(), Lead.id.desc()).limit(first + 1)
+    async with async_session() as db:
+        rows = (await db.execute(q)).all()
+    edges = []
+    for row in rows[:first]:
+        node = {f: getattr(row, LEAD_COLUMNS[f].key) for f in fields}
+        if "createdAt" in node and node["createdAt"] is not None:
+            node["createdAt"] = node["createdAt"].isoformat()
+        edges.append({"cursor": encode_cursor(row.sort_key, row.id), "id": row.id, "node": node})
+    return {"edges": edges, "has_next_page": len(rows) > first}
+
+async def _board_page(stage: str | None, first: int, after: str | None, order_by: LeadOrder, fields: list[str]) -> dict | None:
+    """Same page as _fetch_page, served from the Redis board; None if it cannot answer."""
+    if "body" in fields:
+        return None  # Bodies are not kept on the board
+    after_id = decode_cursor(after, order_by)[1] if after else None
+    cards = await lead_board.read_page(get_async_redis(), stage, order_by.value, first, after_id)
+    if cards is None:
+        return None
+    edges = []
+    for card in cards[:first]:
+        node = {f: card.get(LEAD_COLUMNS[f].key) for f in fields}
+        edges.append({"cursor": encode_cursor(card[order_by.value], card["id"]), "id": card["id"], "node": node})
+    return {"edges": edges, "has_next_page": len(cards) > first}
+
+def _to_connection(page: dict) -> LeadConnection:
+    edges = []
+    for edge in page["edges"]:
+        node = dict(edge["node"])
+        if node.get("createdAt"):
+            node["createdAt"] = datetime.fromisoformat(node["createdAt"])
+        kwargs = {LEAD_COLUMNS[f].key: v for f, v in node.items()}
+        edges.append(LeadEdge(cursor=edge["cursor"], node=LeadNode(id=edge["id"], **kwargs)))
+    end_cursor = edges[-1].cursor if edges else None
+    return LeadConnection(edges=edges, page_info=PageInfo(has_next_page=page["has_next_page"], end_cursor=end_cursor))
+
+def _generation_key(stage: str | None) -> str:
+    return f"leads:gen:{stage or 'all'}"
 
 @strawberry.type
 class Query:
     @strawberry.field
-    @cached(ttl=60, cache=Cache.REDIS, key_builder=lambda f, *args, **kwargs: f"leads:{kwargs.get('stage', 'all')}") # Cache for 60 seconds
-    async def leads(self, stage: str | None = None, current_user: dict = Depends(get_current_user)) -> list[LeadOut]:
-        db = SessionLocal()
-        q = db.query(Lead)
-        if stage:
-            q = q.filter(Lead.stage == stage)
-        leads = q.all()
-        return [LeadOut.from_orm(lead_item) for lead_item in leads]
+    async def leads(self, info: Info, stage: str | None = None, first: int = 50, after: str | None = None,
+                    order_by: LeadOrder = LeadOrder.CREATED_AT) -> LeadConnection:
+        await _current_user(info)
+        first = max(1, min(first, MAX_PAGE_SIZE))
+        fields = _selected_node_fields(info)
+        try:
+            page = await _board_page(stage, first, after, order_by, fields)
+        except redis.RedisError:
+            logger.warning("Lead board read failed, falling back to the database", exc_info=True)
+            page = None
+        if page is not None:
+            return _to_connection(page)
+        cache = caches.get("default")
+        generation = await cache.get(_generation_key(stage)) or 0
+        # One entry per page; bumping the stage generation retires all of them at once
+        key = f"leads:{stage or 'all'}:{generation}:{order_by.value}:{first}:{after or ''}:{','.join(fields)}"
+        page = await cache.get(key)
+        if page is None:
+            page = await _fetch_page(stage, first, after, order_by, fields)
+            await cache.set(key, page, ttl=LEADS_CACHE_TTL)
+        return _to_connection(page)
 
 @strawberry.type
 class Mutation:
     @strawberry.mutation
-    async def update_lead_stage(self, lead_id: int, new_stage: str, current_user: dict = Depends(get_current_user)) -> LeadOut:
-        db = SessionLocal()
-        lead = db.query(Lead).filter(Lead.id == lead_id).first()
-        if lead:
+    async def update_lead_stage(self, info: Info, lead_id: int, new_stage: str) -> LeadNode:
+        await _current_user(info)
+        async with async_session() as db:
+            lead = await db.get(Lead, lead_id)
+            if not lead:
+                raise Exception(f"Lead with id {lead_id} not found")
             old_stage = lead.stage # Capture old stage before update
             lead.stage = new_stage
-            db.commit()
-            db.refresh(lead)
-            updated_lead = LeadOut.from_orm(lead)
-            # Invalidate cache for leads query
-            await Cache.get_by_name("default").delete_many([f"leads:{old_stage}", f"leads:{new_stage}", "leads:all"])
-            db.close()
-            return updated_lead
-        db.close()
-        raise Exception(f"Lead with id {lead_id} not found")
+            await db.commit()
+            await db.refresh(lead)
+            updated_lead = LeadNode(**{c.key: getattr(lead, c.key) for c in Lead.__table__.columns
+                                       if c.key != "content_hash"})
+            card = card_from_lead(lead)
+        try:
+            async with async_pipeline(get_async_redis()) as pipe:
+                lead_board.write(pipe, card, old_stage=old_stage)
+                publish_lead_update(pipe, lead_event(lead_id, card["version"], stage=new_stage))
+        except redis.RedisError:
+            logger.error("Lead board update failed; run rebuild_lead_board", lead_id=lead_id, exc_info=True)
+        # Invalidate cached pages for leads query
+        cache = caches.get("default")
+        generation = time.time_ns()
+        await cache.multi_set([(_generation_key(stage), generation) for stage in {old_stage, new_stage, None}])
+        return updated_lead
 
 schema = strawberry.Schema(query=Query, mutation=Mutation)
@@ -1,22 +1,218 @@
+"""
+Structured JSON logging that stays off the request path.
+
+Log calls only run the cheap structlog processors (level filter, context
+variables, sampling, timestamp) and hand the event to a bounded queue; a
+background listener thread renders it with orjson and writes it out. When
+the queue is full, INFO and DEBUG events are dropped and counted, while
+warnings and errors wait up to LOG_PUT_TIMEOUT seconds for room.
+
+High-volume events can be sampled (LOG_SAMPLE_RATES, "event=rate" pairs:
+kept events carry a sample_rate field for re-weighting) and capped per
+second per process (LOG_RATE_LIMITS, "event=count" pairs). Warnings and
+errors are never sampled or capped.
+
+The queue is flushed at exit; call shutdown_logging() where atexit hooks do
+not run (Celery pool processes).
+"""
+
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+import orjson
 import structlog
 
-def configure_logging():
-    logging.basicConfig(format="%(message)s", level=logging.INFO)
+from .metrics import LOG_EVENTS_DROPPED
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_PUT_TIMEOUT = float(os.getenv("LOG_PUT_TIMEOUT", "0.1"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "Request finished=0.1")
+LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "Request finished=100")
+
+
+def parse_event_settings(value: str) -> dict[str, float]:
+    """Parses comma-separated "event=number" pairs, e.g. "Request finished=0.1"."""
+    settings = {}
+    for item in value.split(","):
+        event, _, number = item.rpartition("=")
+        if event.strip():
+            settings[event.strip()] = float(number)
+    return settings
+
+
+def _dumps(event_dict: dict, default=None) -> str:
+    return orjson.dumps(event_dict, default=default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class EventSampler:
+    """structlog processor applying per-event sample rates and per-second caps."""
+
+    def __init__(self, sample_rates: dict[str, float] | None = None, rate_limits: dict[str, float] | None = None):
+        self.sample_rates = sample_rates or {}
+        self.rate_limits = rate_limits or {}
+        self._windows: dict[str, list] = {}  # event -> [second, count]
+        self._lock = threading.Lock()
+
+    def __call__(self, logger, method_name: str, event_dict: dict) -> dict:
+        if method_name in ("warning", "error", "critical", "exception"):
+            return event_dict
+        event = event_dict.get("event")
+        rate = self.sample_rates.get(event)
+        if rate is not None and rate < 1:
+            if random.random() >= rate:
+                LOG_EVENTS_DROPPED.labels(reason="sampled").inc()
+                raise structlog.DropEvent
+            event_dict["sample_rate"] = rate
+        limit = self.rate_limits.get(event)
+        if limit is not None and not self._allow(event, limit):
+            LOG_EVENTS_DROPPED.labels(reason="rate_limited").inc()
+            raise structlog.DropEvent
+        return event_dict
+
+    def _allow(self, event: str, limit: float) -> bool:
+        second = int(time.monotonic())
+        with self._lock:
+            window = self._windows.setdefault(event, [second, 0])
+            if window[0] != second:
+                window[:] = [second, 0]
+            window[1] += 1
+            return window[1] <= limit
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room instead of failing when the queue is full at shutdown
+        self.queue.put(self._sentinel)
+
+
+class BackgroundLogHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for a listener thread that renders and writes them. Prefork
+    children start their own listener on first use; after close() records are
+    written synchronously so late shutdown logs are not lost.
+    """
+
+    def __init__(self, handlers: list[logging.Handler], max_queue: int = LOG_QUEUE_SIZE,
+                 put_timeout: float = LOG_PUT_TIMEOUT):
+        super().__init__(queue.Queue(maxsize=max_queue))
+        self.handlers = handlers
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._listener = None
+        self._closed = False
+
+    def _ensure_started(self):
+        # Prefork workers inherit the parent's handler but not its thread
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=self.max_queue)
+            self._listener = _Listener(self.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Rendering happens on the listener thread; only freeze %-style
+        # arguments of plain stdlib records, which may change after the call
+        if not isinstance(record.msg, dict) and record.args:
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record, timeout=self.put_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_EVENTS_DROPPED.labels(reason="queue_full").inc()
+
+    def emit(self, record: logging.LogRecord):
+        if self._closed:
+            for handler in self.handlers:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+            return
+        self._ensure_started()
+        super().emit(record)
+
+    def close(self):
+        """Writes everything queued so far and stops the listener thread."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._closed = True
+        for handler in self.handlers:
+            try:
+                handler.flush()
+            except (OSError, ValueError):
+                pass  # stream already closed at interpreter exit, as logging.shutdown allows
+        super().close()
+
+
+_handler: BackgroundLogHandler | None = None
+
+
+def configure_logging(stream=None):
+    global _handler
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(structlog.stdlib.ProcessorFormatter(
+        processors=[structlog.stdlib.ProcessorFormatter.remove_processors_meta, structlog.processors.JSONRenderer(_dumps)],
+        # Records from libraries that log through the stdlib directly
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.format_exc_info,
+        ],
+    ))
+    root = logging.getLogger()
+    if _handler is not None:
+        root.removeHandler(_handler)
+        _handler.close()
+    _handler = BackgroundLogHandler([output])
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
 
     structlog.configure(
         processors=[
+            structlog.stdlib.filter_by_level,
+            structlog.contextvars.merge_contextvars,
+            EventSampler(parse_event_settings(LOG_SAMPLE_RATES), parse_event_settings(LOG_RATE_LIMITS)),
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
             structlog.processors.TimeStamper(fmt="iso"),
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
-            structlog.processors.JSONRenderer()
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         logger_factory=structlog.stdlib.LoggerFactory(),
         wrapper_class=structlog.stdlib.BoundLogger,
         cache_logger_on_first_use=True,
     )
 
+
+def shutdown_logging():
+    """Flushes queued log records; safe to call more than once."""
+    if _handler is not None:
+        _handler.close()
+
+
+atexit.register(shutdown_logging)
+
 def get_logger(name):
     return structlog.get_logger(name)
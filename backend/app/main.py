@@ -1,21 +1,26 @@
 import asyncio
-import redis.asyncio as redis
+import time
 from datetime import timedelta
 from fastapi import FastAPI, Request, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import StreamingResponse, Response, RedirectResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse, Response, RedirectResponse
 from strawberry.asgi import GraphQL
 from .graphql import schema
 from . import auth
-from .observability import configure_opentelemetry
-from .database import engine
-from .metrics import get_metrics
+from .observability import configure_opentelemetry, instrument_fastapi
+from .database import async_engine, async_session
+from .models import Lead
+from sqlalchemy import select
+from .metrics import QUEUE_DEPTH, get_metrics
 from .logging_config import configure_logging, get_logger
 from .oauth2 import get_google_flow
+from .sse import LeadEventHub
+from .redis_pool import REDIS_URL, close_async_redis, get_async_redis
 import uuid
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 from aiocache import caches
+import redis.asyncio as redis
 import structlog
 
 configure_logging()
@@ -23,43 +28,54 @@ logger = get_logger(__name__)
 
 app = FastAPI(title="Inbound AI Lead Qualifier")
 
-# Configure OpenTelemetry
-configure_opentelemetry(app_name="backend", app=app, db_engine=engine)
+# Tracing itself (provider, exporter, DB and Redis instrumentation) is set up on startup
+instrument_fastapi(app)
 
-LEAD_UPDATES_CHANNEL = "lead_updates"
+lead_event_hub = LeadEventHub(REDIS_URL)
 
 @app.on_event("startup")
 async def startup():
-    redis_connection = redis.from_url("redis://redis:6379/0", encoding="utf-8", decode_responses=True)
-    await FastAPILimiter.init(redis_connection)
-    
+    configure_opentelemetry(app_name="backend", db_engine=async_engine.sync_engine)
+    await lead_event_hub.start()
+    await auth.load_password_hashes()
+    await FastAPILimiter.init(get_async_redis(decode_responses=True))
+
     caches.set_config({
         "default": {
             "cache": "aiocache.backends.redis.RedisCache",
-            "endpoint": "redis",
-            "port": 6379,
             "timeout": 1,
             "serializer": {
                 "class": "aiocache.serializers.JsonSerializer"
             }
         }
     })
+    # aiocache builds its own pool from endpoint/port; point it at the shared one instead
+    caches.get("default").client = get_async_redis()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await lead_event_hub.stop()
+    await close_async_redis()
+    await async_engine.dispose()
 
 @app.middleware("http")
 async def add_correlation_id(request: Request, call_next):
     correlation_id = request.headers.get("X-Correlation-ID") or str(uuid.uuid4())
-    with structlog.contextvars.bind_contextvars(correlation_id=correlation_id):
-        logger.info("Request started", method=request.method, url=request.url)
+    start = time.perf_counter()
+    with structlog.contextvars.bound_contextvars(correlation_id=correlation_id):
         response = await call_next(request)
         response.headers["X-Correlation-ID"] = correlation_id
-        logger.info("Request finished", status_code=response.status_code)
+        # One sampled line per request (LOG_SAMPLE_RATES); server errors are always logged
+        log = logger.warning if response.status_code >= 500 else logger.info
+        log("Request finished", method=request.method, path=request.url.path, status_code=response.status_code,
+            duration_ms=round((time.perf_counter() - start) * 1000, 1))
         return response
 
 @app.post("/token", dependencies=[Depends(RateLimiter(times=5, seconds=60))]) # 5 requests per minute
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
     # In a real app, you'd verify the user against a DB
     # This is a dummy check
-    if form_data.username != "test" or not auth.verify_password(form_data.password, auth.get_password_hash("test")):
+    if not await auth.authenticate_user(form_data.username, form_data.password):
         logger.warning("Login failed", username=form_data.username)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -94,26 +110,46 @@ async def google_callback(request: Request, code: str):
     return {"access_token": access_token, "token_type": "bearer"}
 
 async def event_stream(request: Request):
-    r = redis.Redis(host="redis", port=6379, db=0)
-    pubsub = r.pubsub()
-    await pubsub.subscribe(LEAD_UPDATES_CHANNEL)
     try:
-        while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=10)
-            if message:
-                yield f"data: {message['data'].decode('utf-8')}\n\n"
-            await asyncio.sleep(0.1)
+        async for frame in lead_event_hub.stream(request.headers.get("Last-Event-ID")):
+            yield frame
     except asyncio.CancelledError:
         logger.info("SSE client disconnected")
-        await pubsub.unsubscribe(LEAD_UPDATES_CHANNEL)
         raise
 
 @app.get("/sse/leads", dependencies=[Depends(RateLimiter(times=100, seconds=60))]) # 100 requests per minute
 async def sse_leads(request: Request, current_user: dict = Depends(auth.get_current_user)):
-    return StreamingResponse(event_stream(request), media_type="text/event-stream")
+    return StreamingResponse(event_stream(request), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/leads/{lead_id}/body")
+async def lead_body(lead_id: int, request: Request, current_user: dict = Depends(auth.get_current_user)):
+    """Body of one lead; SSE events and board cards leave it out."""
+    # A lead's body never changes once stored, so clients can keep it
+    etag = f'"lead-{lead_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=86400"}
+    if request.headers.get("If-None-Match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    async with async_session() as db:
+        body = (await db.execute(select(Lead.body).where(Lead.id == lead_id))).first()
+    if body is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Lead not found")
+    return ORJSONResponse({"id": lead_id, "body": body[0]}, headers=headers)
+
+BROKER_QUEUES = ("raw_emails.high", "raw_emails", "raw_emails.low", "celery", "enrichment")
 
 @app.get("/metrics")
 async def metrics():
+    # Queue depth lives in the broker, so it is read at scrape time
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for name in BROKER_QUEUES:
+                pipe.llen(name)
+            depths = await pipe.execute()
+        for name, depth in zip(BROKER_QUEUES, depths):
+            QUEUE_DEPTH.labels(queue=name).set(depth)
+    except redis.RedisError as e:
+        logger.warning("Could not read queue depths", error=str(e))
     return Response(content=get_metrics(), media_type="text/plain")
 
 graphql_app = GraphQL(schema)
@@ -1,4 +1,4 @@
-from prometheus_client import Counter, Histogram, generate_latest
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
 
 # Define custom metrics
 EMAIL_PROCESSING_TOTAL = Counter(
@@ -21,5 +21,107 @@ LEAD_THROUGHPUT = Counter(
     ['stage']
 )
 
+SCORE_CACHE_HITS = Counter(
+    'score_cache_hits_total', 'AI score cache hits',
+    ['tier']
+)
+
+SCORE_CACHE_MISSES = Counter(
+    'score_cache_misses_total', 'AI score cache misses (both tiers)'
+)
+
+SCORE_CACHE_EVICTIONS = Counter(
+    'score_cache_evictions_total', 'Entries evicted from the in-process score cache',
+    ['reason']
+)
+
+PROMPT_HISTORY_RECORDS = Counter(
+    'prompt_history_records_total', 'Prompt history records written or dropped by the background sink',
+    ['outcome']
+)
+
+SSE_CLIENTS = Gauge(
+    'sse_clients', 'SSE clients currently subscribed to lead updates'
+)
+
+SSE_DROPPED_CLIENTS = Counter(
+    'sse_dropped_clients_total', 'SSE clients disconnected for falling behind'
+)
+
+PRECLASSIFIER_DECISIONS = Counter(
+    'preclassifier_decisions_total', 'E-mails scored by each tier (rules and model avoid the LLM)',
+    ['tier']
+)
+
+PRECLASSIFIER_AGREEMENT = Counter(
+    'preclassifier_agreement_total', 'Shadow-sampled local decisions compared with the LLM stage',
+    ['tier', 'agreed']
+)
+
+REDIS_POOL_IN_USE = Gauge(
+    'redis_pool_in_use_connections', 'Redis connections currently checked out of the shared pools',
+    ['pool']
+)
+
+REDIS_POOL_WAIT = Histogram(
+    'redis_pool_wait_seconds', 'Time spent waiting for a Redis connection from the shared pools',
+    ['pool'], buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+)
+
+PIPELINE_STAGE_LATENCY = Histogram(
+    'pipeline_stage_latency_seconds', 'Latency of each e-mail pipeline stage',
+    ['stage'], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+
+OPENAI_TOKENS = Counter(
+    'openai_tokens_total', 'Tokens reported by the OpenAI API',
+    ['model', 'kind']
+)
+
+LLM_RATE_LIMIT_WAIT = Histogram(
+    'llm_rate_limit_wait_seconds', 'Time spent waiting for the shared LLM rate limit',
+    buckets=(0, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60)
+)
+
+QUEUE_DEPTH = Gauge(
+    'queue_depth_messages', 'Messages waiting in each broker queue',
+    ['queue']
+)
+
+QUEUE_WAIT = Histogram(
+    'queue_wait_seconds', 'Time e-mails spent queued before a worker picked them up',
+    ['queue'], buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300, 900, 1800)
+)
+
+SEMANTIC_CACHE_LOOKUPS = Counter(
+    'semantic_cache_lookups_total', 'Near-duplicate score lookups after an exact cache miss',
+    ['outcome']
+)
+
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    'semantic_cache_similarity', 'Cosine similarity of the closest stored e-mail on each lookup',
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.94, 0.96, 0.98, 0.99, 1)
+)
+
+SEMANTIC_CACHE_AGREEMENT = Counter(
+    'semantic_cache_agreement_total', 'Shadow-sampled reused scores compared with a fresh LLM stage',
+    ['agreed']
+)
+
+SEMANTIC_CACHE_SCORE_DELTA = Histogram(
+    'semantic_cache_score_delta', 'Absolute difference between a reused score and the fresh LLM score',
+    buckets=(0, 0.05, 0.1, 0.2, 0.3, 0.5, 0.7, 1)
+)
+
+LOG_EVENTS_DROPPED = Counter(
+    'log_events_dropped_total', 'Log events dropped by sampling, rate limits or a full log queue',
+    ['reason']
+)
+
+LEADS_RESCORED = Counter(
+    'leads_rescored_total', 'Leads examined by the re-score job after a prompt or model change',
+    ['outcome']
+)
+
 def get_metrics():
     return generate_latest()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Float, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, Float, JSON, ForeignKey, Index
 from .database import Base
 from datetime import datetime
 
@@ -10,16 +10,41 @@ class Lead(Base):
     subject     = Column(String)
     body        = Column(Text)
     score       = Column(Float, default=0.0)
-    stage       = Column(String, default="NEW", index=True)   # NEW → QUALIFIED → WON
+    stage       = Column(String, default="NEW")   # NEW → QUALIFIED → WON
     source      = Column(String, default="EMAIL") # EMAIL, WEBFORM, etc.
     intent      = Column(String, nullable=True)
     entities    = Column(JSON, nullable=True)
     created_at  = Column(DateTime, default=datetime.utcnow)
+    version     = Column(Integer, nullable=False, default=1, server_default="1")  # Bumped by every ORM update
+    # What produced score/stage, so worker.rescore only re-scores leads a prompt or model change made stale
+    score_model          = Column(String, nullable=True)
+    score_prompt_version = Column(String, nullable=True)
+    content_hash         = Column(String(64), nullable=True)  # score_cache.content_hash(subject, body)
+
+    # Match the board's keyset pagination: WHERE stage = ? ORDER BY <sort> DESC, id DESC.
+    # The trigram indexes on sender/subject are Postgres-only and live in the migrations.
+    __table_args__ = (
+        Index("ix_leads_stage_score", "stage", score.desc(), id.desc()),
+        Index("ix_leads_stage_created_at", "stage", created_at.desc(), id.desc()),
+        Index("ix_leads_created_at", created_at.desc(), id.desc()),
+    )
+    # Concurrent writers (enrichment, stage moves) fail with StaleDataError instead of overwriting each other
+    __mapper_args__ = {"version_id_col": version}
+
+class PromptTemplate(Base):
+    """A system prompt, stored once and referenced by every PromptHistory row that used it."""
+    __tablename__ = "prompt_templates"
+    id          = Column(Integer, primary_key=True)
+    sha256      = Column(String(64), unique=True, nullable=False)
+    text        = Column(Text, nullable=False)
+    created_at  = Column(DateTime, default=datetime.utcnow)
 
 class PromptHistory(Base):
+    # On Postgres the table is range-partitioned by month on timestamp (see backend/migrations)
     __tablename__ = "prompt_history"
     id          = Column(Integer, primary_key=True, index=True)
-    prompt      = Column(Text, nullable=False)
+    template_id = Column(Integer, ForeignKey("prompt_templates.id"), nullable=True)
+    prompt      = Column(Text, nullable=False)  # Per-call part only: "User Content: ..."
     response    = Column(Text, nullable=False)
     model_used  = Column(String, nullable=False)
     timestamp   = Column(DateTime, default=datetime.utcnow)
@@ -1,28 +1,59 @@
+"""
+OpenTelemetry setup and pipeline stage timing.
+
+The SDK, the OTLP exporter and the instrumentations are imported only when
+configure_opentelemetry runs, at process startup (the API's startup event,
+each Celery pool process), so importing the app or the tasks stays cheap
+and the exporter's background thread is started in the process that uses it.
+"""
+
+import time
+from contextlib import contextmanager
+
 from opentelemetry import trace
-from opentelemetry.sdk.resources import Resource
-from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
-from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
-from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
-from opentelemetry.instrumentation.redis import RedisInstrumentor
-from opentelemetry.instrumentation.celery import CeleryInstrumentor
-
-def configure_opentelemetry(app_name: str, app=None, celery_app=None, db_engine=None):
+from .metrics import PIPELINE_STAGE_LATENCY
+
+# Resolves to the provider set by configure_opentelemetry, or a no-op before/without it
+tracer = trace.get_tracer("inbound.pipeline")
+
+def instrument_fastapi(app):
+    """
+    Wraps the app's middleware stack, which Starlette builds on its first
+    ASGI call, so this must run at import; spans go to the provider set later.
+    """
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    FastAPIInstrumentor.instrument_app(app)
+
+def configure_opentelemetry(app_name: str, celery_app=None, db_engine=None):
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
     resource = Resource.create({"service.name": app_name})
     provider = TracerProvider(resource=resource)
     processor = BatchSpanProcessor(OTLPSpanExporter())
     provider.add_span_processor(processor)
     trace.set_tracer_provider(provider)
 
-    if app:
-        FastAPIInstrumentor.instrument_app(app)
-        if db_engine: # Pass engine explicitly for FastAPI
-            SQLAlchemyInstrumentor().instrument(engine=db_engine)
-        RedisInstrumentor().instrument()
-    
     if celery_app:
+        from opentelemetry.instrumentation.celery import CeleryInstrumentor
         CeleryInstrumentor().instrument(tracer_provider=provider, app=celery_app)
-        if db_engine: # Pass engine explicitly for Celery
-            SQLAlchemyInstrumentor().instrument(engine=db_engine)
-        RedisInstrumentor().instrument()
\ No newline at end of file
+    if db_engine: # Pass engine explicitly
+        SQLAlchemyInstrumentor().instrument(engine=db_engine)
+    RedisInstrumentor().instrument()
+
+@contextmanager
+def stage_timer(stage: str, **attributes):
+    """
+    Times one pipeline stage as a PIPELINE_STAGE_LATENCY observation and a
+    child span of the current trace. Also usable as a decorator on sync functions.
+    """
+    start = time.perf_counter()
+    with tracer.start_as_current_span(f"stage.{stage}", attributes=attributes) as span:
+        try:
+            yield span
+        finally:
+            PIPELINE_STAGE_LATENCY.labels(stage=stage).observe(time.perf_counter() - start)
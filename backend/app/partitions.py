@@ -0,0 +1,102 @@
+"""
+Monthly partitions and retention for prompt_history.
+
+On Postgres, prompt_history is range-partitioned by month on timestamp
+(created by the migrations, with a DEFAULT partition as a safety net).
+`maintain` creates the partitions for the coming months ahead of time and
+drops whole months older than the retention window, which is a metadata
+change instead of a large DELETE. Run it daily from the worker task
+maintain_prompt_history or:
+
+    python -m backend.app.partitions
+"""
+
+import os
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PROMPT_HISTORY_RETENTION_MONTHS = int(os.getenv("PROMPT_HISTORY_RETENTION_MONTHS", "6"))  # 0 keeps everything
+PROMPT_HISTORY_PARTITIONS_AHEAD = int(os.getenv("PROMPT_HISTORY_PARTITIONS_AHEAD", "3"))
+
+TABLE = "prompt_history"
+_PARTITION = re.compile(rf"^{TABLE}_y(\d{{4}})m(\d{{2}})$")
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.scalar(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:t)"), {"t": TABLE}) is True
+
+
+def ensure_partitions(conn, months_ahead: int = PROMPT_HISTORY_PARTITIONS_AHEAD, now: datetime | None = None) -> list[str]:
+    """Creates the partitions from the current month to `months_ahead` months later; returns the new ones."""
+    current = add_months(now or datetime.utcnow(), 0)
+    existing = set(list_partitions(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        name = partition_name(month)
+        if name in existing:
+            continue
+        conn.execute(text(
+            f"CREATE TABLE {name} PARTITION OF {TABLE} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{add_months(month, 1):%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+
+def drop_expired(conn, retention_months: int = PROMPT_HISTORY_RETENTION_MONTHS, now: datetime | None = None) -> list[str]:
+    """Drops monthly partitions that ended before the retention window; returns the dropped ones."""
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(now or datetime.utcnow(), -retention_months)
+    dropped = []
+    for name in list_partitions(conn):
+        year, month = map(int, _PARTITION.match(name).groups())
+        if add_months(datetime(year, month, 1), 1) <= cutoff:
+            conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+def list_partitions(conn) -> list[str]:
+    """Monthly partitions of prompt_history, oldest first (the DEFAULT partition is not included)."""
+    names = conn.scalars(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:t)"
+    ), {"t": TABLE})
+    return sorted(n for n in names if _PARTITION.match(n))
+
+
+def maintain(engine, retention_months: int = PROMPT_HISTORY_RETENTION_MONTHS,
+             months_ahead: int = PROMPT_HISTORY_PARTITIONS_AHEAD) -> dict:
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return {"created": [], "dropped": []}
+        result = {"created": ensure_partitions(conn, months_ahead), "dropped": drop_expired(conn, retention_months)}
+    logger.info("Prompt history partitions maintained", **result)
+    return result
+
+
+if __name__ == "__main__":
+    from .database import engine
+    from .logging_config import configure_logging
+
+    configure_logging()
+    maintain(engine)
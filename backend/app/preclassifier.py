@@ -0,0 +1,149 @@
+"""
+Cheap local classification that runs before the LLM.
+
+Two tiers: hand-written rules for mail that is never a lead (bounces,
+auto-replies, newsletters), then a TF-IDF + logistic regression model
+trained on past LLM answers from prompt_history. Either tier may decide an
+e-mail on its own when it is confident enough; everything else is left to
+the LLM.
+
+    python -m backend.app.preclassifier train   # fit on prompt_history and save
+"""
+
+import json
+import os
+import pickle
+import re
+from dataclasses import dataclass
+
+from .logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PRECLASSIFIER_MODEL_PATH = os.getenv("PRECLASSIFIER_MODEL_PATH", "preclassifier.pkl")
+PRECLASSIFIER_HOT_THRESHOLD = float(os.getenv("PRECLASSIFIER_HOT_THRESHOLD", "0.9"))
+PRECLASSIFIER_COLD_THRESHOLD = float(os.getenv("PRECLASSIFIER_COLD_THRESHOLD", "0.85"))
+
+# Same buckets the LLM prompt asks for
+HOT, WARM, COLD = "hot", "warm", "cold"
+LABEL_SCORES = {HOT: (0.9, "QUALIFIED"), WARM: (0.6, "QUALIFIED"), COLD: (0.2, "NEW")}
+
+_RULES = [
+    ("bounce", re.compile(r"mailer-daemon|postmaster@", re.I), "sender"),
+    ("bounce", re.compile(r"undeliverable|delivery status notification|mail delivery (failed|subsystem)", re.I), "subject"),
+    ("auto_reply", re.compile(r"out of (the )?office|automatic reply|auto[- ]?reply|autoreply|resposta autom[aá]tica", re.I), "subject"),
+    ("newsletter", re.compile(r"(^|[<\s])(no-?reply|newsletter|news|marketing)@", re.I), "sender"),
+    ("newsletter", re.compile(r"\bunsubscribe\b|cancelar (a )?inscri[cç][aã]o", re.I), "body"),
+]
+
+_USER_CONTENT = re.compile(r"User Content: Subject: (?P<subject>.*?)\nBody: (?P<body>.*)\Z", re.S)
+
+
+@dataclass
+class Decision:
+    score: float
+    stage: str
+    tier: str  # "rules" or "model"
+    reason: str
+
+
+def label_for_score(score: float) -> str:
+    if score >= 0.75:
+        return HOT
+    if score >= 0.4:
+        return WARM
+    return COLD
+
+
+def model_text(subject: str, body: str) -> str:
+    return f"{subject}\n{body[:4000]}"
+
+
+def match_rule(sender: str, subject: str, body: str) -> str | None:
+    """Name of the first non-lead rule (bounce, auto_reply, newsletter) the e-mail matches."""
+    fields = {"sender": sender or "", "subject": subject or "", "body": body or ""}
+    for reason, pattern, field in _RULES:
+        if pattern.search(fields[field]):
+            return reason
+    return None
+
+
+class PreClassifier:
+    def __init__(self, model=None, hot_threshold: float = PRECLASSIFIER_HOT_THRESHOLD,
+                 cold_threshold: float = PRECLASSIFIER_COLD_THRESHOLD):
+        self.model = model
+        self.thresholds = {HOT: hot_threshold, COLD: cold_threshold}
+
+    @classmethod
+    def load(cls, path: str = PRECLASSIFIER_MODEL_PATH, **kwargs) -> "PreClassifier":
+        """Rules-only classifier when no trained model has been saved yet."""
+        model = None
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                model = pickle.load(f)
+        return cls(model=model, **kwargs)
+
+    def classify(self, sender: str, subject: str, body: str) -> Decision | None:
+        reason = match_rule(sender, subject, body)
+        if reason is not None:
+            return Decision(*LABEL_SCORES[COLD], tier="rules", reason=reason)
+        if self.model is None:
+            return None
+        probabilities = self.model.predict_proba([model_text(subject, body)])[0]
+        label, confidence = max(zip(self.model.classes_, probabilities), key=lambda p: p[1])
+        if label in self.thresholds and confidence >= self.thresholds[label]:
+            return Decision(*LABEL_SCORES[label], tier="model", reason=f"{label}:{confidence:.2f}")
+        return None
+
+
+def training_examples(rows) -> tuple[list[str], list[str]]:
+    """(text, label) pairs from PromptHistory (prompt, response) rows of single-e-mail calls."""
+    texts, labels = [], []
+    for prompt, response in rows:
+        match = _USER_CONTENT.search(prompt or "")
+        if not match or response.startswith("ERROR") or "E-mail 0:" in prompt:
+            continue
+        try:
+            score = float(json.loads(response)["score"])
+        except (ValueError, KeyError, TypeError):
+            continue
+        texts.append(model_text(match["subject"], match["body"]))
+        labels.append(label_for_score(score))
+    return texts, labels
+
+
+def train(texts: list[str], labels: list[str]):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    model = make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), min_df=2, max_features=50_000, sublinear_tf=True),
+        LogisticRegression(max_iter=1000, class_weight="balanced"),
+    )
+    model.fit(texts, labels)
+    return model
+
+
+def train_from_history(path: str = PRECLASSIFIER_MODEL_PATH) -> int:
+    from .database import SessionLocal
+    from .models import PromptHistory
+
+    with SessionLocal() as db:
+        rows = db.query(PromptHistory.prompt, PromptHistory.response).yield_per(1000)
+        texts, labels = training_examples(rows)
+    if len(set(labels)) < 2:
+        raise ValueError("prompt_history needs answers in at least two classes to train on")
+    model = train(texts, labels)
+    with open(path, "wb") as f:
+        pickle.dump(model, f)
+    logger.info("Pre-classifier trained", examples=len(texts), path=path)
+    return len(texts)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["train"]:
+        sys.exit("usage: python -m backend.app.preclassifier train")
+    train_from_history()
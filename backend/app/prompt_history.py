@@ -0,0 +1,145 @@
+"""
+Background, batched writer for PromptHistory rows.
+
+Scoring calls hand records to a bounded queue and return immediately; a
+daemon thread inserts them in bulk (one executemany per flush) whenever
+`batch_size` rows are pending or `flush_interval` seconds have passed.
+When the queue is full, callers block for at most `put_timeout` seconds
+and the record is then dropped and counted, so a slow database can never
+stall scoring or grow memory without bound.
+
+System prompts are stored once in prompt_templates and referenced by id;
+each row keeps only the per-call user content. The writer thread resolves
+template ids itself and remembers them, so a flush normally adds no queries.
+"""
+
+import atexit
+import hashlib
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from .database import SessionLocal
+from .logging_config import get_logger
+from .metrics import PROMPT_HISTORY_RECORDS
+from .models import PromptHistory, PromptTemplate
+
+logger = get_logger(__name__)
+
+PROMPT_HISTORY_BATCH_SIZE = int(os.getenv("PROMPT_HISTORY_BATCH_SIZE", "200"))
+PROMPT_HISTORY_FLUSH_INTERVAL = float(os.getenv("PROMPT_HISTORY_FLUSH_INTERVAL", "1.0"))
+PROMPT_HISTORY_QUEUE_SIZE = int(os.getenv("PROMPT_HISTORY_QUEUE_SIZE", "10000"))
+PROMPT_HISTORY_PUT_TIMEOUT = float(os.getenv("PROMPT_HISTORY_PUT_TIMEOUT", "0.05"))
+
+_STOP = object()
+
+
+class PromptHistorySink:
+    def __init__(self, session_factory=SessionLocal, batch_size: int = PROMPT_HISTORY_BATCH_SIZE,
+                 flush_interval: float = PROMPT_HISTORY_FLUSH_INTERVAL,
+                 max_queue: int = PROMPT_HISTORY_QUEUE_SIZE, put_timeout: float = PROMPT_HISTORY_PUT_TIMEOUT):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._template_ids: dict[str, int] = {}
+
+    def _ensure_started(self):
+        # Prefork workers inherit the parent's object but not its thread
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._run, name="prompt-history-sink", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def record(self, prompt: str, response: str, model_used: str, template: str | None = None):
+        """`template` is the system prompt; `prompt` only what changes per call."""
+        self._ensure_started()
+        row = {"template": template, "prompt": prompt, "response": response, "model_used": model_used,
+               "timestamp": datetime.utcnow()}
+        try:
+            self._queue.put(row, timeout=self.put_timeout)
+        except queue.Full:
+            PROMPT_HISTORY_RECORDS.labels(outcome="dropped").inc()
+            logger.warning("Prompt history queue full, record dropped", model=model_used)
+
+    def close(self, timeout: float = 10.0):
+        """Flushes everything queued so far and stops the writer thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(batch)
+                return
+            if item is not None:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._flush(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self, batch: list[dict]):
+        if not batch:
+            return
+        db = self.session_factory()
+        try:
+            resolved = {}
+            rows = [{**{k: v for k, v in row.items() if k != "template"},
+                     "template_id": self._template_id(db, row["template"], resolved) if row["template"] else None}
+                    for row in batch]
+            db.execute(insert(PromptHistory), rows)
+            db.commit()
+            self._template_ids.update(resolved)  # Only ids of committed templates are remembered
+            PROMPT_HISTORY_RECORDS.labels(outcome="written").inc(len(batch))
+        except Exception:
+            db.rollback()
+            PROMPT_HISTORY_RECORDS.labels(outcome="dropped").inc(len(batch))
+            logger.error("Prompt history flush failed", rows=len(batch), exc_info=True)
+        finally:
+            db.close()
+
+    def _template_id(self, db, text: str, resolved: dict[str, int]) -> int:
+        digest = hashlib.sha256(text.encode()).hexdigest()
+        if digest in self._template_ids:
+            return self._template_ids[digest]
+        if digest not in resolved:
+            template_id = db.scalar(select(PromptTemplate.id).where(PromptTemplate.sha256 == digest))
+            if template_id is None:
+                try:
+                    with db.begin_nested():
+                        template_id = db.scalar(insert(PromptTemplate).values(sha256=digest, text=text)
+                                                .returning(PromptTemplate.id))
+                except IntegrityError:
+                    # Another worker stored it first
+                    template_id = db.scalar(select(PromptTemplate.id).where(PromptTemplate.sha256 == digest))
+            resolved[digest] = template_id
+        return resolved[digest]
+
+
+prompt_history_sink = PromptHistorySink()
+atexit.register(prompt_history_sink.close)
@@ -0,0 +1,100 @@
+"""
+Fleet-wide token buckets for the LLM's requests-per-minute and
+tokens-per-minute limits.
+
+Both buckets live in Redis and are refilled and debited by one Lua script
+using Redis' own clock, so every worker process shares them and a request is
+only let through when both have room. A limit of 0 turns its bucket off. Callers wait the time the script says
+the buckets need instead of sending requests that would come back as 429s.
+If Redis is unavailable the limiter lets requests through rather than
+stopping classification.
+"""
+
+import asyncio
+import os
+
+import redis.asyncio as redis
+
+from .logging_config import get_logger
+from .metrics import LLM_RATE_LIMIT_WAIT
+from .redis_pool import get_async_redis
+
+logger = get_logger(__name__)
+
+OPENAI_RPM_LIMIT = int(os.getenv("OPENAI_RPM_LIMIT", "0"))  # 0 disables that limit
+OPENAI_TPM_LIMIT = int(os.getenv("OPENAI_TPM_LIMIT", "0"))
+
+# KEYS: requests bucket, tokens bucket. ARGV: rpm, tpm, tokens wanted; a limit of 0 skips its bucket.
+# Returns 0 when both buckets were debited, otherwise milliseconds until they can be.
+_TAKE = """
+local now_t = redis.call('TIME')
+local now = now_t[1] * 1000 + math.floor(now_t[2] / 1000)
+local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local wanted = {1, tonumber(ARGV[3])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  local capacity = limits[i]
+  if capacity > 0 then
+    local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+    local level = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    level = math.min(capacity, level + (now - ts) * capacity / 60000)
+    levels[i] = level
+    local need = math.min(wanted[i], capacity)
+    if level < need then
+      wait = math.max(wait, math.ceil((need - level) * 60000 / capacity))
+    end
+  end
+end
+for i = 1, 2 do
+  local level = levels[i]
+  if level then
+    if wait == 0 then
+      level = level - math.min(wanted[i], limits[i])
+    end
+    redis.call('HSET', KEYS[i], 'level', tostring(level), 'ts', now)
+    redis.call('PEXPIRE', KEYS[i], 120000)
+  end
+end
+return wait
+"""
+
+
+class LLMRateLimiter:
+    def __init__(self, rpm: int = OPENAI_RPM_LIMIT, tpm: int = OPENAI_TPM_LIMIT, key: str = "openai",
+                 redis_url: str | None = None, max_wait: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.keys = [f"ratelimit:{key}:rpm", f"ratelimit:{key}:tpm"]
+        self.redis_url = redis_url
+        self.max_wait = max_wait
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm > 0 or self.tpm > 0
+
+    async def acquire(self, tokens: int) -> float:
+        """Blocks until one request of about `tokens` tokens fits the limits set; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        client = get_async_redis(self.redis_url)
+        waited = 0.0
+        while True:
+            try:
+                wait_ms = await client.eval(_TAKE, 2, *self.keys, self.rpm, self.tpm, tokens)
+            except redis.RedisError as e:
+                logger.warning("LLM rate limiter unavailable, not limiting", error=str(e))
+                break
+            if not wait_ms or waited >= self.max_wait:
+                break
+            delay = min(wait_ms / 1000, self.max_wait - waited)
+            await asyncio.sleep(delay)
+            waited += delay
+        LLM_RATE_LIMIT_WAIT.observe(waited)
+        return waited
+
+
+def estimate_tokens(*texts: str, completion: int = 60) -> int:
+    # ~4 characters per token for English text, plus room for the JSON answer
+    return sum(len(t) for t in texts) // 4 + completion
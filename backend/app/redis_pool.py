@@ -0,0 +1,111 @@
+"""
+Shared Redis connection pools for the API and the worker.
+
+Every component asks this module for a client instead of building its own,
+so each process keeps one bounded pool per (URL, decode_responses): sync
+pools are per process, asyncio pools per event loop, since asyncio
+connections cannot move between loops. A loop that is kept for many
+calls (worker.tasks.run_async) keeps its pools until close_async_redis().
+Pools block for up to
+REDIS_POOL_TIMEOUT when all REDIS_MAX_CONNECTIONS are busy rather than
+opening more, and report in-use connections and wait time to Prometheus.
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+
+import redis
+import redis.asyncio as aioredis
+
+from .metrics import REDIS_POOL_IN_USE, REDIS_POOL_WAIT
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379/0")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+
+class MeteredConnectionPool(redis.BlockingConnectionPool):
+    def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = super().get_connection(*args, **kwargs)
+        REDIS_POOL_WAIT.labels(pool="sync").observe(time.perf_counter() - start)
+        REDIS_POOL_IN_USE.labels(pool="sync").inc()
+        return connection
+
+    def release(self, connection):
+        super().release(connection)
+        REDIS_POOL_IN_USE.labels(pool="sync").dec()
+
+
+class AsyncMeteredConnectionPool(aioredis.BlockingConnectionPool):
+    async def get_connection(self, *args, **kwargs):
+        start = time.perf_counter()
+        connection = await super().get_connection(*args, **kwargs)
+        REDIS_POOL_WAIT.labels(pool="async").observe(time.perf_counter() - start)
+        REDIS_POOL_IN_USE.labels(pool="async").inc()
+        return connection
+
+    async def release(self, connection):
+        await super().release(connection)
+        REDIS_POOL_IN_USE.labels(pool="async").dec()
+
+
+def _pool_options(decode_responses: bool) -> dict:
+    return {
+        "max_connections": REDIS_MAX_CONNECTIONS,
+        "timeout": REDIS_POOL_TIMEOUT,
+        "health_check_interval": REDIS_HEALTH_CHECK_INTERVAL,
+        "decode_responses": decode_responses,
+    }
+
+
+_sync_clients: dict[tuple[str, bool], redis.Redis] = {}
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+
+
+def get_redis(url: str | None = None, decode_responses: bool = False) -> redis.Redis:
+    key = (url or REDIS_URL, decode_responses)
+    client = _sync_clients.get(key)
+    if client is None:
+        pool = MeteredConnectionPool.from_url(key[0], **_pool_options(decode_responses))
+        client = _sync_clients.setdefault(key, redis.Redis(connection_pool=pool))
+    return client
+
+
+def get_async_redis(url: str | None = None, decode_responses: bool = False) -> aioredis.Redis:
+    """Client on the running loop's pool; must be called from inside that loop."""
+    for loop in [loop for loop in _async_clients if loop.is_closed()]:
+        # Closed without close_async_redis(): its connections can no longer be used, so let them go
+        del _async_clients[loop]
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    key = (url or REDIS_URL, decode_responses)
+    client = clients.get(key)
+    if client is None:
+        pool = AsyncMeteredConnectionPool.from_url(key[0], **_pool_options(decode_responses))
+        client = clients[key] = aioredis.Redis(connection_pool=pool)
+    return client
+
+
+async def close_async_redis():
+    """Disconnects the running loop's pools (API and worker shutdown)."""
+    for client in _async_clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.connection_pool.disconnect()
+
+
+@contextmanager
+def pipeline(client: redis.Redis | None = None):
+    """Non-transactional pipeline sent in one round-trip when the block exits without error."""
+    with (client or get_redis()).pipeline(transaction=False) as pipe:
+        yield pipe
+        pipe.execute()
+
+
+@asynccontextmanager
+async def async_pipeline(client: aioredis.Redis | None = None):
+    async with (client or get_async_redis()).pipeline(transaction=False) as pipe:
+        yield pipe
+        await pipe.execute()
@@ -0,0 +1,27 @@
+"""
+Explicit schema migration step.
+
+The API and the workers no longer create tables when they are imported; run
+the Alembic migrations once per deploy, before starting them:
+
+    python -m backend.app.schema          # same as: alembic -c backend/alembic.ini upgrade head
+"""
+
+import os
+
+ALEMBIC_INI = os.path.join(os.path.dirname(__file__), "..", "alembic.ini")
+
+
+def upgrade(revision: str = "head", url: str | None = None):
+    """Migrates the database at `url` (DATABASE_URL by default) to `revision`."""
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(ALEMBIC_INI)
+    if url:
+        config.set_main_option("sqlalchemy.url", url.replace("%", "%%"))
+    command.upgrade(config, revision)
+
+
+if __name__ == "__main__":
+    upgrade()
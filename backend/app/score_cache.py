@@ -0,0 +1,96 @@
+"""
+Two-tier cache for AI scores: an in-process LRU in front of Redis.
+
+Keys are a hash of the normalized e-mail (quoted history and signatures
+stripped, case and whitespace folded) plus the model and prompt version,
+so re-sent or re-quoted mail reuses the score while prompt or model
+changes never serve stale results.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+import redis.asyncio as redis
+
+from .logging_config import get_logger
+from .lru import LRUCache
+from .metrics import SCORE_CACHE_EVICTIONS, SCORE_CACHE_HITS, SCORE_CACHE_MISSES
+from .redis_pool import REDIS_URL, get_async_redis
+
+logger = get_logger(__name__)
+
+SCORE_CACHE_TTL = int(os.getenv("SCORE_CACHE_TTL", "3600"))
+SCORE_CACHE_LOCAL_SIZE = int(os.getenv("SCORE_CACHE_LOCAL_SIZE", "10000"))
+SCORE_CACHE_LOCAL_TTL = int(os.getenv("SCORE_CACHE_LOCAL_TTL", "3600"))
+
+# Everything after one of these lines is quoted history or a signature
+_CUTOFF = re.compile(
+    r"^(on\s.+\swrote:|-+\s*original message\s*-+|from:\s.+|--|sent from my\s.+|get outlook for\s.+)$",
+    re.IGNORECASE,
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_email(subject: str, body: str) -> str:
+    lines = []
+    for line in (body or "").splitlines():
+        line = line.strip()
+        if _CUTOFF.match(line):
+            break
+        if line.startswith(">"):
+            continue
+        lines.append(line)
+    text = f"{subject or ''}\n{' '.join(lines)}"
+    return _WHITESPACE.sub(" ", text.casefold()).strip()
+
+
+def content_hash(subject: str, body: str) -> str:
+    return hashlib.sha256(normalize_email(subject, body).encode("utf-8")).hexdigest()
+
+
+def score_cache_key(model: str, prompt_version: str, subject: str, body: str) -> str:
+    return f"ai_score:{model}:{prompt_version}:{content_hash(subject, body)}"
+
+
+class ScoreCache:
+    def __init__(self, redis_url: str | None = REDIS_URL, ttl: int = SCORE_CACHE_TTL,
+                 local_size: int = SCORE_CACHE_LOCAL_SIZE, local_ttl: int = SCORE_CACHE_LOCAL_TTL):
+        self.redis_url = redis_url  # None keeps the cache in-process only
+        self.ttl = ttl
+        self.local = LRUCache(
+            maxsize=local_size, ttl=local_ttl,
+            on_evict=lambda reason: SCORE_CACHE_EVICTIONS.labels(reason=reason).inc(),
+        )
+
+    def _get_redis(self) -> redis.Redis:
+        return get_async_redis(self.redis_url)
+
+    async def get(self, key: str) -> tuple[float, str] | None:
+        value = self.local.get(key)
+        if value is not None:
+            SCORE_CACHE_HITS.labels(tier="local").inc()
+            return value
+        if self.redis_url:
+            try:
+                raw = await self._get_redis().get(key)
+            except redis.RedisError as e:
+                logger.warning("Score cache read failed", error=str(e))
+                raw = None
+            if raw is not None:
+                score, stage = json.loads(raw)
+                value = (float(score), stage)
+                self.local.set(key, value)
+                SCORE_CACHE_HITS.labels(tier="redis").inc()
+                return value
+        SCORE_CACHE_MISSES.inc()
+        return None
+
+    async def set(self, key: str, value: tuple[float, str]):
+        self.local.set(key, value)
+        if self.redis_url:
+            try:
+                await self._get_redis().set(key, json.dumps(value), ex=self.ttl)
+            except redis.RedisError as e:
+                logger.warning("Score cache write failed", error=str(e))
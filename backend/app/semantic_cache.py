@@ -0,0 +1,156 @@
+"""
+Score reuse for near-duplicate e-mails.
+
+Templated mail (the same pricing or demo request with another name, company
+or seat count) never hits the exact score cache. Each scored e-mail is
+embedded with a signed hashing vectorizer over the normalized text (word
+unigrams and bigrams, L2-normalized) and kept in an in-process NumPy
+matrix; an e-mail whose cosine similarity to a stored one reaches
+SEMANTIC_CACHE_THRESHOLD reuses its score and stage instead of calling the
+LLM. The matrix is a ring buffer of SEMANTIC_CACHE_MAX_ENTRIES rows,
+persisted to SEMANTIC_CACHE_PATH and tagged with the model and prompt
+version so a prompt change starts from an empty index.
+
+Each worker process keeps its own index and loads the file on start-up.
+Tune the threshold with benchmarks/bench_semantic_cache.py and the
+semantic_cache_* metrics; 0 disables reuse.
+"""
+
+import os
+import re
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+from .logging_config import get_logger
+from .metrics import SEMANTIC_CACHE_LOOKUPS, SEMANTIC_CACHE_SIMILARITY
+from .score_cache import normalize_email
+
+logger = get_logger(__name__)
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0"))  # 0 disables
+SEMANTIC_CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "semantic_cache.npz")  # "" keeps it in memory
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+SEMANTIC_CACHE_SAVE_EVERY = int(os.getenv("SEMANTIC_CACHE_SAVE_EVERY", "500"))
+
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class Match:
+    similarity: float
+    score: float
+    stage: str
+
+
+def embed(subject: str, body: str, dim: int = SEMANTIC_CACHE_DIM) -> np.ndarray:
+    """Unit-length hashed bag of words and bigrams; crc32 keeps it stable across processes."""
+    words = _WORD.findall(normalize_email(subject, body))
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features))
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    def __init__(self, namespace: str = "", threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES, dim: int = SEMANTIC_CACHE_DIM,
+                 path: str | None = SEMANTIC_CACHE_PATH, save_every: int = SEMANTIC_CACHE_SAVE_EVERY):
+        self.namespace = namespace  # model and prompt version the stored scores came from
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self.path = path or None
+        self.save_every = save_every
+        self.vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self.scores = np.zeros(max_entries)
+        self.stages = [""] * max_entries
+        self.count = 0
+        self._next = 0  # oldest row, overwritten first once the buffer is full
+        self._unsaved = 0
+
+    @classmethod
+    def load(cls, namespace: str = "", **kwargs) -> "SemanticIndex":
+        """Index restored from its file; empty when there is none or it belongs to another namespace or size."""
+        index = cls(namespace, **kwargs)
+        if not index.path or not os.path.exists(index.path):
+            return index
+        try:
+            with np.load(index.path) as data:
+                if str(data["namespace"]) != namespace or data["vectors"].shape[1] != index.dim:
+                    logger.info("Semantic cache file is for another model or prompt; starting empty",
+                                path=index.path)
+                    return index
+                vectors, scores, stages = data["vectors"], data["scores"], data["stages"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Could not load the semantic cache", path=index.path, error=str(e))
+            return index
+        keep = slice(max(0, len(vectors) - index.max_entries), None)
+        for vector, score, stage in zip(vectors[keep], scores[keep], stages[keep]):
+            index._append(vector.astype(np.float32), float(score), str(stage))
+        logger.info("Semantic cache loaded", path=index.path, entries=index.count)
+        return index
+
+    def embed(self, subject: str, body: str) -> np.ndarray:
+        return embed(subject, body, self.dim)
+
+    def nearest(self, vector: np.ndarray) -> Match | None:
+        if not self.count:
+            return None
+        similarities = self.vectors[:self.count] @ vector
+        best = int(np.argmax(similarities))
+        return Match(float(similarities[best]), float(self.scores[best]), self.stages[best])
+
+    def lookup(self, vector: np.ndarray) -> Match | None:
+        """Closest stored e-mail if it is at least `threshold` similar."""
+        match = self.nearest(vector)
+        if match is not None:
+            SEMANTIC_CACHE_SIMILARITY.observe(match.similarity)
+        if match is None or match.similarity < self.threshold:
+            SEMANTIC_CACHE_LOOKUPS.labels(outcome="miss").inc()
+            return None
+        SEMANTIC_CACHE_LOOKUPS.labels(outcome="hit").inc()
+        return match
+
+    def add(self, vector: np.ndarray, score: float, stage: str):
+        if not vector.any():
+            return
+        self._append(vector, score, stage)
+        self._unsaved += 1
+        if self.path and self._unsaved >= self.save_every:
+            self.save()
+
+    def _append(self, vector: np.ndarray, score: float, stage: str):
+        self.vectors[self._next] = vector
+        self.scores[self._next] = score
+        self.stages[self._next] = stage
+        self._next = (self._next + 1) % self.max_entries
+        self.count = min(self.count + 1, self.max_entries)
+
+    def _ordered(self) -> np.ndarray:
+        """Row numbers from oldest to newest."""
+        if self.count < self.max_entries:
+            return np.arange(self.count)
+        return np.roll(np.arange(self.max_entries), -self._next)
+
+    def save(self):
+        """Writes the index atomically; vectors are stored as float16 to halve the file."""
+        if not self.path:
+            return
+        rows = self._ordered()
+        tmp = f"{self.path}.{os.getpid()}.tmp"  # worker processes may save at the same time
+        try:
+            with open(tmp, "wb") as f:
+                np.savez(f, namespace=np.array(self.namespace), vectors=self.vectors[rows].astype(np.float16),
+                         scores=self.scores[rows], stages=np.array([self.stages[i] for i in rows], dtype=str))
+            os.replace(tmp, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            logger.warning("Could not save the semantic cache", path=self.path, error=str(e))
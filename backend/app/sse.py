@@ -0,0 +1,141 @@
+"""
+Per-process fan-out of lead updates to SSE clients.
+
+A single background task blocks on XREAD over the lead_updates stream and
+pushes every entry into a bounded asyncio queue per connected client. A
+client whose queue fills up is disconnected rather than slowing everyone
+else down; browsers reconnect on their own and resume from Last-Event-ID,
+which is replayed from the (capped) stream.
+"""
+
+import asyncio
+import os
+
+import redis.asyncio as redis
+
+from .events import LEAD_UPDATES_STREAM, decode_event
+from .logging_config import get_logger
+from .metrics import SSE_CLIENTS, SSE_DROPPED_CLIENTS
+from .redis_pool import REDIS_URL, get_async_redis
+
+logger = get_logger(__name__)
+
+SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+
+
+def _stream_id(event_id: str) -> tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = False
+
+    def drop(self):
+        # Discard the backlog and wake the reader with the end-of-stream marker
+        self.dropped = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class LeadEventHub:
+    def __init__(self, redis_url: str = REDIS_URL, stream_key: str = LEAD_UPDATES_STREAM, queue_size: int = SSE_QUEUE_SIZE,
+                 heartbeat: float = SSE_HEARTBEAT_SECONDS):
+        self.redis_url = redis_url
+        self.stream_key = stream_key
+        self.queue_size = queue_size
+        self.heartbeat = heartbeat
+        self._subscriptions: set[Subscription] = set()
+        self._redis = None
+        self._task = None
+
+    async def start(self):
+        # Binary client: compressed events are gunzipped here, once per process
+        self._redis = get_async_redis(self.redis_url)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        for subscription in list(self._subscriptions):
+            subscription.drop()
+
+    async def _run(self):
+        last_id = "$"
+        while True:
+            try:
+                response = await self._redis.xread({self.stream_key: last_id}, block=30_000, count=500)
+            except redis.RedisError:
+                logger.warning("Lead update stream read failed, retrying", exc_info=True)
+                await asyncio.sleep(1)
+                continue
+            for _, entries in response:
+                for event_id, fields in entries:
+                    last_id = event_id.decode()
+                    self.broadcast(last_id, decode_event(fields))
+
+    def broadcast(self, event_id: str, data: str):
+        for subscription in list(self._subscriptions):
+            try:
+                subscription.queue.put_nowait((event_id, data))
+            except asyncio.QueueFull:
+                logger.info("Dropping slow SSE client")
+                SSE_DROPPED_CLIENTS.inc()
+                self.unsubscribe(subscription)
+                subscription.drop()
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscriptions.add(subscription)
+        SSE_CLIENTS.set(len(self._subscriptions))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscriptions.discard(subscription)
+        SSE_CLIENTS.set(len(self._subscriptions))
+
+    async def replay(self, last_event_id: str):
+        """Yields every entry after last_event_id, reading the stream queue_size entries at a time."""
+        after = last_event_id
+        while True:
+            entries = await self._redis.xrange(self.stream_key, min=f"({after}", count=self.queue_size)
+            for event_id, fields in entries:
+                after = event_id.decode()
+                yield after, decode_event(fields)
+            if len(entries) < self.queue_size:
+                return
+
+    async def stream(self, last_event_id: str | None = None):
+        """Yields SSE frames for one client until it disconnects or is dropped."""
+        subscription = self.subscribe()
+        try:
+            last_sent = None
+            if last_event_id:
+                try:
+                    async for event_id, data in self.replay(last_event_id):
+                        last_sent = _stream_id(event_id)
+                        yield f"id: {event_id}\ndata: {data}\n\n"
+                except (redis.RedisError, ValueError):
+                    logger.warning("SSE replay failed", last_event_id=last_event_id, exc_info=True)
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is None:
+                    return
+                event_id, data = item
+                if last_sent and _stream_id(event_id) <= last_sent:
+                    continue  # Already delivered by the replay
+                yield f"id: {event_id}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(subscription)
@@ -0,0 +1,47 @@
+"""
+Cheap triage at ingest time: decides which priority lane an e-mail is
+queued on before any model looks at it.
+
+Mail the pre-classifier rules already recognise as non-leads (bounces,
+auto-replies, newsletters) and bulk-looking subjects go to the low lane;
+buying words and configured priority domains raise the score. Everything
+scoring TRIAGE_HIGH_THRESHOLD or more goes to the high lane, so a backlog of
+noise never sits in front of a prospect asking for a quote.
+"""
+
+import os
+import re
+from email.utils import parseaddr
+
+from .preclassifier import match_rule
+
+HIGH, LOW = "high", "low"
+
+TRIAGE_HIGH_THRESHOLD = int(os.getenv("TRIAGE_HIGH_THRESHOLD", "0"))
+# Comma-separated sender domains (e.g. target accounts) that always score higher
+TRIAGE_PRIORITY_DOMAINS = frozenset(
+    d.strip().lower() for d in os.getenv("TRIAGE_PRIORITY_DOMAINS", "").split(",") if d.strip()
+)
+
+_BUYING = re.compile(
+    r"\b(pricing|price|quote|quotation|demo|proposal|contract|invoice|purchase|buy|licen[cs]es?|"
+    r"or[cç]amento|proposta|contrato|pre[cç]o|comprar)\b", re.I)
+_BULK = re.compile(r"\b(webinar|digest|newsletter|promo(tion)?|discount|% off|black friday)\b", re.I)
+
+
+def triage_score(sender: str, subject: str, body: str) -> int:
+    if match_rule(sender, subject, body) is not None:
+        return -3
+    score = 0
+    if _BUYING.search(subject or "") or _BUYING.search((body or "")[:2000]):
+        score += 2
+    domain = parseaddr(sender or "")[1].rpartition("@")[2].lower()
+    if domain in TRIAGE_PRIORITY_DOMAINS:
+        score += 1
+    if _BULK.search(subject or ""):
+        score -= 1
+    return score
+
+
+def lane(sender: str, subject: str, body: str, threshold: int = TRIAGE_HIGH_THRESHOLD) -> str:
+    return HIGH if triage_score(sender, subject, body) >= threshold else LOW
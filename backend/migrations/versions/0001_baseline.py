@@ -0,0 +1,53 @@
+"""Baseline: leads and prompt_history as created by Base.metadata.create_all
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases that predate the migrations already have these tables
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "leads" not in existing:
+        op.create_table(
+            "leads",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("email_id", sa.String),
+            sa.Column("sender", sa.String),
+            sa.Column("subject", sa.String),
+            sa.Column("body", sa.Text),
+            sa.Column("score", sa.Float),
+            sa.Column("stage", sa.String),
+            sa.Column("source", sa.String),
+            sa.Column("intent", sa.String, nullable=True),
+            sa.Column("entities", sa.JSON, nullable=True),
+            sa.Column("created_at", sa.DateTime),
+        )
+        op.create_index("ix_leads_id", "leads", ["id"])
+        op.create_index("ix_leads_email_id", "leads", ["email_id"], unique=True)
+        op.create_index("ix_leads_sender", "leads", ["sender"])
+        op.create_index("ix_leads_stage", "leads", ["stage"])
+    if "prompt_history" not in existing:
+        op.create_table(
+            "prompt_history",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("prompt", sa.Text, nullable=False),
+            sa.Column("response", sa.Text, nullable=False),
+            sa.Column("model_used", sa.String, nullable=False),
+            sa.Column("timestamp", sa.DateTime),
+        )
+        op.create_index("ix_prompt_history_id", "prompt_history", ["id"])
+
+
+def downgrade():
+    op.drop_table("prompt_history")
+    op.drop_table("leads")
@@ -0,0 +1,170 @@
+"""Board and search indexes, prompt templates, monthly prompt_history partitions
+
+- leads: (stage, score DESC, id DESC), (stage, created_at DESC, id DESC) and
+  (created_at DESC, id DESC) for the board's keyset pages, replacing the
+  single-column stage index; trigram GIN indexes on sender and subject when
+  pg_trgm is available.
+- prompt_templates: each distinct system prompt stored once; existing
+  prompt_history rows are split into template + per-call content.
+- prompt_history: range-partitioned by month on timestamp, with a DEFAULT
+  partition; backend.app.partitions keeps it rolling and applies retention.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+SEPARATOR = "User Content: "
+LEAD_INDEXES = {
+    "ix_leads_stage_score": "leads (stage, score DESC, id DESC)",
+    "ix_leads_stage_created_at": "leads (stage, created_at DESC, id DESC)",
+    "ix_leads_created_at": "leads (created_at DESC, id DESC)",
+}
+TRIGRAM_INDEXES = {
+    "ix_leads_sender_trgm": "leads USING gin (sender gin_trgm_ops)",
+    "ix_leads_subject_trgm": "leads USING gin (subject gin_trgm_ops)",
+}
+
+
+def _month(value: datetime, offset: int = 0) -> datetime:
+    index = value.year * 12 + value.month - 1 + offset
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def upgrade():
+    bind = op.get_bind()
+    # Create_all may already have made the new table from the models
+    if "prompt_templates" not in sa.inspect(bind).get_table_names():
+        op.create_table(
+            "prompt_templates",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("sha256", sa.String(64), nullable=False, unique=True),
+            sa.Column("text", sa.Text, nullable=False),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if bind.dialect.name != "postgresql":
+        with op.batch_alter_table("prompt_history") as batch:
+            # Batch mode rebuilds the table and needs a named constraint
+            batch.add_column(sa.Column("template_id", sa.Integer))
+            batch.create_foreign_key("fk_prompt_history_template_id", "prompt_templates", ["template_id"], ["id"])
+        for name, definition in LEAD_INDEXES.items():
+            op.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition.replace(' DESC', '')}")
+        op.execute("DROP INDEX IF EXISTS ix_leads_stage")
+        return
+
+    _partition_prompt_history(bind)
+
+    # Outside the migration transaction so building them does not block lead inserts
+    trigram = bind.scalar(sa.text("SELECT count(*) FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+    with op.get_context().autocommit_block():
+        for name, definition in LEAD_INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_leads_stage")
+        if trigram:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for name, definition in TRIGRAM_INDEXES.items():
+                op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        else:
+            print("pg_trgm is not available on this server; skipping the trigram indexes")
+
+
+def _partition_prompt_history(bind):
+    if bind.scalar(sa.text("SELECT relkind FROM pg_class WHERE oid = to_regclass('prompt_history')")) == "p":
+        return
+    columns = {c["name"] for c in sa.inspect(bind).get_columns("prompt_history")}
+    op.execute("ALTER TABLE prompt_history RENAME TO prompt_history_unpartitioned")
+    op.execute("ALTER INDEX IF EXISTS ix_prompt_history_id RENAME TO ix_prompt_history_unpartitioned_id")
+    # Keep the id sequence when the old table is dropped
+    op.execute("ALTER SEQUENCE prompt_history_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE prompt_history (
+            id          integer NOT NULL DEFAULT nextval('prompt_history_id_seq'),
+            template_id integer REFERENCES prompt_templates (id),
+            prompt      text NOT NULL,
+            response    text NOT NULL,
+            model_used  varchar NOT NULL,
+            timestamp   timestamp without time zone NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE prompt_history_id_seq OWNED BY prompt_history.id")
+    op.execute("CREATE INDEX ix_prompt_history_id ON prompt_history (id)")
+    op.execute("CREATE TABLE prompt_history_default PARTITION OF prompt_history DEFAULT")
+
+    oldest = bind.scalar(sa.text("SELECT min(timestamp) FROM prompt_history_unpartitioned")) or datetime.utcnow()
+    month, last = _month(oldest), _month(datetime.utcnow(), 3)
+    while month <= last:
+        op.execute(f"CREATE TABLE prompt_history_y{month:%Y}m{month:%m} PARTITION OF prompt_history "
+                   f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_month(month, 1):%Y-%m-%d}')")
+        month = _month(month, 1)
+
+    # Split stored prompts into the shared system prompt and the per-call content
+    split = f"strpos(prompt, '{SEPARATOR}')"
+    op.execute(f"""
+        INSERT INTO prompt_templates (sha256, text, created_at)
+        SELECT DISTINCT encode(sha256(convert_to(left(prompt, {split} - 1), 'UTF8')), 'hex'),
+               left(prompt, {split} - 1), now() AT TIME ZONE 'utc'
+        FROM prompt_history_unpartitioned WHERE {split} > 1
+        ON CONFLICT (sha256) DO NOTHING
+    """)
+    existing_template = "o.template_id, " if "template_id" in columns else ""
+    op.execute(f"""
+        INSERT INTO prompt_history (id, template_id, prompt, response, model_used, timestamp)
+        SELECT o.id, COALESCE({existing_template}t.id),
+               CASE WHEN t.id IS NULL THEN o.prompt ELSE substr(o.prompt, strpos(o.prompt, '{SEPARATOR}')) END,
+               o.response, o.model_used, COALESCE(o.timestamp, now() AT TIME ZONE 'utc')
+        FROM prompt_history_unpartitioned o
+        LEFT JOIN prompt_templates t
+          ON strpos(o.prompt, '{SEPARATOR}') > 1
+         AND t.sha256 = encode(sha256(convert_to(left(o.prompt, strpos(o.prompt, '{SEPARATOR}') - 1), 'UTF8')), 'hex')
+    """)
+    op.execute("DROP TABLE prompt_history_unpartitioned")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.execute("CREATE INDEX IF NOT EXISTS ix_leads_stage ON leads (stage)")
+        for name in LEAD_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        with op.batch_alter_table("prompt_history") as batch:
+            batch.drop_column("template_id")
+        op.drop_table("prompt_templates")
+        return
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_leads_stage ON leads (stage)")
+        for name in [*LEAD_INDEXES, *TRIGRAM_INDEXES]:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    op.execute("ALTER TABLE prompt_history RENAME TO prompt_history_partitioned")
+    op.execute("ALTER INDEX ix_prompt_history_id RENAME TO ix_prompt_history_partitioned_id")
+    op.execute("ALTER SEQUENCE prompt_history_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE prompt_history (
+            id         integer PRIMARY KEY DEFAULT nextval('prompt_history_id_seq'),
+            prompt     text NOT NULL,
+            response   text NOT NULL,
+            model_used varchar NOT NULL,
+            timestamp  timestamp without time zone
+        )
+    """)
+    op.execute("ALTER SEQUENCE prompt_history_id_seq OWNED BY prompt_history.id")
+    op.execute("CREATE INDEX ix_prompt_history_id ON prompt_history (id)")
+    op.execute("""
+        INSERT INTO prompt_history (id, prompt, response, model_used, timestamp)
+        SELECT p.id, COALESCE(t.text, '') || p.prompt, p.response, p.model_used, p.timestamp
+        FROM prompt_history_partitioned p LEFT JOIN prompt_templates t ON t.id = p.template_id
+    """)
+    op.execute("DROP TABLE prompt_history_partitioned")
+    op.drop_table("prompt_templates")
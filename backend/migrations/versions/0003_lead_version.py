@@ -0,0 +1,24 @@
+"""Lead version counter for delta events
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create_all may already have added it from the models
+    if "version" not in {c["name"] for c in sa.inspect(op.get_bind()).get_columns("leads")}:
+        op.add_column("leads", sa.Column("version", sa.Integer, nullable=False, server_default="1"))
+
+
+def downgrade():
+    op.drop_column("leads", "version")
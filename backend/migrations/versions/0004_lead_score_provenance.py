@@ -0,0 +1,33 @@
+"""Score provenance on leads for incremental re-scoring
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "score_model": sa.String,
+    "score_prompt_version": sa.String,
+    "content_hash": lambda: sa.String(64),
+}
+
+
+def upgrade():
+    # Nullable, so existing rows just read as "scored by an unknown prompt" and get re-scored
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("leads")}
+    for name, type_ in COLUMNS.items():
+        if name not in existing:
+            op.add_column("leads", sa.Column(name, type_(), nullable=True))
+
+
+def downgrade():
+    for name in reversed(list(COLUMNS)):
+        op.drop_column("leads", name)
@@ -1,77 +1,345 @@
-import openai
+import asyncio
 import os
 import json
+import random
 import time
-from backend.app.metrics import AI_SCORING_LATENCY
-from aiocache import cached, Cache
-from backend.app.database import SessionLocal
-from backend.app.models import PromptHistory
+import httpx
+from backend.app.logging_config import get_logger
+from backend.app.metrics import (AI_SCORING_LATENCY, OPENAI_TOKENS, PRECLASSIFIER_AGREEMENT, PRECLASSIFIER_DECISIONS,
+                                 SEMANTIC_CACHE_AGREEMENT, SEMANTIC_CACHE_SCORE_DELTA)
+from backend.app.preclassifier import PreClassifier
+from backend.app.rate_limit import LLMRateLimiter, estimate_tokens
+from backend.app.score_cache import ScoreCache, score_cache_key
+from backend.app.semantic_cache import SEMANTIC_CACHE_THRESHOLD, SemanticIndex
+from backend.app.prompt_history import prompt_history_sink
+
+logger = get_logger(__name__)
+
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "30"))
+# Share of locally decided e-mails also sent to the LLM to measure agreement
+PRECLASSIFIER_SHADOW_RATE = float(os.getenv("PRECLASSIFIER_SHADOW_RATE", "0.02"))
+# Share of near-duplicate reuses still sent to the LLM to measure agreement
+SEMANTIC_CACHE_SHADOW_RATE = float(os.getenv("SEMANTIC_CACHE_SHADOW_RATE", "0.02"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# Bump whenever the prompt text changes so cached scores are not reused
+PROMPT_VERSION = "v1"
+
+
+class FallbackScore(tuple):
+    """(0.0, "NEW") answered in place of a score when the LLM fails; not what the model or prompt decided."""
+
+
+FALLBACK_SCORE = FallbackScore((0.0, "NEW"))
+
+
+def is_fallback(result) -> bool:
+    """True for the placeholder score_email answers on an LLM failure with fallback_on_error."""
+    return isinstance(result, FallbackScore)
 
 class Scorer:
-    def __init__(self, model="gpt-4o-mini", temperature=0.0):
+    def __init__(self, model=OPENAI_MODEL, temperature=0.0, base_url=None,
+                 max_concurrency=OPENAI_MAX_CONCURRENCY, max_retries=OPENAI_MAX_RETRIES,
+                 timeout=OPENAI_TIMEOUT, transport=None, cache=None, rate_limiter=None,
+                 semantic_index=None, semantic_shadow_rate=SEMANTIC_CACHE_SHADOW_RATE, fallback_on_error=True):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model = model
         self.temperature = temperature
-        self.prompt = """You are an SDR assistant. 
-Classify the following e-mail into Hot (score 0.9), Warm (0.6) or Cold (0.2) 
+        self.base_url = base_url or OPENAI_BASE_URL
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.transport = transport  # e.g. httpx.MockTransport for a local stub
+        self.cache = cache if cache is not None else ScoreCache()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else LLMRateLimiter()
+        self.prompt_version = PROMPT_VERSION
+        if semantic_index is None and SEMANTIC_CACHE_THRESHOLD > 0:
+            semantic_index = SemanticIndex.load(namespace=f"{self.model}:{self.prompt_version}")
+        self.semantic = semantic_index  # None disables near-duplicate reuse
+        self.semantic_shadow_rate = semantic_shadow_rate
+        # False raises on LLM failures instead of answering FALLBACK_SCORE, for callers that overwrite a known score
+        self.fallback_on_error = fallback_on_error
+        self.usage = {"prompt_tokens": 0, "completion_tokens": 0}  # reported by the API, for spend budgets
+        self.prompt = """You are an SDR assistant.
+Classify the following e-mail into Hot (score 0.9), Warm (0.6) or Cold (0.2)
 and output JSON with fields: score and stage ("QUALIFIED" if score
 0.6 else "NEW")."""
+        self.batch_prompt = self.prompt + """
+You will receive several numbered e-mails. Output JSON with a field "results":
+a list with one object per e-mail containing index, score and stage."""
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # The pool and the semaphore belong to the loop that created them, so a
+        # new loop gets fresh ones. Celery tasks share one long-lived loop per
+        # thread (worker.tasks.run_async) and close the client at shutdown.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def aclose(self):
+        if self.semantic is not None:
+            self.semantic.save()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _backoff(self, attempt: int, response: httpx.Response | None) -> float:
+        if response is not None and "retry-after" in response.headers:
+            try:
+                return float(response.headers["retry-after"])
+            except ValueError:
+                pass
+        # Full jitter keeps retrying workers from hitting the API in lockstep
+        return random.uniform(0, min(20.0, 0.5 * 2 ** attempt))
+
+    async def _chat(self, system_prompt: str, content: str) -> str:
+        client = self._get_client()
+        payload = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": content}
+            ],
+            "temperature": self.temperature,
+            "response_format": {"type": "json_object"},
+        }
+        tokens = estimate_tokens(system_prompt, content)
+        for attempt in range(self.max_retries + 1):
+            response = None
+            # Wait for fleet-wide RPM/TPM room before taking a concurrency slot
+            await self.rate_limiter.acquire(tokens)
+            try:
+                async with self._semaphore:
+                    response = await client.post("/chat/completions", json=payload)
+                if response.status_code not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    data = response.json()
+                    self._record_usage(data.get("usage"))
+                    return data["choices"][0]["message"]["content"]
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+            except httpx.TransportError:
+                if attempt == self.max_retries:
+                    raise
+            await asyncio.sleep(self._backoff(attempt, response))
+
+    def _record_usage(self, usage: dict | None):
+        if not usage:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            self.usage[kind] += usage.get(kind, 0)
+            OPENAI_TOKENS.labels(model=self.model, kind=kind.removesuffix("_tokens")).inc(usage.get(kind, 0))
+
+    def _save_history(self, content: str, response: str, system_prompt: str | None = None):
+        # Queued for a bulk insert off the scoring path
+        prompt_history_sink.record(
+            prompt="User Content: " + content,
+            template=system_prompt or self.prompt,
+            response=response,
+            model_used=self.model
+        )
+
+    def _cache_key(self, subject: str, body: str) -> str:
+        return score_cache_key(self.model, self.prompt_version, subject, body)
+
+    def _similar(self, subject: str, body: str):
+        """Embedding of the e-mail and the near-duplicate whose score may be reused, if any."""
+        if self.semantic is None:
+            return None, None
+        vector = self.semantic.embed(subject, body)
+        return vector, self.semantic.lookup(vector)
+
+    def _remember(self, vector, result: tuple[float, str], match=None):
+        if self.semantic is None or vector is None:
+            return
+        if match is not None:
+            # A shadow-scored reuse: compare the stored answer with the fresh one
+            SEMANTIC_CACHE_AGREEMENT.labels(agreed=str(match.stage == result[1]).lower()).inc()
+            SEMANTIC_CACHE_SCORE_DELTA.observe(abs(match.score - result[0]))
+        self.semantic.add(vector, *result)
 
-    @cached(ttl=3600, cache=Cache.REDIS, key_builder=lambda f, *args, **kwargs: f"ai_score:{kwargs.get('subject')}:{kwargs.get('body')}") # Cache for 1 hour
     async def score_email(self, subject: str, body: str) -> tuple[float, str]:
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY environment variable not set.")
-        openai.api_key = self.api_key
+
+        cache_key = self._cache_key(subject, body)
+        cached = await self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        vector, match = self._similar(subject, body)
+        if match is not None and random.random() >= self.semantic_shadow_rate:
+            return match.score, match.stage
 
         content = f"""Subject: {subject}
 Body: {body}"""
         start_time = time.time()
-        response_content = ""
         try:
-            resp = openai.ChatCompletion.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": self.prompt},
-                    {"role": "user", "content": content}
-                ],
-                temperature=self.temperature,
-                response_format={"type": "json_object"},
-            )
-            response_content = resp.choices[0].message.content
+            response_content = await self._chat(self.prompt, content)
             data = json.loads(response_content)
             AI_SCORING_LATENCY.labels(model=self.model).observe(time.time() - start_time)
-            
-            # Persist prompt history
-            db = SessionLocal()
-            prompt_history = PromptHistory(
-                prompt={"prompt": self.prompt + "User Content: " + content},
-                response=response_content,
-                model_used=self.model
-            )
-            db.add(prompt_history)
-            db.commit()
-            db.close()
-
-            return float(data["score"]), data["stage"]
+            self._save_history(content, response_content)
+            result = (float(data["score"]), data["stage"])
+            await self.cache.set(cache_key, result)
+            self._remember(vector, result, match)
+            return result
         except Exception as e:
-            # In a real app, you'd have more robust error handling and logging
-            print(f"Error scoring email: {e}")
+            logger.warning("Error scoring email", model=self.model, exc_info=True)
             AI_SCORING_LATENCY.labels(model=self.model).observe(time.time() - start_time)
-            
             # Persist prompt history even on error
-            db = SessionLocal()
-            prompt_history = PromptHistory(
-                prompt={"prompt": self.prompt + "User Content: " + content},
-                response=f"ERROR: {e}",
-                model_used=self.model
+            self._save_history(content, f"ERROR: {e}")
+            if match is not None:
+                return match.score, match.stage
+            if not self.fallback_on_error:
+                raise
+            return FALLBACK_SCORE
+
+    async def score_many(self, emails: list[dict], pack_size: int = 1,
+                         return_exceptions: bool = False) -> list[tuple[float, str]]:
+        """
+        Scores a batch of {"subject", "body"} dicts concurrently, bounded by
+        max_concurrency. With pack_size > 1, groups of e-mails share one prompt;
+        e-mails missing from a packed answer are scored on their own. Exact
+        and near-duplicate cache hits are never sent to the LLM. With
+        return_exceptions, a failing e-mail yields its exception instead of
+        failing the whole batch.
+        """
+        if not self.api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set.")
+        if pack_size <= 1:
+            return list(await asyncio.gather(
+                *(self.score_email(subject=e["subject"], body=e["body"]) for e in emails),
+                return_exceptions=return_exceptions
+            ))
+        keys = [self._cache_key(e["subject"], e["body"]) for e in emails]
+        results = list(await asyncio.gather(*(self.cache.get(key) for key in keys)))
+        pending, similar = [], {}
+        for i, result in enumerate(results):
+            if result is not None:
+                continue
+            vector, match = self._similar(emails[i]["subject"], emails[i]["body"])
+            if match is not None and random.random() >= self.semantic_shadow_rate:
+                results[i] = (match.score, match.stage)
+                continue
+            pending.append(i)
+            similar[i] = (vector, match)
+        chunks = [pending[i:i + pack_size] for i in range(0, len(pending), pack_size)]
+        scored = await asyncio.gather(*(self._score_packed([emails[j] for j in chunk], [similar[j] for j in chunk])
+                                        for chunk in chunks),
+                                      return_exceptions=return_exceptions)
+        for chunk, chunk_results in zip(chunks, scored):
+            for n, j in enumerate(chunk):
+                results[j] = chunk_results if isinstance(chunk_results, BaseException) else chunk_results[n]
+        return results
+
+    async def _score_packed(self, emails: list[dict], similar: list | None = None) -> list[tuple[float, str]]:
+        similar = similar or [(None, None)] * len(emails)
+        content = "\n\n".join(
+            f"E-mail {i}:\nSubject: {e['subject']}\nBody: {e['body']}" for i, e in enumerate(emails)
+        )
+        start_time = time.time()
+        scored = {}
+        try:
+            response_content = await self._chat(self.batch_prompt, content)
+            for item in json.loads(response_content).get("results", []):
+                index = int(item["index"])
+                if 0 <= index < len(emails):
+                    scored[index] = (float(item["score"]), item["stage"])
+                    await self.cache.set(self._cache_key(emails[index]["subject"], emails[index]["body"]), scored[index])
+                    vector, match = similar[index]
+                    self._remember(vector, scored[index], match)
+            AI_SCORING_LATENCY.labels(model=self.model).observe(time.time() - start_time)
+            self._save_history(content, response_content, self.batch_prompt)
+        except Exception as e:
+            logger.warning("Error scoring packed e-mails", model=self.model, emails=len(emails), exc_info=True)
+            AI_SCORING_LATENCY.labels(model=self.model).observe(time.time() - start_time)
+            self._save_history(content, f"ERROR: {e}", self.batch_prompt)
+        missing = [i for i in range(len(emails)) if i not in scored]
+        if missing:
+            fallback = await asyncio.gather(
+                *(self.score_email(subject=emails[i]["subject"], body=emails[i]["body"]) for i in missing)
             )
-            db.add(prompt_history)
-            db.commit()
-            db.close()
+            scored.update(zip(missing, fallback))
+        return [scored[i] for i in range(len(emails))]
+
+class TieredScorer:
+    """
+    Tries the local PreClassifier first and only calls the LLM scorer for
+    e-mails it is not confident about. A PRECLASSIFIER_SHADOW_RATE sample of
+    local decisions is also scored by the LLM to track agreement.
+    """
+
+    def __init__(self, scorer: Scorer, preclassifier: PreClassifier | None = None,
+                 shadow_rate: float = PRECLASSIFIER_SHADOW_RATE):
+        self.scorer = scorer
+        self._preclassifier = preclassifier
+        self.shadow_rate = shadow_rate
+
+    @property
+    def preclassifier(self) -> PreClassifier:
+        # Loaded on first use: unpickling the model imports scikit-learn
+        if self._preclassifier is None:
+            self._preclassifier = PreClassifier.load()
+        return self._preclassifier
+
+    async def score_email(self, subject: str, body: str, sender: str = "") -> tuple[float, str]:
+        decision = self.preclassifier.classify(sender, subject, body)
+        if decision is None:
+            PRECLASSIFIER_DECISIONS.labels(tier="llm").inc()
+            return await self.scorer.score_email(subject=subject, body=body)
+        PRECLASSIFIER_DECISIONS.labels(tier=decision.tier).inc()
+        if random.random() < self.shadow_rate:
+            await self._shadow(decision, subject, body)
+        return decision.score, decision.stage
+
+    async def _shadow(self, decision, subject: str, body: str):
+        _, llm_stage = await self.scorer.score_email(subject=subject, body=body)
+        PRECLASSIFIER_AGREEMENT.labels(tier=decision.tier, agreed=str(llm_stage == decision.stage).lower()).inc()
+
+    async def score_many(self, emails: list[dict], pack_size: int = 1,
+                         return_exceptions: bool = False) -> list[tuple[float, str]]:
+        results, undecided, shadows = [None] * len(emails), [], []
+        for i, e in enumerate(emails):
+            decision = self.preclassifier.classify(e.get("sender", ""), e["subject"], e["body"])
+            if decision is None:
+                undecided.append(i)
+                continue
+            PRECLASSIFIER_DECISIONS.labels(tier=decision.tier).inc()
+            results[i] = (decision.score, decision.stage)
+            if random.random() < self.shadow_rate:
+                shadows.append(self._shadow(decision, e["subject"], e["body"]))
+        if shadows:
+            await asyncio.gather(*shadows, return_exceptions=True)
+        if undecided:
+            PRECLASSIFIER_DECISIONS.labels(tier="llm").inc(len(undecided))
+            scored = await self.scorer.score_many([emails[i] for i in undecided], pack_size, return_exceptions)
+            for i, result in zip(undecided, scored):
+                results[i] = result
+        return results
 
-            return 0.0, "NEW"
+_default_scorer: Scorer | None = None
 
 # For compatibility with the old code
 async def score_email(subject: str, body: str) -> tuple[float, str]:
-    scorer = Scorer()
-    return await scorer.score_email(subject, body)
+    # One instance, so its HTTP pool and caches are reused across calls
+    global _default_scorer
+    if _default_scorer is None:
+        _default_scorer = Scorer()
+    return await _default_scorer.score_email(subject=subject, body=body)
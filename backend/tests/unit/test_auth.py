@@ -0,0 +1,53 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from backend.app import auth
+
+
+@pytest.fixture(autouse=True)
+def clear_claims_cache():
+    auth._claims_cache.clear()
+
+
+def test_verified_claims_are_cached(monkeypatch):
+    token = auth.create_access_token({"sub": "test"}, timedelta(minutes=5))
+    decodes = []
+    real_decode = auth.jwt.decode
+    monkeypatch.setattr(auth.jwt, "decode", lambda *a, **kw: decodes.append(1) or real_decode(*a, **kw))
+
+    for _ in range(3):
+        assert asyncio.run(auth.get_current_user(token)) == {"username": "test"}
+    assert len(decodes) == 1
+
+
+def test_cached_claims_expire_with_the_token():
+    token = auth.jwt.encode({"sub": "test", "exp": int(time.time()) + 1}, auth.SECRET_KEY, algorithm=auth.ALGORITHM)
+    assert auth.decode_token(token)["sub"] == "test"
+    time.sleep(2.1)  # jose compares whole seconds
+    with pytest.raises(auth.JWTError):
+        auth.decode_token(token)
+
+
+def test_invalid_token_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        asyncio.run(auth.get_current_user("not-a-token"))
+    assert excinfo.value.status_code == 401
+    assert len(auth._claims_cache) == 0
+
+
+def test_password_hash_is_computed_once(monkeypatch):
+    monkeypatch.setattr(auth, "_password_hashes", {})
+    hashes = []
+    real_hash = auth.get_password_hash
+    monkeypatch.setattr(auth, "get_password_hash", lambda password: hashes.append(1) or real_hash(password))
+
+    async def logins():
+        return [await auth.authenticate_user("test", "test"), await auth.authenticate_user("test", "wrong"),
+                await auth.authenticate_user("nobody", "test")]
+
+    assert asyncio.run(logins()) == [True, False, False]
+    assert len(hashes) == 1
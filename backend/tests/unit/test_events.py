@@ -0,0 +1,27 @@
+import json
+from datetime import datetime
+
+from backend.app import events
+from backend.app.board import card_from_lead
+from backend.app.events import card_event, decode_event, encode_event, lead_event
+
+
+def test_card_event_leaves_out_the_body():
+    card = card_from_lead({"id": 7, "sender": "ana@acme.com", "subject": "Quote", "body": "long text",
+                           "score": 0.9, "stage": "QUALIFIED", "created_at": datetime(2026, 1, 2, 3, 4, 5)})
+    event = json.loads(decode_event(encode_event(card_event(card))))
+    assert event == {"id": 7, "version": 1, "sender": "ana@acme.com", "subject": "Quote", "score": 0.9,
+                     "stage": "QUALIFIED", "created_at": "2026-01-02T03:04:05"}
+
+
+def test_large_events_are_stored_compressed(monkeypatch):
+    monkeypatch.setattr(events, "LEAD_EVENT_GZIP_THRESHOLD", 100)
+    small = encode_event(lead_event(1, 2, stage="WON"))
+    large = encode_event(lead_event(1, 3, entities={"noun_phrases": ["pricing"] * 50}))
+    assert list(small) == ["data"] and list(large) == ["gz"]
+    assert len(large["gz"]) < 100
+
+    # As read back by a binary client, and as older plain entries read by a decoding one
+    as_bytes = {k.encode(): v for k, v in large.items()}
+    assert json.loads(decode_event(as_bytes))["entities"]["noun_phrases"] == ["pricing"] * 50
+    assert json.loads(decode_event({"data": '{"id": 1}'})) == {"id": 1}
@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+from aiocache import caches
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from backend.app import auth, database, graphql
+from backend.app.board import card_from_lead, lead_board
+from backend.app.database import Base
+from backend.app.events import decode_event
+from backend.app.models import Lead
+
+QUERY = """
+query ($after: String) {
+  leads(first: 2, after: $after, orderBy: SCORE) {
+    edges { node { id sender score } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+class Request:
+    def __init__(self, token):
+        self.headers = {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def redis_server(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(graphql, "get_async_redis", lambda: fakeredis.FakeAsyncRedis(server=server))
+    return server
+
+
+@pytest.fixture
+def context(monkeypatch, redis_server):
+    caches.set_config({"default": {"cache": "aiocache.SimpleMemoryCache",
+                                   "serializer": {"class": "aiocache.serializers.JsonSerializer"}}})
+    return {"request": Request(auth.create_access_token({"sub": "test"}))}
+
+
+async def seed(monkeypatch):
+    # One loop per test: aiosqlite connections must stay on the loop that opened them
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    monkeypatch.setattr(database, "AsyncSessionLocal", session_factory)
+    async with session_factory() as db:
+        for i, score in enumerate([0.2, 0.9, 0.6, 0.6]):
+            db.add(Lead(email_id=f"m{i}", sender=f"s{i}@acme.com", subject="Hi", body="x" * 1000, score=score))
+        await db.commit()
+
+
+async def leads(query, context, **variables):
+    result = await graphql.schema.execute(query, variable_values=variables, context_value=context)
+    assert result.errors is None, result.errors
+    return result.data["leads"]
+
+
+def test_leads_are_paginated_by_score_with_cursor(context, monkeypatch):
+    async def scenario():
+        await seed(monkeypatch)
+        first = await leads(QUERY, context)
+        second = await leads(QUERY, context, after=first["pageInfo"]["endCursor"])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [e["node"]["score"] for e in first["edges"]] == [0.9, 0.6]
+    assert first["pageInfo"]["hasNextPage"]
+    assert [e["node"]["score"] for e in second["edges"]] == [0.6, 0.2]
+    assert not second["pageInfo"]["hasNextPage"]
+    ids = [e["node"]["id"] for e in first["edges"] + second["edges"]]
+    assert len(set(ids)) == 4
+
+
+def test_only_selected_columns_are_loaded(monkeypatch):
+    async def scenario():
+        await seed(monkeypatch)
+        return await graphql._fetch_page(None, 10, None, graphql.LeadOrder.CREATED_AT, ["sender"])
+
+    page = asyncio.run(scenario())
+    assert len(page["edges"]) == 4
+    assert all(set(edge["node"]) == {"sender"} for edge in page["edges"])
+
+
+@pytest.mark.parametrize("query", [
+    "fragment LeadFields on Lead { sender score } "
+    "query { leads(orderBy: SCORE) { ... on LeadConnection { edges { node { id ...LeadFields } } } } }",
+    "{ leads(orderBy: SCORE) { edges { node { id ... on Lead { sender score } } } } }",
+])
+def test_fragments_select_their_columns(context, monkeypatch, query):
+    async def scenario():
+        await seed(monkeypatch)
+        return await leads(query, context)
+
+    page = asyncio.run(scenario())
+    assert [(e["node"]["sender"], e["node"]["score"]) for e in page["edges"]][:2] == \
+        [("s1@acme.com", 0.9), ("s3@acme.com", 0.6)]
+
+
+def test_update_lead_stage_moves_lead(context, monkeypatch):
+    mutation = 'mutation { updateLeadStage(leadId: 2, newStage: "WON") { id stage } }'
+
+    async def scenario():
+        await seed(monkeypatch)
+        result = await graphql.schema.execute(mutation, context_value=context)
+        won = await leads('{ leads(stage: "WON") { edges { node { id } } } }', context)
+        return result, won
+
+    result, won = asyncio.run(scenario())
+    assert result.data["updateLeadStage"] == {"id": 2, "stage": "WON"}
+    assert [e["node"]["id"] for e in won["edges"]] == [2]
+
+
+def test_board_serves_pages_without_the_database(context, monkeypatch, redis_server):
+    mutation = 'mutation { updateLeadStage(leadId: 2, newStage: "WON") { id stage } }'
+
+    async def scenario():
+        await seed(monkeypatch)
+        from_db = await leads(QUERY, context)
+        async with database.AsyncSessionLocal() as db:
+            cards = [card_from_lead(lead) for lead in (await db.scalars(select(Lead))).all()]
+        lead_board.rebuild(fakeredis.FakeRedis(server=redis_server), cards)
+        await graphql.schema.execute(mutation, context_value=context)
+
+        async def no_database(*args):
+            raise AssertionError("board pages must not query the database")
+        monkeypatch.setattr(graphql, "_fetch_page", no_database)
+        first = await leads(QUERY, context)
+        second = await leads(QUERY, context, after=first["pageInfo"]["endCursor"])
+        won = await leads('{ leads(stage: "WON") { edges { node { id stage } } } }', context)
+        new = await leads('{ leads(stage: "NEW") { edges { node { id } } } }', context)
+        return from_db, first, second, won, new
+
+    from_db, first, second, won, new = asyncio.run(scenario())
+    assert first == from_db
+    assert [e["node"]["score"] for e in second["edges"]] == [0.6, 0.2]
+    assert won["edges"] == [{"node": {"id": 2, "stage": "WON"}}]
+    assert sorted(e["node"]["id"] for e in new["edges"]) == [1, 3, 4]
+    # Other boards get just the stage change, at the lead's new version
+    [(_, fields)] = fakeredis.FakeRedis(server=redis_server).xrange("lead_updates")
+    assert json.loads(decode_event(fields)) == {"id": 2, "version": 2, "stage": "WON"}
+
+
+def test_leads_requires_token(context):
+    result = asyncio.run(graphql.schema.execute("{ leads { edges { node { id } } } }",
+                                                context_value={"request": Request("")}))
+    assert result.errors
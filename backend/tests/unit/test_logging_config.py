@@ -0,0 +1,83 @@
+import io
+import json
+import logging
+
+import pytest
+import structlog
+
+from backend.app import logging_config
+from backend.app.logging_config import BackgroundLogHandler, EventSampler, parse_event_settings
+
+
+def test_parse_event_settings():
+    assert parse_event_settings("Request finished=0.1, Email batch classified = 5,") == \
+        {"Request finished": 0.1, "Email batch classified": 5.0}
+    assert parse_event_settings("") == {}
+
+
+def test_sampler_samples_and_caps_info_events_only(monkeypatch):
+    sampler = EventSampler({"Request finished": 0.5}, {"Lead stored": 2})
+    monkeypatch.setattr(logging_config.random, "random", lambda: 0.7)
+    with pytest.raises(structlog.DropEvent):
+        sampler(None, "info", {"event": "Request finished"})
+    assert sampler(None, "warning", {"event": "Request finished"}) == {"event": "Request finished"}
+    monkeypatch.setattr(logging_config.random, "random", lambda: 0.2)
+    assert sampler(None, "info", {"event": "Request finished"})["sample_rate"] == 0.5
+
+    kept = 0
+    for _ in range(5):
+        try:
+            sampler(None, "info", {"event": "Lead stored"})
+            kept += 1
+        except structlog.DropEvent:
+            pass
+    assert kept == 2
+    sampler(None, "error", {"event": "Lead stored"})
+
+
+def test_handler_writes_on_background_thread_and_flushes_on_close():
+    stream = io.StringIO()
+    handler = BackgroundLogHandler([logging.StreamHandler(stream)], max_queue=100)
+    logger = logging.getLogger("test_background_log_handler")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        for i in range(50):
+            logger.warning("record %d", i)
+        assert handler._listener._thread is not None
+        handler.close()
+        assert stream.getvalue().splitlines() == [f"record {i}" for i in range(50)]
+        logger.warning("after close")
+        assert stream.getvalue().splitlines()[-1] == "after close"
+    finally:
+        logger.removeHandler(handler)
+
+
+def test_full_queue_drops_info_records():
+    stream = io.StringIO()
+    handler = BackgroundLogHandler([logging.StreamHandler(stream)], max_queue=1, put_timeout=0)
+    handler._ensure_started()
+    handler._listener.stop()  # nothing drains the queue now
+    handler._listener = None
+    dropped = logging_config.LOG_EVENTS_DROPPED.labels(reason="queue_full")
+    before = dropped._value.get()
+    for _ in range(3):
+        handler.emit(logging.makeLogRecord({"msg": "busy", "levelno": logging.INFO}))
+    assert dropped._value.get() == before + 2
+
+
+def test_configure_logging_renders_json_with_context():
+    stream = io.StringIO()
+    logging_config.configure_logging(stream)
+    try:
+        with structlog.contextvars.bound_contextvars(correlation_id="abc"):
+            structlog.get_logger("test").info("Lead stored", lead_id=7, tags={1, 2})
+        logging.getLogger("some.library").info("plain %s", "record")
+        logging_config.shutdown_logging()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert lines[0]["event"] == "Lead stored"
+        assert (lines[0]["correlation_id"], lines[0]["lead_id"], lines[0]["level"]) == ("abc", 7, "info")
+        assert lines[1]["event"] == "plain record"
+        assert lines[1]["logger"] == "some.library"
+    finally:
+        logging_config.configure_logging()
@@ -0,0 +1,43 @@
+import pytest
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+from backend.app import observability
+from backend.app.metrics import PIPELINE_STAGE_LATENCY
+
+
+def observed(stage):
+    return PIPELINE_STAGE_LATENCY.labels(stage=stage)._sum.get()
+
+
+def test_stage_timer_records_histogram_and_child_span(monkeypatch):
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    monkeypatch.setattr(observability, "tracer", provider.get_tracer("test"))
+
+    before = observed("test_stage")
+    with observability.tracer.start_as_current_span("task"):
+        with observability.stage_timer("test_stage", emails=3):
+            pass
+        with pytest.raises(ValueError):
+            with observability.stage_timer("test_stage"):
+                raise ValueError
+
+    assert observed("test_stage") > before
+    ok, failed, task = exporter.get_finished_spans()
+    assert [ok.name, failed.name] == ["stage.test_stage"] * 2
+    assert ok.parent.span_id == failed.parent.span_id == task.context.span_id
+    assert ok.attributes["emails"] == 3
+    assert not failed.status.is_ok
+
+
+def test_stage_timer_as_decorator():
+    @observability.stage_timer("decorated")
+    def work():
+        return 42
+
+    before = observed("decorated")
+    assert work() == 42
+    assert observed("decorated") > before
@@ -0,0 +1,10 @@
+from datetime import datetime
+
+from backend.app.partitions import add_months, partition_name
+
+
+def test_month_arithmetic_and_names():
+    assert add_months(datetime(2026, 10, 18, 12), 0) == datetime(2026, 10, 1)
+    assert add_months(datetime(2026, 11, 30), 3) == datetime(2027, 2, 1)
+    assert add_months(datetime(2026, 1, 15), -6) == datetime(2025, 7, 1)
+    assert partition_name(datetime(2026, 3, 1)) == "prompt_history_y2026m03"
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from backend.app.preclassifier import COLD, HOT, PreClassifier, label_for_score, train, training_examples
+
+
+@pytest.mark.parametrize("sender,subject,body,reason", [
+    ("MAILER-DAEMON@mail.example.com", "Returned mail", "", "bounce"),
+    ("ana@acme.com", "Automatic reply: Proposal", "I am away until Monday", "auto_reply"),
+    ("Acme <no-reply@acme.com>", "Our spring release", "", "newsletter"),
+    ("news@acme.com", "Weekly digest", "", "newsletter"),
+    ("ana@acme.com", "Digest", "Click here to unsubscribe", "newsletter"),
+])
+def test_rules_mark_non_leads_cold(sender, subject, body, reason):
+    decision = PreClassifier().classify(sender, subject, body)
+    assert (decision.stage, decision.tier, decision.reason) == ("NEW", "rules", reason)
+
+
+def test_without_model_real_mail_goes_to_llm():
+    assert PreClassifier().classify("ana@acme.com", "Pricing for 200 seats", "Can we talk?") is None
+
+
+def test_model_only_decides_above_threshold():
+    texts = ["need a quote for licenses pricing"] * 20 + ["thanks, not interested right now"] * 20 + \
+            ["maybe later, send info"] * 20
+    labels = [HOT] * 20 + [COLD] * 20 + ["warm"] * 20
+    model = train(texts, labels)
+
+    confident = PreClassifier(model=model, hot_threshold=0.5)
+    decision = confident.classify("ana@acme.com", "need a quote", "for licenses pricing")
+    assert (decision.score, decision.stage, decision.tier) == (0.9, "QUALIFIED", "model")
+    # Warm is never decided locally, and nothing passes an unreachable threshold
+    assert confident.classify("ana@acme.com", "maybe later", "send info") is None
+    strict = PreClassifier(model=model, hot_threshold=1.01, cold_threshold=1.01)
+    assert strict.classify("ana@acme.com", "need a quote", "for licenses pricing") is None
+
+
+def test_training_examples_use_single_email_answers():
+    prompt = "You are an SDR assistant.User Content: Subject: Quote\nBody: Line one\nLine two"
+    rows = [
+        (prompt, json.dumps({"score": 0.9, "stage": "QUALIFIED"})),
+        (prompt, "ERROR: timeout"),
+        ("Packed.User Content: E-mail 0:\nSubject: a\nBody: b", json.dumps({"score": 0.2})),
+        (prompt, "not json"),
+    ]
+    texts, labels = training_examples(rows)
+    assert texts == ["Quote\nLine one\nLine two"]
+    assert labels == [HOT]
+    assert label_for_score(0.2) == COLD
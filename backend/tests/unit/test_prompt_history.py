@@ -0,0 +1,50 @@
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.app.models import PromptHistory, PromptTemplate
+from backend.app.prompt_history import PromptHistorySink
+
+
+def make_sink(**kwargs):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    PromptTemplate.__table__.create(engine)
+    PromptHistory.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+    return PromptHistorySink(session_factory=session_factory, **kwargs), session_factory
+
+
+def count_rows(session_factory):
+    with session_factory() as db:
+        return db.scalar(select(func.count()).select_from(PromptHistory))
+
+
+def test_close_flushes_pending_records():
+    sink, session_factory = make_sink(batch_size=100, flush_interval=60)
+    for i in range(5):
+        sink.record(prompt=f"prompt {i}", response="{}", model_used="gpt-4o-mini")
+    assert count_rows(session_factory) == 0
+    sink.close()
+    assert count_rows(session_factory) == 5
+
+
+def test_flushes_when_batch_is_full():
+    sink, session_factory = make_sink(batch_size=3, flush_interval=60)
+    for i in range(3):
+        sink.record(prompt=f"prompt {i}", response="{}", model_used="gpt-4o-mini")
+    sink._thread.join(0.5)
+    assert count_rows(session_factory) == 3
+    sink.close()
+
+
+def test_system_prompts_are_stored_once():
+    sink, session_factory = make_sink(batch_size=2, flush_interval=60)
+    for i in range(5):
+        sink.record(prompt=f"User Content: {i}", response="{}", model_used="gpt-4o-mini", template="system A")
+    sink.record(prompt="User Content: 5", response="{}", model_used="gpt-4o-mini", template="system B")
+    sink.close()
+    with session_factory() as db:
+        templates = dict(db.execute(select(PromptTemplate.text, PromptTemplate.id)).all())
+        used = db.execute(select(PromptHistory.template_id, func.count()).group_by(PromptHistory.template_id)).all()
+    assert sorted(templates) == ["system A", "system B"]
+    assert dict(used) == {templates["system A"]: 5, templates["system B"]: 1}
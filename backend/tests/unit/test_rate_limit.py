@@ -0,0 +1,78 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from backend.app import rate_limit
+from backend.app.rate_limit import LLMRateLimiter, estimate_tokens
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(rate_limit, "get_async_redis", lambda url=None: client)
+    return client
+
+
+def test_disabled_limiter_never_touches_redis(monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_async_redis", lambda url=None: pytest.fail("redis used"))
+    assert asyncio.run(LLMRateLimiter(rpm=0, tpm=0).acquire(100)) == 0.0
+
+
+def test_requests_beyond_the_rpm_budget_wait(fake_redis, monkeypatch):
+    sleeps = []
+
+    async def fake_sleep(delay):
+        sleeps.append(delay)
+        # Let the bucket refill as if the time had passed
+        await fake_redis.hset("ratelimit:test:rpm", "ts", 0)
+
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", fake_sleep)
+    limiter = LLMRateLimiter(rpm=2, tpm=10_000, key="test")
+
+    async def run():
+        return [await limiter.acquire(10) for _ in range(3)]
+
+    waited = asyncio.run(run())
+    assert waited[:2] == [0.0, 0.0]
+    assert waited[2] > 0 and len(sleeps) == 1
+    assert 0 < sleeps[0] <= 30  # one request at 2 rpm frees up within 30s
+
+
+def test_token_budget_is_shared_between_limiters(fake_redis, monkeypatch):
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", lambda delay: real_sleep(0))
+    first = LLMRateLimiter(rpm=100, tpm=1000, key="shared", max_wait=0.5)
+    second = LLMRateLimiter(rpm=100, tpm=1000, key="shared", max_wait=0.5)
+
+    async def run():
+        return await first.acquire(900), await second.acquire(900)
+
+    assert asyncio.run(run()) == (0.0, 0.5)  # the second worker gives up waiting at max_wait
+
+
+@pytest.mark.parametrize("rpm, tpm, tokens, bucket", [(2, 0, 10, "rpm"), (0, 1000, 600, "tpm")])
+def test_a_single_limit_is_enforced_alone(fake_redis, monkeypatch, rpm, tpm, tokens, bucket):
+    real_sleep = asyncio.sleep
+    monkeypatch.setattr(rate_limit.asyncio, "sleep", lambda delay: real_sleep(0))
+    limiter = LLMRateLimiter(rpm=rpm, tpm=tpm, key="single", max_wait=0.5)
+
+    async def run():
+        return [await limiter.acquire(tokens) for _ in range(3)]
+
+    waited = asyncio.run(run())
+    assert waited[0] == 0.0 and waited[-1] == 0.5
+    assert asyncio.run(fake_redis.keys("ratelimit:single:*")) == [f"ratelimit:single:{bucket}".encode()]
+
+
+def test_redis_errors_fail_open(monkeypatch):
+    class Broken:
+        async def eval(self, *args):
+            raise rate_limit.redis.ConnectionError("down")
+
+    monkeypatch.setattr(rate_limit, "get_async_redis", lambda url=None: Broken())
+    assert asyncio.run(LLMRateLimiter(rpm=1, tpm=1).acquire(10)) == 0.0
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("a" * 400, "b" * 400, completion=50) == 250
@@ -0,0 +1,65 @@
+import asyncio
+
+import fakeredis
+
+from backend.app import redis_pool
+from backend.app.metrics import REDIS_POOL_IN_USE, REDIS_POOL_WAIT
+
+
+def in_use(pool):
+    return REDIS_POOL_IN_USE.labels(pool=pool)._value.get()
+
+
+def test_sync_pool_is_shared_and_metered():
+    client = redis_pool.get_redis("redis://shared-test:6379/1")
+    assert redis_pool.get_redis("redis://shared-test:6379/1") is client
+    assert redis_pool.get_redis("redis://shared-test:6379/1", decode_responses=True) is not client
+
+    pool = redis_pool.MeteredConnectionPool(connection_class=fakeredis.FakeRedisConnection,
+                                            server=fakeredis.FakeServer(), max_connections=2)
+    before, waits = in_use("sync"), REDIS_POOL_WAIT.labels(pool="sync")._sum.get()
+    connection = pool.get_connection()
+    assert in_use("sync") == before + 1
+    pool.release(connection)
+    assert in_use("sync") == before
+    assert REDIS_POOL_WAIT.labels(pool="sync")._sum.get() >= waits
+
+
+def test_pipeline_sends_once_on_success_only():
+    client = fakeredis.FakeRedis()
+    with redis_pool.pipeline(client) as pipe:
+        pipe.set("a", 1)
+        pipe.set("b", 2)
+        assert client.get("a") is None
+    assert client.mget("a", "b") == [b"1", b"2"]
+
+    try:
+        with redis_pool.pipeline(client) as pipe:
+            pipe.set("c", 3)
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert client.get("c") is None
+
+
+def test_async_clients_are_per_loop():
+    async def client():
+        first = redis_pool.get_async_redis("redis://shared-test:6379/1")
+        assert redis_pool.get_async_redis("redis://shared-test:6379/1") is first
+        await redis_pool.close_async_redis()
+        return first
+
+    assert asyncio.run(client()) is not asyncio.run(client())
+
+
+def test_pools_of_closed_loops_are_dropped():
+    loop = asyncio.new_event_loop()
+
+    async def client():
+        return redis_pool.get_async_redis("redis://shared-test:6379/1")
+
+    loop.run_until_complete(client())
+    loop.close()
+    assert loop in redis_pool._async_clients
+    asyncio.run(client())  # the next lookup, from any loop, prunes it
+    assert loop not in redis_pool._async_clients
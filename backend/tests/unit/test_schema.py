@@ -0,0 +1,24 @@
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(__file__), "..", "..")
+
+
+def test_migrate_service_command_runs_in_the_backend_image_layout(tmp_path):
+    # The Dockerfile copies backend/ to /app; the repo root (and `backend`) is not there
+    app_dir = tmp_path / "app"
+    shutil.copytree(BACKEND, app_dir, ignore=shutil.ignore_patterns("tests", "__pycache__"))
+    db = tmp_path / "leads.db"
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONPATH"}
+    env.update(DATABASE_URL=f"sqlite:///{db}", ASYNC_DATABASE_URL=f"sqlite+aiosqlite:///{db}")
+
+    # docker-compose's `alembic upgrade head`; -P keeps the working directory off sys.path like the script
+    result = subprocess.run([sys.executable, "-P", "-m", "alembic", "upgrade", "head"], cwd=app_dir, env=env,
+                            capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    tables = {row[0] for row in sqlite3.connect(db).execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert {"leads", "prompt_history", "alembic_version"} <= tables
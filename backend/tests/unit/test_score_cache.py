@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from backend.app.lru import LRUCache
+from backend.app.score_cache import ScoreCache, normalize_email, score_cache_key
+
+
+def test_normalize_email_strips_quotes_and_signature():
+    body = "Hi,\n\nCan we  book a DEMO?\n> old quoted line\n--\nJane\nCEO"
+    assert normalize_email("Demo  Request", body) == "demo request hi, can we book a demo?"
+
+
+def test_normalize_email_cuts_reply_history():
+    body = "Sounds good.\nOn Tue, 3 Jan 2023, Bob <bob@acme.com> wrote:\nprevious message"
+    assert normalize_email("Re", body) == normalize_email("re", "Sounds good.")
+
+
+def test_cache_key_includes_model_and_prompt_version():
+    key = score_cache_key("gpt-4o-mini", "v1", "Subject", "Body")
+    assert key.startswith("ai_score:gpt-4o-mini:v1:")
+    assert key != score_cache_key("gpt-4o-mini", "v2", "Subject", "Body")
+    assert len(key) < 100
+
+
+def test_lru_cache_evicts_by_size_and_ttl():
+    evictions = []
+    cache = LRUCache(maxsize=2, ttl=60, on_evict=evictions.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1
+    cache.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+    assert evictions == ["size", "size", "expired"]
+
+
+def test_score_cache_local_tier():
+    cache = ScoreCache(redis_url=None)
+
+    async def roundtrip():
+        assert await cache.get("k") is None
+        await cache.set("k", (0.6, "QUALIFIED"))
+        return await cache.get("k")
+
+    assert asyncio.run(roundtrip()) == (0.6, "QUALIFIED")
@@ -0,0 +1,83 @@
+import asyncio
+import json
+
+import httpx
+import numpy as np
+
+from backend import scorer as scorer_module
+from backend.app.score_cache import ScoreCache
+from backend.app.semantic_cache import SemanticIndex, embed
+
+PRICING = ("Pricing for {seats} seats of CRM",
+           "Hi, we are {company} and want to roll out CRM to {seats} sales reps next month. "
+           "Could you send a quote and the contract terms? Budget is approved.")
+
+
+def pricing(company: str, seats: int) -> tuple[str, str]:
+    return PRICING[0].format(seats=seats), PRICING[1].format(company=company, seats=seats)
+
+
+def test_templated_variants_are_closer_than_unrelated_mail():
+    acme, globex = embed(*pricing("Acme", 50)), embed(*pricing("Globex", 120))
+    other = embed("Partnership opportunity", "We offer SEO services and link building. Would you like a free audit?")
+    assert np.isclose(np.linalg.norm(acme), 1)
+    assert acme @ globex > 0.8
+    assert acme @ other < 0.3
+    assert not embed("", "").any()
+
+
+def test_lookup_applies_threshold_and_oldest_rows_are_replaced():
+    index = SemanticIndex(threshold=0.8, max_entries=2, path=None)
+    index.add(index.embed(*pricing("Acme", 50)), 0.9, "QUALIFIED")
+    match = index.lookup(index.embed(*pricing("Globex", 120)))
+    assert (match.score, match.stage) == (0.9, "QUALIFIED")
+    assert index.lookup(index.embed("Not interested", "Please remove me from your list")) is None
+
+    index.add(index.embed("Not interested", "Please remove me from your list"), 0.2, "NEW")
+    index.add(index.embed("Webinar follow-up", "Thanks for the webinar, I will share it with my manager"), 0.6, "QUALIFIED")
+    assert index.count == 2
+    assert index.lookup(index.embed(*pricing("Globex", 120))) is None
+
+
+def test_index_persists_per_namespace(tmp_path):
+    path = str(tmp_path / "semantic.npz")
+    index = SemanticIndex("gpt-4o-mini:v1", threshold=0.8, max_entries=3, path=path, save_every=2)
+    for company, score in [("Acme", 0.9), ("Hooli", 0.6)]:
+        index.add(index.embed(*pricing(company, 50)), score, "QUALIFIED")
+    assert (tmp_path / "semantic.npz").exists()
+
+    restored = SemanticIndex.load("gpt-4o-mini:v1", threshold=0.8, max_entries=3, path=path)
+    assert restored.count == 2
+    assert restored.lookup(restored.embed(*pricing("Hooli", 50))).score == 0.6
+    assert SemanticIndex.load("gpt-4o-mini:v2", path=path).count == 0
+
+
+def test_scorer_reuses_near_duplicates_and_measures_shadow_agreement(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(scorer_module.Scorer, "_save_history", lambda *args, **kwargs: None)
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        content = json.dumps({"score": 0.9, "stage": "QUALIFIED"})
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}}]})
+
+    def make(shadow_rate):
+        return scorer_module.Scorer(base_url="http://openai.stub/v1", transport=httpx.MockTransport(handler),
+                                    cache=ScoreCache(redis_url=None), semantic_shadow_rate=shadow_rate,
+                                    semantic_index=SemanticIndex(threshold=0.8, path=None))
+
+    scorer = make(0)
+    assert asyncio.run(scorer.score_email(*pricing("Acme", 50))) == (0.9, "QUALIFIED")
+    assert asyncio.run(scorer.score_email(*pricing("Globex", 120))) == (0.9, "QUALIFIED")
+    assert asyncio.run(scorer.score_many([dict(zip(("subject", "body"), pricing("Wayne", 5)))], pack_size=4)) \
+        == [(0.9, "QUALIFIED")]
+    assert len(calls) == 1
+
+    agreed = scorer_module.SEMANTIC_CACHE_AGREEMENT.labels(agreed="true")
+    before = agreed._value.get()
+    shadowed = make(1)
+    shadowed.semantic.add(shadowed.semantic.embed(*pricing("Acme", 50)), 0.9, "QUALIFIED")
+    assert asyncio.run(shadowed.score_email(*pricing("Globex", 120))) == (0.9, "QUALIFIED")
+    assert len(calls) == 2
+    assert agreed._value.get() == before + 1
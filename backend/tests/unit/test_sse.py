@@ -0,0 +1,92 @@
+import asyncio
+
+from backend.app.sse import LeadEventHub
+
+
+async def collect(stream, count):
+    return [await stream.__anext__() for _ in range(count)]
+
+
+def test_broadcast_fans_out_to_every_client():
+    async def run():
+        hub = LeadEventHub("redis://unused", heartbeat=60)
+        first, second = hub.stream(), hub.stream()
+        pending = [asyncio.ensure_future(collect(first, 1)), asyncio.ensure_future(collect(second, 1))]
+        await asyncio.sleep(0)
+        hub.broadcast("1-0", '{"id": 1}')
+        return await asyncio.gather(*pending)
+
+    assert asyncio.run(run()) == [['id: 1-0\ndata: {"id": 1}\n\n']] * 2
+
+
+def test_slow_client_is_dropped():
+    async def run():
+        hub = LeadEventHub("redis://unused", queue_size=2, heartbeat=60)
+        subscription = hub.subscribe()
+        for i in range(3):
+            hub.broadcast(f"{i}-0", "{}")
+        return subscription, hub._subscriptions
+
+    subscription, subscriptions = asyncio.run(run())
+    assert subscription.dropped
+    assert subscription.queue.get_nowait() is None
+    assert not subscriptions
+
+
+def test_idle_stream_sends_heartbeats():
+    async def run():
+        hub = LeadEventHub("redis://unused", heartbeat=0.01)
+        return await collect(hub.stream(), 2)
+
+    assert asyncio.run(run()) == [": heartbeat\n\n"] * 2
+
+
+def test_stream_entries_are_decoded_for_clients(monkeypatch):
+    import fakeredis
+
+    from backend.app import events, sse
+
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(sse, "get_async_redis", lambda url=None: client)
+    monkeypatch.setattr(events, "LEAD_EVENT_GZIP_THRESHOLD", 10)
+
+    async def run():
+        hub = LeadEventHub("redis://unused", heartbeat=60)
+        await hub.start()
+        stream = hub.stream()
+        pending = asyncio.ensure_future(collect(stream, 1))
+        await asyncio.sleep(0.05)
+        await events.publish_lead_update(client, events.lead_event(3, 2, stage="WON"))
+        frames = await asyncio.wait_for(pending, 2)
+        await hub.stop()
+        return frames
+
+    [frame] = asyncio.run(run())
+    assert frame.endswith('data: {"id":3,"version":2,"stage":"WON"}\n\n')
+
+
+def test_reconnect_replays_every_missed_entry_past_the_queue_size(monkeypatch):
+    import fakeredis
+
+    from backend.app import events, sse
+
+    client = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(sse, "get_async_redis", lambda url=None: client)
+
+    async def run():
+        ids = [(await events.publish_lead_update(client, events.lead_event(n, 1, stage="NEW"))).decode()
+               for n in range(8)]
+        hub = LeadEventHub("redis://unused", queue_size=3, heartbeat=60)
+        await hub.start()
+        # The client saw the first event, then missed more than a queue's worth
+        stream = hub.stream(last_event_id=ids[0])
+        frames = await asyncio.wait_for(collect(stream, 7), 2)
+        pending = asyncio.ensure_future(collect(stream, 1))
+        await asyncio.sleep(0.05)
+        live = (await events.publish_lead_update(client, events.lead_event(8, 1, stage="NEW"))).decode()
+        frames += await asyncio.wait_for(pending, 2)
+        await hub.stop()
+        return ids[1:] + [live], frames
+
+    expected, frames = asyncio.run(run())
+    assert [frame.split("\n")[0] for frame in frames] == [f"id: {event_id}" for event_id in expected]
@@ -0,0 +1,22 @@
+import pytest
+
+from backend.app import triage
+from backend.app.triage import HIGH, LOW, lane
+
+
+@pytest.mark.parametrize("sender,subject,body,expected", [
+    ("ana@acme.com", "Pricing for 50 seats", "Can you send a quote?", HIGH),
+    ("ana@acme.com", "Question", "Does it integrate with our CRM?", HIGH),
+    ("MAILER-DAEMON@mail.acme.com", "Undeliverable: Pricing", "", LOW),
+    ("ana@acme.com", "Automatic reply: demo", "I am out of the office", LOW),
+    ("news@acme.com", "Spring newsletter", "Click to unsubscribe", LOW),
+])
+def test_lanes(sender, subject, body, expected):
+    assert lane(sender, subject, body) == expected
+
+
+def test_threshold_and_priority_domains(monkeypatch):
+    assert lane("ana@acme.com", "Question", "Hello", threshold=1) == LOW
+    monkeypatch.setattr(triage, "TRIAGE_PRIORITY_DOMAINS", frozenset({"acme.com"}))
+    assert lane("Ana <ana@acme.com>", "Question", "Hello", threshold=1) == HIGH
+    assert lane("ana@acme.com", "Webinar invite", "Hello", threshold=1) == LOW
@@ -0,0 +1,218 @@
+"""
+Prefork Celery workers against worker.async_worker at the same memory
+footprint: throughput and publish-to-stored latency for --emails e-mails,
+with the LLM replaced by benchmarks.openai_stub in every worker process.
+
+The async worker runs first and its peak PSS (proportional set size, so
+pages shared after the fork are counted once) sets the budget. A one-process
+prefork calibration run measures the parent and a busy pool process, and the
+prefork run gets as many processes as fit in the budget; --processes picks
+the pool size instead. Every e-mail gets a random sender so none is
+deduplicated and each one ends as a stored lead.
+
+Needs DATABASE_URL, ASYNC_DATABASE_URL and REDIS_URL like bench_pipeline;
+the schema is migrated up front. On SQLite, give both URLs ?timeout=30 so
+concurrent inserts wait for the write lock instead of failing.
+
+    python -m benchmarks.bench_async_worker --emails 500 --llm-latency 0.4 --concurrency 64
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import psutil
+
+from benchmarks import harness
+
+PREFORK_QUEUE = "bench.classify"
+CHILD_ENV = {"OPENAI_API_KEY": "stub", "LOG_LEVEL": "WARNING"}
+
+
+def child(args):
+    from pathlib import Path
+
+    from benchmarks.bench_pipeline import stub_llm
+    from worker import tasks
+
+    stub_llm(args)
+    # Neither mode exports spans, so both pay for the same work
+    tasks.worker_process_init.disconnect(tasks.init_worker_process)
+    ready = Path(args.ready_file)
+    if args.child == "async":
+        import asyncio
+
+        from worker import async_worker
+
+        ready.touch()
+        asyncio.run(async_worker.serve(args.concurrency))
+    else:
+        from celery.signals import worker_ready
+
+        worker_ready.connect(lambda **kwargs: ready.touch(), weak=False)
+        tasks.app.worker_main(["worker", "--pool=prefork", f"--concurrency={args.processes}", "-Q", PREFORK_QUEUE,
+                               "--loglevel=WARNING", "--without-gossip", "--without-mingle", "--without-heartbeat",
+                               "-n", f"bench-{uuid.uuid4().hex[:6]}@%h"])
+
+
+def bench_emails(args, run: str) -> list[dict]:
+    from benchmarks.emails import generate
+
+    return [{**e, "email_id": f"{e['email_id']}-{run}", "sender": f"{uuid.uuid4().hex}@{e['sender'].split('@')[-1]}"}
+            for e in generate(args.emails, args.seed)]
+
+
+def publish(mode: str, emails: list[dict]) -> dict[str, float]:
+    published = {}
+    if mode == "async":
+        from kombu import Connection
+
+        from worker.consumer import exchange, queue
+        from worker.tasks import CELERY_BROKER
+
+        with Connection(CELERY_BROKER) as conn:
+            producer = conn.Producer(serializer="json")
+            for email in emails:
+                published[email["email_id"]] = time.time()
+                producer.publish(email, exchange=exchange, routing_key=queue.routing_key, declare=[queue],
+                                 headers={"enqueued_at": published[email["email_id"]]})
+    else:
+        from worker.tasks import classify_email
+
+        for email in emails:
+            published[email["email_id"]] = time.time()
+            classify_email.apply_async(args=[email], queue=PREFORK_QUEUE)
+    return published
+
+
+def footprint(process: psutil.Process) -> tuple[float, list[float]]:
+    """PSS in MB of `process` and of each of its children."""
+    def pss(p):
+        try:
+            return p.memory_full_info().pss / 2 ** 20
+        except psutil.Error:
+            return 0.0
+    return pss(process), [pss(c) for c in process.children(recursive=True)]
+
+
+def stored(run: str) -> list[tuple[str, datetime]]:
+    from sqlalchemy import select
+
+    from backend.app.database import SessionLocal
+    from backend.app.models import Lead
+
+    with SessionLocal() as db:
+        return db.execute(select(Lead.email_id, Lead.created_at).where(Lead.email_id.like(f"%-{run}"))).all()
+
+
+def run_mode(args, mode: str, emails_count: int | None = None, processes: int = 1) -> dict:
+    run = uuid.uuid4().hex[:8]
+    emails = bench_emails(argparse.Namespace(**{**vars(args), "emails": emails_count or args.emails}), run)
+    ready = os.path.join("/tmp", f"bench-async-worker-{run}.ready")
+    command = [sys.executable, "-m", "benchmarks.bench_async_worker", "--child", mode, "--ready-file", ready,
+               "--processes", str(processes), "--concurrency", str(args.concurrency),
+               "--llm-latency", str(args.llm_latency), "--llm-jitter", str(args.llm_jitter)]
+    proc = subprocess.Popen(command, env={**os.environ, **CHILD_ENV})
+    process = psutil.Process(proc.pid)
+    try:
+        deadline = time.monotonic() + 60
+        while not os.path.exists(ready):
+            if proc.poll() is not None or time.monotonic() > deadline:
+                raise RuntimeError(f"{mode} worker did not start")
+            time.sleep(0.1)
+        idle_parent, idle_children = footprint(process)
+
+        peak = {"total": 0.0, "parent": 0.0, "child": 0.0}
+        done = threading.Event()
+
+        def sample():
+            while not done.wait(0.25):
+                parent, children = footprint(process)
+                peak["total"] = max(peak["total"], parent + sum(children))
+                peak["parent"] = max(peak["parent"], parent)
+                peak["child"] = max([peak["child"], *children])
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        started = time.time()
+        published = publish(mode, emails)
+        deadline = time.monotonic() + args.timeout
+        while len(rows := stored(run)) < len(emails) and time.monotonic() < deadline:
+            time.sleep(0.25)
+        done.set()
+        sampler.join()
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+        if os.path.exists(ready):
+            os.remove(ready)
+
+    # created_at is naive UTC, set by the worker when it stores the lead
+    finished = {email_id: created_at.replace(tzinfo=timezone.utc).timestamp() for email_id, created_at in rows}
+    latencies = [finished[email_id] - sent for email_id, sent in published.items() if email_id in finished]
+    elapsed = (max(finished.values()) - started) if finished else 0.0
+    summary = harness.summarize(latencies, elapsed, errors=len(emails) - len(finished))
+    summary.update(processes=processes if mode == "prefork" else 1,
+                   concurrency=args.concurrency if mode == "async" else processes,
+                   idle_pss_mb=round(idle_parent + sum(idle_children), 1),
+                   peak_pss_mb=round(peak["total"], 1),
+                   peak_parent_pss_mb=round(peak["parent"], 1),
+                   peak_child_pss_mb=round(peak["child"], 1))
+    summary["throughput_per_100mb"] = round(summary["throughput_per_s"] / summary["peak_pss_mb"] * 100, 2) \
+        if summary["peak_pss_mb"] else 0.0
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--concurrency", type=int, default=64, help="e-mails in flight in the async worker")
+    parser.add_argument("--processes", type=int, help="prefork pool size; sized to the async footprint when omitted")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for every e-mail to be stored")
+    parser.add_argument("--child", choices=["async", "prefork"], help=argparse.SUPPRESS)
+    parser.add_argument("--ready-file", help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results",
+                                                         f"async-worker-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+    if args.child:
+        args.llm_error_rate = 0.0
+        return child(args)
+
+    from backend.app.schema import upgrade
+    upgrade()
+
+    results = {"async": run_mode(args, "async")}
+    processes = args.processes
+    if processes is None:
+        calibration = run_mode(args, "prefork", emails_count=min(args.emails, 20), processes=1)
+        budget = results["async"]["peak_pss_mb"] - calibration["peak_parent_pss_mb"]
+        processes = max(1, int(budget // calibration["peak_child_pss_mb"]))
+        results["prefork_calibration"] = calibration
+    results["prefork"] = run_mode(args, "prefork", processes=processes)
+
+    for name in ("async", "prefork"):
+        r = results[name]
+        print(f"{name:<8} {r['processes']} proc x {r['concurrency']:<3} in flight  peak PSS {r['peak_pss_mb']:7.1f} MB  "
+              f"{r['throughput_per_s']:7.2f} e-mails/s  p50 {r['p50_ms']:9.1f} ms  p99 {r['p99_ms']:9.1f} ms  "
+              f"errors {r['errors']}", file=sys.stderr)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    harness.save(args.output, "async_worker", {k: v for k, v in vars(args).items() if k not in ("child", "ready_file")},
+                 results)
+    print(f"saved {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Requests per second under mixed login and authenticated-query load, before
+and after the auth changes (cached token claims, one-off password hash,
+bcrypt off the event loop).
+
+    python -m benchmarks.bench_auth --clients 50 --duration 10 --login-share 0.05
+
+Each mode serves a small FastAPI app with the API's /token handler shape and
+an endpoint that only depends on get_current_user from uvicorn in a
+background thread, so the numbers isolate auth cost from Redis/Postgres.
+Query latency percentiles show how much logins stall everyone else.
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+from datetime import timedelta
+
+import httpx
+import uvicorn
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from jose import jwt
+
+from backend.app import auth
+from benchmarks.harness import percentile
+
+
+
+async def legacy_current_user(token: str = Depends(auth.oauth2_scheme)):
+    payload = jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+    return {"username": payload["sub"]}
+
+
+def build_app(legacy: bool) -> FastAPI:
+    app = FastAPI()
+    current_user = legacy_current_user if legacy else auth.get_current_user
+
+    @app.post("/token")
+    async def token(form_data: OAuth2PasswordRequestForm = Depends()):
+        if legacy:
+            ok = form_data.username == "test" and auth.verify_password(form_data.password, auth.get_password_hash("test"))
+        else:
+            ok = await auth.authenticate_user(form_data.username, form_data.password)
+        if not ok:
+            raise HTTPException(status_code=401)
+        return {"access_token": auth.create_access_token({"sub": form_data.username}, timedelta(minutes=30))}
+
+    @app.get("/me")
+    async def me(user: dict = Depends(current_user)):
+        return user
+
+    return app
+
+
+def serve(app: FastAPI) -> tuple[uvicorn.Server, str]:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def run(legacy: bool, clients: int, duration: float, login_share: float) -> dict:
+    auth._claims_cache.clear()
+    auth._password_hashes.clear()
+    server, base_url = serve(build_app(legacy))
+    limits = httpx.Limits(max_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        tokens = [auth.create_access_token({"sub": "test"}, timedelta(minutes=30)) for _ in range(clients)]
+        logins, queries = [], []
+        deadline = time.perf_counter() + duration
+
+        async def worker(i: int):
+            rng = random.Random(i)
+            headers = {"Authorization": f"Bearer {tokens[i]}"}
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                if rng.random() < login_share:
+                    response = await client.post("/token", data={"username": "test", "password": "test"})
+                    logins.append(time.perf_counter() - start)
+                else:
+                    response = await client.get("/me", headers=headers)
+                    queries.append(time.perf_counter() - start)
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+    server.should_exit = True
+    return {
+        "rps": (len(logins) + len(queries)) / elapsed,
+        "logins": len(logins),
+        "queries": len(queries),
+        "query_p50_ms": percentile(queries, 50) * 1000,
+        "query_p99_ms": percentile(queries, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--login-share", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'mode':>8} {'req/s':>9} {'logins':>7} {'queries':>8} {'query p50 ms':>13} {'query p99 ms':>13}")
+    for mode, legacy in (("before", True), ("after", False)):
+        r = asyncio.run(run(legacy, args.clients, args.duration, args.login_share))
+        print(f"{mode:>8} {r['rps']:>9.0f} {r['logins']:>7} {r['queries']:>8} "
+              f"{r['query_p50_ms']:>13.1f} {r['query_p99_ms']:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Dedup lookup latency as the lead table grows: full fuzzy scan vs DedupIndex.
+
+    REDIS_URL=redis://localhost:6379/15 python -m benchmarks.bench_dedup --sizes 1000 10000 100000
+
+The scan baseline keeps (sender, subject) pairs in memory, so it is a lower
+bound of the old worker behaviour, which also loaded every row from Postgres.
+The index is built in the Redis database given by REDIS_URL under a
+throwaway prefix that is deleted afterwards.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+import redis
+
+from backend.app.dedup import DedupIndex, is_duplicate
+from benchmarks.harness import percentile
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "so", "pe", "da", "gu", "fi", "zo", "be", "xa"]
+WORDS = [a + b + c for a in SYLLABLES for b in SYLLABLES for c in ("", "n", "r", "s")]
+GREETINGS = ["Hi", "Hey", "Oi", "Ola", "Yo"]
+
+
+def synthetic_lead(rng: random.Random, i: int) -> tuple[int, str, str]:
+    sender = f"{rng.choice(WORDS)}.{rng.choice(WORDS)}@{rng.choice(WORDS)}.com"
+    if rng.random() < 0.2:
+        subject = rng.choice(GREETINGS)
+    else:
+        subject = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 7)))
+    return i + 1, sender, subject
+
+
+def mutate_sender(rng: random.Random, sender: str) -> str:
+    """A sender the way it comes back on a later e-mail: re-cased, or with a one-character typo."""
+    local, _, domain = sender.partition("@")
+    kind = rng.choice(["case", "local", "domain", "tld"])
+    if kind == "case":
+        return sender.upper()
+    if kind == "tld":
+        return f"{local}@{domain[:-1]}"
+    if kind == "local":
+        i = rng.randrange(len(local))
+        return f"{local[:i]}{rng.choice('aeiouxz')}{local[i + 1:]}@{domain}"
+    i = rng.randrange(len(domain) - 4)
+    return f"{local}@{domain[:i]}{rng.choice('aeiouxz')}{domain[i + 1:]}"
+
+
+def scan(rows, sender, subject):
+    for lead_id, other_sender, other_subject in rows:
+        if is_duplicate(sender, subject, other_sender, other_subject):
+            return lead_id
+    return None
+
+
+def run(size: int, queries: int, client) -> dict:
+    rng = random.Random(size)
+    rows = [synthetic_lead(rng, i) for i in range(size)]
+    index = DedupIndex(client, prefix=f"bench:dedup:{size}")
+    index.rebuild(rows)
+
+    # Half of the probes are near-copies of stored leads (mutated sender, reply
+    # or exclaimed subject), half are new mail
+    probes = []
+    for _ in range(queries):
+        if rng.random() < 0.5:
+            _, sender, subject = rng.choice(rows)
+            subject = rng.choice([f"Re: {subject}", f"{subject}!"])
+            probes.append((mutate_sender(rng, sender), subject))
+        else:
+            probes.append(synthetic_lead(rng, size + rng.randrange(size))[1:])
+
+    scan_times, index_times, agree = [], [], 0
+    for sender, subject in probes:
+        start = time.perf_counter()
+        expected = scan(rows, sender, subject)
+        scan_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        found = index.find_duplicate(sender, subject)
+        index_times.append(time.perf_counter() - start)
+        agree += (expected is None) == (found is None)
+
+    for key in client.scan_iter(f"{index.prefix}:*", count=1000):
+        client.delete(key)
+    return {
+        "size": size,
+        "scan_p50_ms": statistics.median(scan_times) * 1000,
+        "scan_p95_ms": percentile(scan_times, 95) * 1000,
+        "index_p50_ms": statistics.median(index_times) * 1000,
+        "index_p95_ms": percentile(index_times, 95) * 1000,
+        "agreement": agree / len(probes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/15"))
+    print(f"{'leads':>8} {'scan p50':>10} {'scan p95':>10} {'index p50':>10} {'index p95':>10} {'agree':>7}")
+    for size in args.sizes:
+        r = run(size, args.queries, client)
+        print(f"{r['size']:>8} {r['scan_p50_ms']:>9.2f}ms {r['scan_p95_ms']:>9.2f}ms "
+              f"{r['index_p50_ms']:>9.2f}ms {r['index_p95_ms']:>9.2f}ms {r['agreement']:>7.1%}")
+
+
+if __name__ == "__main__":
+    main()
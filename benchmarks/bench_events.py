@@ -0,0 +1,77 @@
+"""
+Size and encode cost of lead update events: the previous full LeadOut JSON
+(body and entities on every publish) against the compact orjson deltas
+published now, for the insert and the enrichment event of each lead.
+
+    python -m benchmarks.bench_events --emails 2000
+"""
+
+import argparse
+import os
+import statistics
+import time
+from datetime import datetime
+
+from backend.app.board import card_from_lead
+from backend.app.events import card_event, encode_event, lead_event
+from backend.app.schemas import LeadOut
+from benchmarks import harness
+from benchmarks.emails import generate
+
+ENTITIES = {"noun_phrases": ["sales reps", "contract terms", "next month"], "tags": {"NN": 14, "JJ": 3, "VB": 6}}
+
+
+def timed(fn, items: list) -> tuple[list, float]:
+    start = time.perf_counter()
+    results = [fn(item) for item in items]
+    return results, (time.perf_counter() - start) / len(items) * 1e6
+
+
+def stored_size(fields: dict) -> int:
+    return sum(len(k) + len(v) for k, v in fields.items())
+
+
+def legacy(lead: dict) -> bytes:
+    # What the worker published before: the whole row, body included
+    return LeadOut(**lead).json().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--body-chars", type=int, default=2000, help="synthetic bodies are padded to this length")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results",
+                                                         f"events-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    leads = [{"id": i + 1, "email_id": e["email_id"], "sender": e["sender"], "subject": e["subject"],
+              "body": (e["body"] * (args.body_chars // len(e["body"]) + 1))[:args.body_chars],
+              "score": 0.6, "stage": "QUALIFIED", "source": "EMAIL", "created_at": datetime.utcnow(), "version": 1}
+             for i, e in enumerate(generate(args.emails, args.seed))]
+    enriched = [{**lead, "intent": "positive", "entities": ENTITIES, "version": 2} for lead in leads]
+
+    cases = {
+        "insert_legacy": (legacy, leads),
+        "insert_delta": (lambda lead: encode_event(card_event(card_from_lead(lead))), leads),
+        "enrich_legacy": (legacy, enriched),
+        "enrich_delta": (lambda lead: encode_event(lead_event(lead["id"], lead["version"], intent=lead["intent"],
+                                                              entities=lead["entities"])), enriched),
+    }
+    results = {}
+    print(f"{'event':<16} {'mean bytes':>11} {'p95 bytes':>10} {'encode us':>10}")
+    for name, (encode, items) in cases.items():
+        payloads, encode_us = timed(encode, items)
+        sizes = [len(p) if isinstance(p, bytes) else stored_size(p) for p in payloads]
+        results[name] = {"mean_bytes": round(statistics.fmean(sizes), 1),
+                         "p95_bytes": harness.percentile(sizes, 95), "encode_us": round(encode_us, 2)}
+        print(f"{name:<16} {results[name]['mean_bytes']:>11.1f} {results[name]['p95_bytes']:>10} "
+              f"{results[name]['encode_us']:>10.2f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    harness.save(args.output, "events", vars(args), results)
+    print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Offline ingest throughput: the old per-message fetch/publish loop vs the
+batched, pooled and incremental fetch_gmail, against benchmarks.fake_gmail
+with a simulated Gmail round-trip latency and kombu's in-memory broker.
+
+    python -m benchmarks.bench_ingest --messages 500 --latency 0.02
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from kombu import Connection
+
+import ingestor
+from benchmarks.fake_gmail import FakeGmail
+
+
+def legacy_fetch(service):
+    # What fetch_gmail did before: one get and one broker connection per message
+    results = service.users().messages().list(userId='me', labelIds=['INBOX'], q="is:unread").execute()
+    for msg in results.get("messages", []):
+        data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+        with Connection("memory://") as conn:
+            producer = conn.Producer(serializer='json')
+            producer.publish(ingestor.to_email(data), exchange=ingestor.exchange, routing_key="raw",
+                             declare=[ingestor.queue])
+    return len(results.get("messages", []))
+
+
+def mailbox(count: int, latency: float) -> FakeGmail:
+    gmail = FakeGmail(latency=latency, page_size=count)
+    rng = random.Random(count)
+    for i in range(count):
+        gmail.add_message(f"lead{i}@example.com", f"Question #{i}", "Hello, " * rng.randint(10, 200))
+    return gmail
+
+
+def timed(label: str, gmail: FakeGmail, fn):
+    gmail.calls = 0
+    start = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {count:>6} msgs {elapsed:>8.2f}s {count / elapsed if elapsed else 0:>9.1f} msg/s {gmail.calls:>6} calls")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--new", type=int, default=20, help="messages arriving before the incremental run")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per Gmail HTTP round-trip")
+    args = parser.parse_args()
+
+    gmail = mailbox(args.messages, args.latency)
+    timed("legacy full sync", gmail, lambda: legacy_fetch(gmail))
+
+    with tempfile.TemporaryDirectory() as tmp, Connection("memory://") as conn:
+        checkpoint = ingestor.HistoryCheckpoint(os.path.join(tmp, "history_id"))
+        timed("batched full sync", gmail, lambda: ingestor.fetch_gmail(gmail, conn, checkpoint))
+        for i in range(args.new):
+            gmail.add_message(f"new{i}@example.com", f"New question #{i}", "Hi")
+        timed("incremental sync", gmail, lambda: ingestor.fetch_gmail(gmail, conn, checkpoint))
+
+
+if __name__ == "__main__":
+    main()
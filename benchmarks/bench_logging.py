@@ -0,0 +1,108 @@
+"""
+Caller-side cost of a structured log call: the previous synchronous setup
+(stdlib json rendering and the write on the calling thread) against the
+background queue handler with orjson rendering. Output goes to a file, or
+to a pipe drained slowly with --slow-reader-ms to mimic a congested log
+collector.
+
+    python -m benchmarks.bench_logging --events 50000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import structlog
+
+from backend.app import logging_config
+from benchmarks import harness
+
+
+def configure_sync(stream):
+    # What configure_logging did before the background handler
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.StreamHandler(stream))
+    root.setLevel(logging.INFO)
+    structlog.configure(
+        processors=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.processors.StackInfoRenderer(),
+            structlog.processors.format_exc_info,
+            structlog.processors.JSONRenderer(),
+        ],
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger,
+        cache_logger_on_first_use=False,
+    )
+
+
+def configure_background(stream):
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging_config.configure_logging(stream)
+
+
+def slow_pipe(delay_ms: float):
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        with os.fdopen(read_fd, "rb") as reader:
+            while reader.read(4096):
+                time.sleep(delay_ms / 1000)
+
+    threading.Thread(target=drain, daemon=True).start()
+    return os.fdopen(write_fd, "w", buffering=1)
+
+
+def run(configure, stream, events: int) -> dict:
+    configure(stream)
+    dropped = logging_config.LOG_EVENTS_DROPPED.labels(reason="queue_full")
+    dropped_before = dropped._value.get()
+    logger = structlog.get_logger("bench")
+    latencies = []
+    started = time.perf_counter()
+    with structlog.contextvars.bound_contextvars(correlation_id="4f1c2a9e-1b7d-4b8e-9d7c-3a1f0e2b6c55"):
+        for i in range(events):
+            start = time.perf_counter()
+            logger.info("Email classification successful", email_id=f"synthetic-{i}", lead_id=i, stage="QUALIFIED")
+            latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+    logging_config.shutdown_logging()
+    return {**harness.summarize(latencies, elapsed), "drain_s": round(time.perf_counter() - started - elapsed, 3),
+            "dropped": int(dropped._value.get() - dropped_before)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=50_000)
+    parser.add_argument("--slow-reader-ms", type=float, default=0,
+                        help="sleep per 4 KiB read on a pipe instead of writing to a file")
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results",
+                                                         f"logging-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    results = {}
+    for name, configure in (("sync", configure_sync), ("background", configure_background)):
+        with tempfile.TemporaryFile("w") as file:
+            stream = slow_pipe(args.slow_reader_ms) if args.slow_reader_ms else file
+            results[name] = run(configure, stream, args.events)
+        r = results[name]
+        print(f"{name:<11} p50 {r['p50_ms'] * 1000:7.1f} us  p99 {r['p99_ms'] * 1000:8.1f} us  "
+              f"{r['throughput_per_s']:>9.0f} calls/s  drain {r['drain_s']}s  dropped {r['dropped']}", file=sys.stderr)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    harness.save(args.output, "logging", vars(args), results)
+    print(f"saved {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
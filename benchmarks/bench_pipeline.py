@@ -0,0 +1,252 @@
+"""
+Load drivers for the three hot paths, reporting throughput and p50/p95/p99
+latency and saving the run as JSON for comparison across commits.
+
+    # classify: runs the worker code in-process against DATABASE_URL/REDIS_URL,
+    # with the LLM replaced by benchmarks.openai_stub
+    python -m benchmarks.bench_pipeline classify --emails 500 --mode batch --llm-latency 0.4
+
+    # backfill: writes a synthetic mbox fixture and imports it with worker.backfill
+    python -m benchmarks.bench_pipeline backfill --emails 5000 --batch-size 200
+
+    # graphql / sse: drive a running API (make up, or uvicorn backend.app.main:app)
+    python -m benchmarks.bench_pipeline graphql --api-url http://localhost:8000 --clients 20 --duration 30
+    python -m benchmarks.bench_pipeline sse --api-url http://localhost:8000 --clients 50 --events 200
+
+Every run writes --output (default benchmarks/results/<driver>-<timestamp>.json).
+The SSE driver publishes marked events straight to the lead_updates stream
+and measures publish-to-client delivery; /sse/leads is rate limited to 100
+connections a minute per address, so keep --clients below that.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks import harness
+from benchmarks.emails import generate
+from benchmarks.openai_stub import OpenAIStub
+
+LEADS_QUERY = """
+query ($after: String) {
+  leads(first: 50, after: $after, orderBy: SCORE) {
+    edges { node { id sender subject score stage } }
+    pageInfo { hasNextPage endCursor }
+  }
+}
+"""
+
+
+def stub_llm(args) -> OpenAIStub:
+    """Points the worker's scorer at the OpenAI stub."""
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    from backend import scorer
+    from backend.app.score_cache import ScoreCache
+    from worker import tasks
+
+    stub = OpenAIStub(latency=args.llm_latency, jitter=args.llm_jitter, error_rate=args.llm_error_rate)
+    # Local-only score cache so every run pays for the LLM like fresh mail does
+    tasks.ai_scorer = scorer.TieredScorer(scorer.Scorer(transport=stub.transport(), cache=ScoreCache(redis_url=None)))
+    return stub
+
+
+def unique_emails(args) -> list[dict]:
+    # A run tag keeps ids unique and stops dedup matching mail from earlier runs
+    run = uuid.uuid4().hex[:8]
+    return [{**e, "email_id": f"{e['email_id']}-{run}", "sender": e["sender"].replace("@", f"+{run}@")}
+            for e in generate(args.emails, args.seed)]
+
+
+def run_classify(args) -> dict:
+    from worker import tasks
+
+    stub = stub_llm(args)
+    emails = unique_emails(args)
+    recorder = harness.Recorder()
+    if args.mode == "single":
+        for email in emails:
+            with recorder.measure():
+                tasks.classify_email.apply(args=[email], throw=True)
+    else:
+        for start in range(0, len(emails), args.batch_size):
+            batch = emails[start:start + args.batch_size]
+            batch_start = time.perf_counter()
+            with recorder.measure():
+                tasks.classify_batch(batch)
+                # Every e-mail in the batch waited for the whole batch
+                for _ in batch[1:]:
+                    recorder.record(time.perf_counter() - batch_start)
+    return {f"classify_{args.mode}": recorder.summary(), "llm_requests": stub.requests}
+
+
+def run_backfill(args) -> dict:
+    from email.message import EmailMessage
+
+    from worker import backfill, tasks
+
+    stub = stub_llm(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "fixture.mbox")
+        with open(source, "wb") as f:
+            for email in unique_emails(args):
+                message = EmailMessage()
+                message["From"], message["Subject"] = email["sender"], email["subject"]
+                message["Message-ID"] = f"<{email['email_id']}@bench>"
+                message.set_content(email["body"])
+                f.write(b"From bench Thu Jan  1 00:00:00 2025\n" + message.as_bytes() + b"\n")
+        checkpoint = backfill.BackfillCheckpoint(os.path.join(tmp, "checkpoint.json"))
+        recorder = harness.Recorder()
+
+        def classify(batch):
+            # Every e-mail in the batch waited for the whole batch
+            batch_start = time.perf_counter()
+            results = tasks.classify_batch(batch)
+            for _ in batch:
+                recorder.record(time.perf_counter() - batch_start)
+            return results
+
+        result = backfill.backfill(source, "mbox", checkpoint, args.batch_size, classify=classify)
+    summary = recorder.summary()
+    # Throughput of the whole import, including reading and the stored-id checks
+    summary.update(throughput_per_s=result["per_second"], statuses=result)
+    return {"backfill": summary, "llm_requests": stub.requests}
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> dict:
+    response = await client.post("/token", data={"username": username, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_graphql(args) -> dict:
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=args.api_url, limits=limits, timeout=30) as client:
+        headers = await login(client, args.username, args.password)
+        recorder = harness.Recorder()
+        deadline = time.perf_counter() + args.duration
+
+        async def reader():
+            after = None
+            while time.perf_counter() < deadline:
+                with recorder.measure():
+                    response = await client.post("/graphql", headers=headers,
+                                                 json={"query": LEADS_QUERY, "variables": {"after": after}})
+                    response.raise_for_status()
+                    body = response.json()
+                    if body.get("errors"):
+                        raise RuntimeError(body["errors"])
+                    page = body["data"]["leads"]["pageInfo"]
+                    # Walk a few pages deep, then start over, like a scrolling board
+                    after = page["endCursor"] if page["hasNextPage"] and after is None else None
+
+        await asyncio.gather(*(reader() for _ in range(args.clients)))
+    return {"graphql_leads": recorder.summary()}
+
+
+async def run_sse(args) -> dict:
+    from backend.app.events import publish_lead_update
+    from backend.app.redis_pool import get_redis
+
+    marker = uuid.uuid4().hex
+    recorder = harness.Recorder()
+    received = [0] * args.clients
+    limits = httpx.Limits(max_connections=args.clients + 1)
+    async with httpx.AsyncClient(base_url=args.api_url, limits=limits, timeout=None) as client:
+        headers = await login(client, args.username, args.password)
+        connected = asyncio.Event()
+        ready = 0
+
+        async def listener(i: int):
+            nonlocal ready
+            async with client.stream("GET", "/sse/leads", headers=headers) as response:
+                response.raise_for_status()
+                ready += 1
+                if ready == args.clients:
+                    connected.set()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    event = json.loads(line[6:])
+                    if event.get("bench") != marker:
+                        continue
+                    recorder.record(time.time() - event["sent_at"])
+                    received[i] += 1
+                    if received[i] == args.events:
+                        return
+
+        listeners = [asyncio.create_task(listener(i)) for i in range(args.clients)]
+        await asyncio.wait_for(connected.wait(), timeout=30)
+        redis_client = get_redis()
+        interval = 1 / args.rate if args.rate else 0
+        for n in range(args.events):
+            event = {"id": -1 - n, "version": 1, "bench": marker, "sent_at": time.time()}
+            await asyncio.to_thread(publish_lead_update, redis_client, event)
+            await asyncio.sleep(interval)
+        done, pending = await asyncio.wait(listeners, timeout=args.drain_timeout)
+        for task in pending:
+            task.cancel()
+    summary = recorder.summary()
+    summary["expected"] = args.clients * args.events
+    summary["lost"] = summary["expected"] - sum(received)
+    return {"sse_fanout": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="JSON results path")
+    drivers = parser.add_subparsers(dest="driver", required=True)
+
+    classify = drivers.add_parser("classify", help="worker classification path")
+    classify.add_argument("--emails", type=int, default=500)
+    classify.add_argument("--seed", type=int, default=42)
+    classify.add_argument("--mode", choices=["single", "batch"], default="batch")
+    classify.add_argument("--batch-size", type=int, default=50)
+
+    bulk = drivers.add_parser("backfill", help="worker.backfill import of a synthetic mbox")
+    bulk.add_argument("--emails", type=int, default=2000)
+    bulk.add_argument("--seed", type=int, default=42)
+    bulk.add_argument("--batch-size", type=int, default=100)
+    for driver in (classify, bulk):
+        driver.add_argument("--llm-latency", type=float, default=0.3)
+        driver.add_argument("--llm-jitter", type=float, default=0.1)
+        driver.add_argument("--llm-error-rate", type=float, default=0.0)
+
+    for name in ("graphql", "sse"):
+        api = drivers.add_parser(name, help=f"{name} load against a running API")
+        api.add_argument("--api-url", default="http://localhost:8000")
+        api.add_argument("--username", default="test")
+        api.add_argument("--password", default="test")
+        api.add_argument("--clients", type=int, default=20)
+        if name == "graphql":
+            api.add_argument("--duration", type=float, default=30.0)
+        else:
+            api.add_argument("--events", type=int, default=200)
+            api.add_argument("--rate", type=float, default=50.0, help="events published per second")
+            api.add_argument("--drain-timeout", type=float, default=30.0)
+
+    args = parser.parse_args()
+    if args.driver == "classify":
+        results = run_classify(args)
+    elif args.driver == "backfill":
+        results = run_backfill(args)
+    elif args.driver == "graphql":
+        results = asyncio.run(run_graphql(args))
+    else:
+        results = asyncio.run(run_sse(args))
+
+    harness.print_summaries({k: v for k, v in results.items() if isinstance(v, dict)})
+    output = args.output or os.path.join("benchmarks", "results", f"{args.driver}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    params = {k: v for k, v in vars(args).items() if k not in ("password", "output")}
+    harness.save(output, f"pipeline.{args.driver}", params, results)
+    print(f"saved {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Hit rate and score agreement of near-duplicate score reuse per similarity
+threshold. E-mails are replayed in order against a fresh SemanticIndex: a
+hit reuses the stored answer, a miss stores the e-mail's true label (what
+the LLM would have answered). Agreement compares reused answers with the
+true label of the e-mail they were reused for.
+
+    python -m benchmarks.bench_semantic_cache --emails 5000 --thresholds 0.8 0.9 0.95
+"""
+
+import argparse
+import os
+import time
+
+from backend.app.preclassifier import LABEL_SCORES
+from backend.app.semantic_cache import SEMANTIC_CACHE_DIM, SemanticIndex
+from benchmarks import harness
+from benchmarks.emails import generate
+
+
+def replay(emails: list[dict], threshold: float, dim: int, max_entries: int) -> dict:
+    index = SemanticIndex(threshold=threshold, dim=dim, max_entries=max_entries, path=None)
+    hits = agreed = 0
+    score_error = 0.0
+    lookup_s = []
+    for email in emails:
+        score, stage = LABEL_SCORES[email["label"]]
+        start = time.perf_counter()
+        vector = index.embed(email["subject"], email["body"])
+        match = index.lookup(vector)
+        lookup_s.append(time.perf_counter() - start)
+        if match is None:
+            index.add(vector, score, stage)
+            continue
+        hits += 1
+        agreed += match.stage == stage
+        score_error += abs(match.score - score)
+    return {
+        "hit_rate": round(hits / len(emails), 4),
+        "llm_calls": len(emails) - hits,
+        "stage_agreement": round(agreed / hits, 4) if hits else None,
+        "score_mae": round(score_error / hits, 4) if hits else None,
+        "lookup_p50_us": round(harness.percentile(lookup_s, 50) * 1e6, 1),
+        "lookup_p95_us": round(harness.percentile(lookup_s, 95) * 1e6, 1),
+        "index_entries": index.count,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--emails", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.7, 0.8, 0.85, 0.9, 0.95, 0.99])
+    parser.add_argument("--dim", type=int, default=SEMANTIC_CACHE_DIM)
+    parser.add_argument("--max-entries", type=int, default=10000)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results",
+                                                         f"semantic-cache-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+
+    emails = generate(args.emails, args.seed)
+    results = {}
+    print(f"{'threshold':>9} {'hit rate':>9} {'agreement':>10} {'score MAE':>10} {'p50 us':>8} {'p95 us':>8}")
+    for threshold in args.thresholds:
+        r = results[str(threshold)] = replay(emails, threshold, args.dim, args.max_entries)
+        print(f"{threshold:>9.2f} {r['hit_rate']:>9.1%} {r['stage_agreement'] or 0:>10.1%} "
+              f"{r['score_mae'] or 0:>10.3f} {r['lookup_p50_us']:>8.1f} {r['lookup_p95_us']:>8.1f}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    harness.save(args.output, "semantic_cache", vars(args), results)
+    print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
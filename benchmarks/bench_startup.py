@@ -0,0 +1,96 @@
+"""
+Process startup cost: import time of the worker tasks and the API app, and
+a worker's time to its first finished task (import, per-process init and one
+classify_email with the LLM replaced by benchmarks.openai_stub). Every
+sample is a fresh interpreter; medians are reported.
+
+The first-task run needs DATABASE_URL and REDIS_URL like bench_pipeline;
+the schema is migrated once up front, as a deploy would.
+
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --runs 5 --skip-first-task   # imports only, no services needed
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks import harness
+
+CHILD_ENV = {"OPENAI_API_KEY": "stub", "LOG_LEVEL": "WARNING"}
+
+
+def child(phase: str):
+    started = time.perf_counter()
+    timings = {}
+    if phase == "api":
+        import backend.app.main  # noqa: F401
+        timings["import_s"] = time.perf_counter() - started
+    else:
+        from worker import tasks
+        timings["import_s"] = time.perf_counter() - started
+        if phase == "first-task":
+            from benchmarks.bench_pipeline import stub_llm, unique_emails
+
+            tasks.init_worker_process()
+            timings["init_s"] = time.perf_counter() - started
+            stub_llm(SimpleNamespace(llm_latency=0, llm_jitter=0, llm_error_rate=0))
+            email = unique_emails(SimpleNamespace(emails=1, seed=7))[0]
+            tasks.classify_email.apply(args=[email], throw=True)
+            timings["first_task_s"] = time.perf_counter() - started
+    print(json.dumps(timings))
+
+
+def sample(phase: str) -> dict:
+    start = time.perf_counter()
+    done = subprocess.run([sys.executable, "-m", "benchmarks.bench_startup", "--child", phase],
+                          capture_output=True, text=True, env={**os.environ, **CHILD_ENV})
+    wall = time.perf_counter() - start
+    if done.returncode:
+        return {"error": (done.stderr.strip().splitlines() or ["failed"])[-1]}
+    timings = json.loads(done.stdout.strip().splitlines()[-1])
+    if phase != "first-task":
+        # Interpreter start to exit; the first-task exit also waits on the span exporter
+        timings["process_s"] = wall
+    return timings
+
+
+def median(samples: list[dict]) -> dict:
+    ok = [s for s in samples if "error" not in s]
+    if not ok:
+        return {"error": samples[0]["error"]}
+    return {key: round(statistics.median(s[key] for s in ok) * 1000, 1) for key in ok[0]} | {"runs": len(ok)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--skip-first-task", action="store_true")
+    parser.add_argument("--child", choices=["worker", "first-task", "api"], help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=os.path.join("benchmarks", "results",
+                                                         f"startup-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    phases = ["worker", "api"] + ([] if args.skip_first_task else ["first-task"])
+    if not args.skip_first_task:
+        from backend.app.schema import upgrade
+        upgrade()
+    results = {}
+    for phase in phases:
+        results[phase] = median([sample(phase) for _ in range(args.runs)])
+        print(f"{phase:<11} " + "  ".join(f"{k} {v}" for k, v in results[phase].items()), file=sys.stderr)
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    harness.save(args.output, "startup", vars(args), results)
+    print(f"saved {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Synthetic labeled inbound e-mails for benchmarks and the dataset/ folder.
+
+Labels follow the scorer's buckets (hot, warm, cold); a share of the cold
+mail is the bounce/auto-reply/newsletter noise the pre-classifier rules
+catch, and some e-mails are near-duplicates of earlier ones (a "Re:" or a
+re-sent copy) so dedup sees realistic traffic. Output is deterministic for
+a given seed.
+
+    python -m benchmarks.emails --count 500 --out dataset/emails.jsonl
+"""
+
+import argparse
+import json
+import random
+
+COMPANIES = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark", "Wayne", "Wonka", "Cyberdyne", "Soylent",
+             "Tyrell", "Aperture", "Vandelay", "Pied Piper", "Massive Dynamic", "Oscorp"]
+FIRST_NAMES = ["ana", "bruno", "carla", "diego", "elisa", "felipe", "gabriela", "hugo", "isabela", "joao",
+               "karen", "lucas", "marina", "nicolas", "olivia", "paulo", "renata", "sofia", "tiago", "vitor"]
+PRODUCTS = ["CRM", "sales automation", "lead scoring", "inbox triage", "pipeline analytics"]
+
+HOT = [
+    ("Pricing for {seats} seats of {product}",
+     "Hi, we are {company} and want to roll out {product} to {seats} sales reps next month. "
+     "Could you send a quote and the contract terms? Budget is approved."),
+    ("Demo request - {company}",
+     "We are replacing our current tool by the end of the quarter and {product} is on the shortlist. "
+     "Can we book a demo this week with our VP of Sales? We have {seats} users."),
+    ("Ready to buy {product}",
+     "Our procurement team asked me for an invoice for {seats} licenses of {product}. What are the next steps?"),
+]
+WARM = [
+    ("Question about {product}",
+     "Hello, I read about {product} and I am curious whether it integrates with our CRM. "
+     "We might look at tools like this next year."),
+    ("More info on {product}",
+     "Could you send some material about {product}? We are {company}, around {seats} people, still researching options."),
+    ("Webinar follow-up",
+     "Thanks for the webinar on {product}. Interesting ideas, I will share them with my manager and get back to you."),
+]
+COLD = [
+    ("Partnership opportunity",
+     "Hi, we offer SEO services and link building for software companies. Would you like a free audit?"),
+    ("Re: your job posting",
+     "Hello, I am applying for the sales position I saw on your website. Please find my CV attached."),
+    ("Not interested",
+     "Please remove me from your list, we already use another {product} vendor."),
+]
+NOISE = [
+    ("MAILER-DAEMON@mail.{domain}", "Undeliverable: Pricing for {product}",
+     "Delivery to the following recipient failed permanently."),
+    ("{name}@{domain}", "Automatic reply: {product}", "I am out of the office until Monday with limited access to e-mail."),
+    ("newsletter@{domain}", "{company} monthly news", "Our latest product updates. Click here to unsubscribe."),
+]
+LABEL_WEIGHTS = {"hot": 0.2, "warm": 0.3, "cold": 0.5}
+
+
+def _fill(template: str, values: dict) -> str:
+    return template.format(**values)
+
+
+def generate(count: int, seed: int = 42, duplicate_share: float = 0.05, noise_share: float = 0.4) -> list[dict]:
+    """`count` e-mails with email_id, sender, subject, body and label; noise_share is relative to cold mail."""
+    rng = random.Random(seed)
+    emails = []
+    for i in range(count):
+        if emails and rng.random() < duplicate_share:
+            original = rng.choice(emails)
+            subject = original["subject"] if rng.random() < 0.5 else f"Re: {original['subject']}"
+            emails.append({**original, "email_id": f"synthetic-{seed}-{i}", "subject": subject})
+            continue
+        company = rng.choice(COMPANIES)
+        domain = company.lower().replace(" ", "") + rng.choice([".com", ".com.br", ".io"])
+        name = rng.choice(FIRST_NAMES)
+        values = {"company": company, "domain": domain, "name": name, "product": rng.choice(PRODUCTS),
+                  "seats": rng.choice([5, 12, 25, 50, 120, 300])}
+        label = rng.choices(list(LABEL_WEIGHTS), weights=list(LABEL_WEIGHTS.values()))[0]
+        sender = f"{name}.{rng.randrange(1000)}@{domain}"
+        if label == "cold" and rng.random() < noise_share:
+            sender_template, subject, body = rng.choice(NOISE)
+            sender = _fill(sender_template, values)
+        else:
+            subject, body = rng.choice({"hot": HOT, "warm": WARM, "cold": COLD}[label])
+        emails.append({
+            "email_id": f"synthetic-{seed}-{i}",
+            "sender": sender,
+            "subject": _fill(subject, values),
+            "body": _fill(body, values),
+            "label": label,
+        })
+    return emails
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="dataset/emails.jsonl")
+    args = parser.parse_args()
+
+    with open(args.out, "w") as f:
+        for email in generate(args.count, args.seed):
+            f.write(json.dumps(email, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
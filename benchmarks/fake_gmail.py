@@ -0,0 +1,127 @@
+"""
+In-memory stand-in for the parts of the Gmail v1 API the ingestor uses, with
+a configurable per-HTTP-call latency so fetch strategies can be compared
+offline. Every `.execute()` counts as one round-trip, and a batch request
+counts as one round-trip no matter how many calls it carries.
+"""
+
+import base64
+import time
+
+from googleapiclient.errors import HttpError
+
+
+class _Request:
+    def __init__(self, gmail, fn):
+        self.gmail = gmail
+        self.fn = fn
+
+    def execute(self):
+        self.gmail.round_trip()
+        return self.fn()
+
+
+class _Batch:
+    def __init__(self, gmail, callback):
+        self.gmail = gmail
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request, request_id))
+
+    def execute(self):
+        self.gmail.round_trip()
+        for request, request_id in self.requests:
+            status = self.gmail.take_failure(request_id)
+            if status:
+                self.callback(request_id, None, HttpError(_HttpResponse(status), b"batch call failed"))
+            else:
+                self.callback(request_id, request.fn(), None)
+
+
+class _Resource:
+    def __init__(self, **methods):
+        self.__dict__.update(methods)
+
+
+class _HttpResponse(dict):
+    def __init__(self, status):
+        super().__init__(status=str(status))
+        self.status = status
+        self.reason = "Not Found" if status == 404 else "Error"
+
+
+class FakeGmail:
+    def __init__(self, latency: float = 0.0, page_size: int = 100, oldest_history_id: int = 1):
+        self.latency = latency
+        self.page_size = page_size
+        self.oldest_history_id = oldest_history_id
+        self.messages: dict[str, dict] = {}
+        self.history: list[tuple[int, str]] = []
+        self.history_id = 1000
+        self.calls = 0
+        self.failures: dict[str, list[int]] = {}  # message id -> HTTP statuses its next batched gets fail with
+
+    def fail(self, msg_id: str, *statuses: int):
+        self.failures.setdefault(msg_id, []).extend(statuses)
+
+    def take_failure(self, msg_id: str) -> int | None:
+        statuses = self.failures.get(msg_id)
+        return statuses.pop(0) if statuses else None
+
+    def round_trip(self):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_message(self, sender: str, subject: str, body: str) -> str:
+        self.history_id += 1
+        msg_id = f"msg{self.history_id}"
+        self.messages[msg_id] = {
+            "id": msg_id,
+            "historyId": str(self.history_id),
+            "snippet": body[:100],
+            "payload": {
+                "headers": [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}],
+                "body": {"data": base64.urlsafe_b64encode(body.encode()).decode()},
+            },
+        }
+        self.history.append((self.history_id, msg_id))
+        return msg_id
+
+    def _page(self, items, page_token):
+        start = int(page_token or 0)
+        end = start + self.page_size
+        return items[start:end], (str(end) if end < len(items) else None)
+
+    def _list(self, userId, labelIds=None, q=None, pageToken=None):
+        ids, next_token = self._page(list(self.messages), pageToken)
+        response = {"messages": [{"id": i} for i in ids]}
+        if next_token:
+            response["nextPageToken"] = next_token
+        return response
+
+    def _history(self, userId, startHistoryId, historyTypes=None, labelId=None, pageToken=None):
+        if int(startHistoryId) < self.oldest_history_id:
+            raise HttpError(_HttpResponse(404), b"historyId too old")
+        added = [(h, i) for h, i in self.history if h > int(startHistoryId)]
+        records, next_token = self._page(added, pageToken)
+        response = {"historyId": str(self.history_id),
+                    "history": [{"id": str(h), "messagesAdded": [{"message": {"id": i}}]} for h, i in records]}
+        if next_token:
+            response["nextPageToken"] = next_token
+        return response
+
+    def users(self):
+        return _Resource(
+            getProfile=lambda userId: _Request(self, lambda: {"historyId": str(self.history_id)}),
+            messages=lambda: _Resource(
+                list=lambda **kw: _Request(self, lambda: self._list(**kw)),
+                get=lambda userId, id, format=None: _Request(self, lambda: self.messages[id]),
+            ),
+            history=lambda: _Resource(list=lambda **kw: _Request(self, lambda: self._history(**kw))),
+        )
+
+    def new_batch_http_request(self, callback):
+        return _Batch(self, callback)
@@ -0,0 +1,89 @@
+"""
+Shared helpers for the benchmarks: latency summaries and JSON result files.
+
+Every driver reports the same summary (count, errors, throughput, mean and
+p50/p95/p99 latency in milliseconds) so runs can be diffed across commits;
+`save` adds the git revision and the run parameters.
+"""
+
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+def summarize(latencies: list[float], elapsed: float, errors: int = 0) -> dict:
+    """Latencies in seconds in, milliseconds out."""
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+class Recorder:
+    """Collects per-operation latencies; safe to share between asyncio tasks."""
+
+    def __init__(self):
+        self.latencies: list[float] = []
+        self.errors = 0
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def measure(self):
+        # Failed operations are counted, logged once, and do not stop the run
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if not self.errors:
+                print(f"first error: {e!r}")
+            self.errors += 1
+        else:
+            self.latencies.append(time.perf_counter() - start)
+
+    def record(self, latency: float):
+        self.latencies.append(latency)
+
+    def summary(self) -> dict:
+        return summarize(self.latencies, time.perf_counter() - self.started, self.errors)
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(path: str, benchmark: str, params: dict, results: dict):
+    with open(path, "w") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "saved_at": datetime.now(timezone.utc).isoformat(),
+            "params": params,
+            "results": results,
+        }, f, indent=2)
+
+
+def print_summaries(results: dict[str, dict]):
+    print(f"{'driver':<18} {'count':>7} {'errors':>6} {'per s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<18} {r['count']:>7} {r['errors']:>6} {r['throughput_per_s']:>9.1f} "
+              f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
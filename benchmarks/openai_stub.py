@@ -0,0 +1,107 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Answers the scorer's single and packed prompts with a keyword-based score
+after a configurable delay (fixed latency plus uniform jitter), can fail a
+share of requests with 429/503 to exercise retries, and reports token
+usage like the real API. Use it in-process via `transport()` (an
+httpx.MockTransport for Scorer(transport=...)) or as a server:
+
+    python -m benchmarks.openai_stub --port 8089 --latency 0.4 --jitter 0.2
+    OPENAI_BASE_URL=http://localhost:8089/v1 OPENAI_API_KEY=stub celery -A worker.tasks worker
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+
+import httpx
+
+HOT_WORDS = re.compile(r"\b(quote|invoice|contract|demo|buy|budget|licenses|procurement)\b", re.I)
+WARM_WORDS = re.compile(r"\b(curious|material|info|interesting|research|webinar|integrates)\b", re.I)
+_PACKED = re.compile(r"E-mail (\d+):\n(.*?)(?=\n\nE-mail \d+:\n|\Z)", re.S)
+
+
+def classify(text: str) -> dict:
+    if HOT_WORDS.search(text):
+        score = 0.9
+    elif WARM_WORDS.search(text):
+        score = 0.6
+    else:
+        score = 0.2
+    return {"score": score, "stage": "QUALIFIED" if score >= 0.6 else "NEW"}
+
+
+def answer(content: str) -> dict:
+    packed = _PACKED.findall(content)
+    if packed:
+        return {"results": [{"index": int(i), **classify(text)} for i, text in packed]}
+    return classify(content)
+
+
+class OpenAIStub:
+    def __init__(self, latency: float = 0.3, jitter: float = 0.1, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    async def complete(self, payload: dict) -> tuple[int, dict]:
+        self.requests += 1
+        await asyncio.sleep(self.latency + self.rng.uniform(0, self.jitter))
+        if self.rng.random() < self.error_rate:
+            self.errors += 1
+            status = self.rng.choice([429, 503])
+            return status, {"error": {"message": "stubbed failure", "code": status}}
+        prompt = "\n".join(m["content"] for m in payload["messages"])
+        content = json.dumps(answer(payload["messages"][-1]["content"]))
+        prompt_tokens, completion_tokens = len(prompt) // 4, len(content) // 4
+        return 200, {
+            "id": f"chatcmpl-stub-{self.requests}",
+            "object": "chat.completion",
+            "model": payload.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def transport(self) -> httpx.MockTransport:
+        async def handler(request: httpx.Request) -> httpx.Response:
+            status, body = await self.complete(json.loads(request.content))
+            return httpx.Response(status, json=body)
+        return httpx.MockTransport(handler)
+
+    def app(self):
+        from fastapi import FastAPI, Request
+        from fastapi.responses import JSONResponse
+
+        app = FastAPI()
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            status, body = await self.complete(await request.json())
+            return JSONResponse(body, status_code=status)
+
+        return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra uniform random seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of 429/503 answers")
+    args = parser.parse_args()
+    stub = OpenAIStub(args.latency, args.jitter, args.error_rate)
+    uvicorn.run(stub.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
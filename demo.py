@@ -1,11 +1,10 @@
 import asyncio
 import os
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal, engine, Base
-from backend.app import scorer, models
-
-# Ensure tables are created
-Base.metadata.create_all(bind=engine)
+from backend.app.database import SessionLocal
+from backend.app import models
+from backend.app.schema import upgrade
+from backend import scorer
 
 async def run_demo():
     print("\n--- Starting Functional Demo ---")
@@ -20,7 +19,7 @@ async def run_demo():
     try:
         # Score the email
         ai_scorer = scorer.Scorer()
-        score, stage = await ai_scorer.score_email(email_subject, email_body)
+        score, stage = await ai_scorer.score_email(subject=email_subject, body=email_body)
 
         # Create a dummy email_id for the demo
         email_id = f"demo_email_{hash(email_subject + email_body)}"
@@ -62,4 +61,6 @@ if __name__ == "__main__":
         os.environ["OPENAI_API_KEY"] = "sk-dummy-key-for-local-test"
         print("WARNING: OPENAI_API_KEY not found in environment. Using a dummy key. AI scoring will likely fail unless a valid key is provided.")
 
+    # Ensure the tables exist
+    upgrade()
     asyncio.run(run_demo())
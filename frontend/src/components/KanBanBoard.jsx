@@ -3,16 +3,34 @@ import { DndContext, closestCorners } from "@dnd-kit/core";
 import { useEffect } from "react";
 import Column from "./Column";
 
+const LEADS_PAGE_SIZE = 200; // the server's MAX_PAGE_SIZE
+
 const fetchLeads = async () => {
-  const res = await fetch("/graphql", {
-    method: "POST",
-    headers: { "Content-Type": "application/json" },
-    body: JSON.stringify({
-      query: `query { leads { id sender subject score stage } }`,
-    }),
-  });
-  const json = await res.json();
-  return json.data.leads;
+  // The board shows every lead, so follow the cursor until the last page
+  const leads = [];
+  let after = null;
+  do {
+    const res = await fetch("/graphql", {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({
+        query: `
+          query Leads($first: Int!, $after: String) {
+            leads(first: $first, after: $after) {
+              edges { node { id sender subject score stage version } }
+              pageInfo { hasNextPage endCursor }
+            }
+          }
+        `,
+        variables: { first: LEADS_PAGE_SIZE, after },
+      }),
+    });
+    const json = await res.json();
+    const page = json.data.leads;
+    leads.push(...page.edges.map((edge) => edge.node));
+    after = page.pageInfo.hasNextPage ? page.pageInfo.endCursor : null;
+  } while (after);
+  return leads;
 };
 
 const updateLeadStage = async ({ leadId, newStage }) => {
@@ -25,6 +43,7 @@ const updateLeadStage = async ({ leadId, newStage }) => {
           updateLeadStage(leadId: $leadId, newStage: $newStage) {
             id
             stage
+            version
           }
         }
       `,
@@ -43,7 +62,7 @@ export default function KanbanBoard() {
     mutationFn: updateLeadStage, 
     onSuccess: (updatedLead) => {
         queryClient.setQueryData(["leads"], (oldLeads) => {
-            return oldLeads.map(lead => lead.id === updatedLead.id ? { ...lead, stage: updatedLead.stage } : lead);
+            return oldLeads.map(lead => lead.id === updatedLead.id ? { ...lead, ...updatedLead } : lead);
         });
     }
   });
@@ -51,8 +70,14 @@ export default function KanbanBoard() {
   useEffect(() => {
     const eventSource = new EventSource("/sse/leads");
     eventSource.onmessage = (event) => {
-      const newLead = JSON.parse(event.data);
-      queryClient.setQueryData(["leads"], (oldLeads) => [...(oldLeads || []), newLead]);
+      // Events carry only the changed fields; older versions than ours are stale
+      const change = JSON.parse(event.data);
+      queryClient.setQueryData(["leads"], (oldLeads) => {
+        const current = (oldLeads || []).find((l) => l.id === change.id);
+        if (current && current.version >= change.version) return oldLeads;
+        const rest = (oldLeads || []).filter((l) => l.id !== change.id);
+        return [...rest, { ...current, ...change }];
+      });
     };
     return () => eventSource.close();
   }, [queryClient]);
@@ -1,10 +1,20 @@
 import PropTypes from 'prop-types';
+import { useState } from 'react';
 
 function LeadCard({ lead }) {
+  // Bodies are not part of the board payload; load one when the card is opened
+  const [body, setBody] = useState(null);
+  const toggleBody = async () => {
+    if (body !== null) return setBody(null);
+    const res = await fetch(`/leads/${lead.id}/body`);
+    if (res.ok) setBody((await res.json()).body);
+  };
+
   return (
-    <div className="bg-gray-700 rounded-lg p-2 mb-2">
+    <div className="bg-gray-700 rounded-lg p-2 mb-2" onDoubleClick={toggleBody}>
       <p className="text-sm font-semibold">{lead.sender}</p>
       <p className="text-xs">{lead.subject}</p>
+      {body !== null && <p className="text-xs opacity-80 whitespace-pre-wrap mt-1">{body}</p>}
       <p className="text-right text-xs opacity-70">{(lead.score*100).toFixed(0)}%</p>
     </div>
   );
@@ -12,6 +22,7 @@ function LeadCard({ lead }) {
 
 LeadCard.propTypes = {
   lead: PropTypes.shape({
+    id: PropTypes.oneOfType([PropTypes.number, PropTypes.string]).isRequired,
     sender: PropTypes.string.isRequired,
     subject: PropTypes.string.isRequired,
     score: PropTypes.number.isRequired,
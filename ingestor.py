@@ -1,34 +1,184 @@
 """
 Puxa e-mails não lidos via Gmail ou Microsoft Graph,
 publica cada mensagem na fila Celery para pontuação.
+
+Only messages added since the last run are pulled: the Gmail historyId
+reached by each run is checkpointed, and the next run asks the History API
+for what changed after it. Message bodies are fetched with Gmail batch HTTP
+requests, and everything is published through one pooled broker connection,
+to the high or low priority lane chosen by backend.app.triage.
 """
 
-import os, base64, json
+import os, base64, json, time
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from kombu import Connection, Exchange, Queue
+from kombu.pools import producers
+from backend.app.logging_config import configure_logging, get_logger
+from backend.app.triage import HIGH, LOW, lane
+
+logger = get_logger(__name__)
 
 CELERY_BROKER = os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "50"))  # Gmail accepts up to 100 calls per batch
+GMAIL_FETCH_RETRIES = int(os.getenv("GMAIL_FETCH_RETRIES", "3"))  # extra batches for messages whose get failed
+GMAIL_RETRY_DELAY = float(os.getenv("GMAIL_RETRY_DELAY", "1"))    # seconds before the first retry, then doubled
+GMAIL_CHECKPOINT_FILE = os.getenv("GMAIL_CHECKPOINT_FILE", ".gmail_history_id")
+INGEST_INTERVAL = int(os.getenv("INGEST_INTERVAL", "60"))
+
 exchange = Exchange("leads", type="direct")
-queue    = Queue("raw_emails", exchange, routing_key="raw")
+queue    = Queue("raw_emails", exchange, routing_key="raw")  # Pre-triage queue, still drained by the consumer
+lanes    = {name: Queue(f"raw_emails.{name}", exchange, routing_key=f"raw.{name}") for name in (HIGH, LOW)}
+broker   = Connection(CELERY_BROKER)  # Reused by every run through kombu's producer pool
+
+class HistoryCheckpoint:
+    """Last Gmail historyId that was fully published, kept in a small file."""
+
+    def __init__(self, path: str = GMAIL_CHECKPOINT_FILE):
+        self.path = path
 
-def fetch_gmail():
+    def load(self) -> str | None:
+        try:
+            with open(self.path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def save(self, history_id: str):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(str(history_id))
+        os.replace(tmp, self.path)
+
+def gmail_service():
         # In a production environment, consider a more secure way to handle credentials,
     # such as OAuth 2.0 flows without storing token.json directly in the filesystem.
     # For this POC, we'll assume credentials are handled externally or via environment variables.
     # creds = Credentials.from_authorized_user_file("token.json", ["https://www.googleapis.com/auth/gmail.readonly"])
     # Placeholder for demonstration purposes:
     raise NotImplementedError("Gmail authentication needs to be implemented securely. token.json removed for security.")
-    service = build("gmail", "v1", credentials=creds)
-    results = service.users().messages().list(userId='me', labelIds=['INBOX'], q="is:unread").execute()
-    for msg in results.get("messages", []):
-        data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-        payload = base64.urlsafe_b64decode(data['payload']['body']['data']).decode()
-        with Connection(CELERY_BROKER) as conn:
-            producer = conn.Producer(serializer='json')
-            producer.publish({
-                "email_id": msg['id'],
-                "sender": next(h['value'] for h in data['payload']['headers'] if h['name']=="From"),
-                "subject": data['snippet'],
-                "body": payload
-            }, exchange=exchange, routing_key="raw")
+    return build("gmail", "v1", credentials=creds)
+
+def _paginate(request_factory, **kwargs):
+    page_token = None
+    while True:
+        response = request_factory(pageToken=page_token, **kwargs).execute()
+        yield response
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+def list_new_message_ids(service, start_history_id: str | None) -> tuple[list[str], str]:
+    """Ids of messages to ingest and the historyId to checkpoint once they are published."""
+    users = service.users()
+    if start_history_id:
+        try:
+            ids, history_id = [], start_history_id
+            for page in _paginate(users.history().list, userId="me", startHistoryId=start_history_id,
+                                  historyTypes=["messageAdded"], labelId="INBOX"):
+                history_id = page.get("historyId", history_id)
+                for record in page.get("history", []):
+                    ids.extend(added["message"]["id"] for added in record.get("messagesAdded", []))
+            return list(dict.fromkeys(ids)), history_id
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            # Checkpoint older than Gmail keeps history for: fall back to a full sync
+    history_id = users.getProfile(userId="me").execute()["historyId"]
+    ids = []
+    for page in _paginate(users.messages().list, userId="me", labelIds=["INBOX"], q="is:unread"):
+        ids.extend(msg["id"] for msg in page.get("messages", []))
+    return ids, history_id
+
+def fetch_messages(service, ids: list[str], batch_size: int = GMAIL_BATCH_SIZE, failed: list[str] | None = None,
+                   retries: int = GMAIL_FETCH_RETRIES):
+    """
+    Yields full messages, fetching `batch_size` of them per batch HTTP request.
+    Messages whose get failed are fetched again in up to `retries` more rounds;
+    the ids still failing after that are appended to `failed`. Messages deleted
+    since they were listed (404) are skipped.
+    """
+    pending = ids
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(GMAIL_RETRY_DELAY * 2 ** (attempt - 1))
+        errors = {}
+        for start in range(0, len(pending), batch_size):
+            fetched = {}
+
+            def collect(request_id, response, exception):
+                if exception is None:
+                    fetched[request_id] = response
+                elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                    logger.info("Message deleted before it was fetched", message_id=request_id)
+                else:
+                    errors[request_id] = exception
+
+            batch = service.new_batch_http_request(callback=collect)
+            for msg_id in pending[start:start + batch_size]:
+                batch.add(service.users().messages().get(userId='me', id=msg_id, format='full'), request_id=msg_id)
+            batch.execute()
+            for msg_id in pending[start:start + batch_size]:
+                if msg_id in fetched:
+                    yield fetched[msg_id]
+        if not errors:
+            return
+        pending = list(errors)
+        logger.warning("Gmail message fetch failed", message_ids=pending[:20], failed=len(pending), attempt=attempt,
+                       error=str(next(iter(errors.values()))))
+    if failed is not None:
+        failed.extend(pending)
+
+def to_email(data: dict) -> dict:
+    headers = {h['name']: h['value'] for h in data['payload']['headers']}
+    body = data['payload'].get('body', {}).get('data')
+    if body is None:
+        # Multipart message: take the first text part
+        parts = data['payload'].get('parts', [])
+        body = next((p['body'].get('data') for p in parts if p.get('mimeType', '').startswith('text/')), None)
+    return {
+        "email_id": data['id'],
+        "sender": headers.get("From", ""),
+        "subject": headers.get("Subject", data.get('snippet', "")),
+        "body": base64.urlsafe_b64decode(body).decode() if body else "",
+    }
+
+def publish_email(producer, email: dict) -> str:
+    email_lane = lane(email["sender"], email["subject"], email["body"])
+    # enqueued_at lets the consumer report how long each lane keeps mail waiting
+    producer.publish(email, exchange=exchange, routing_key=f"raw.{email_lane}", serializer='json',
+                     declare=[lanes[email_lane]], retry=True, headers={"enqueued_at": time.time()})
+    return email_lane
+
+def fetch_gmail(service=None, connection=None, checkpoint=None) -> int:
+    service = service or gmail_service()
+    checkpoint = checkpoint or HistoryCheckpoint()
+    ids, history_id = list_new_message_ids(service, checkpoint.load())
+    published, failed = 0, []
+    with producers[connection or broker].acquire(block=True) as producer:
+        for data in fetch_messages(service, ids, failed=failed):
+            publish_email(producer, to_email(data))
+            published += 1
+    if failed:
+        # The next run lists the same history again; what was published now is deduplicated by the worker
+        logger.error("Gmail sync incomplete, checkpoint not advanced", published=published, failed=len(failed))
+        return published
+    # Only advance once everything up to history_id is on the queue
+    checkpoint.save(history_id)
+    return published
+
+def main():
+    configure_logging()
+    try:
+        service = gmail_service()
+    except NotImplementedError as e:
+        logger.error("Gmail ingestion is not configured", error=str(e))
+        raise SystemExit(1)
+    while True:
+        count = fetch_gmail(service)
+        logger.info("Gmail sync finished", published=count)
+        time.sleep(INGEST_INTERVAL)
+
+if __name__ == "__main__":
+    main()
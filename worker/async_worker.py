@@ -0,0 +1,274 @@
+"""
+Asyncio worker for the raw_emails lanes: one long-lived event loop per process.
+
+A prefork process has a single e-mail in flight, and spends most of it
+waiting on the LLM. Here one loop classifies up to ASYNC_WORKER_CONCURRENCY
+e-mails at once, and the HTTP client, the asyncio Redis pool and the async
+database engine live as long as the process.
+
+kombu is synchronous, so a consumer thread owns the broker connection: it
+hands messages to the loop and acks them once the loop has settled them.
+The broker prefetch (ASYNC_WORKER_CONCURRENCY) bounds what is in flight, so
+a slow LLM leaves mail waiting in the queue rather than in memory.
+
+Each e-mail goes through classify_email's steps with the same metrics and
+its own correlation id, and is retried up to ASYNC_WORKER_MAX_RETRIES times
+with Celery's exponential backoff and full jitter; a backoff only delays its
+own e-mail. Messages are acked once their e-mail is stored, deduplicated or
+out of retries; on SIGTERM the worker stops consuming, finishes what is in
+flight for up to ASYNC_WORKER_SHUTDOWN_TIMEOUT seconds and requeues the rest.
+
+    python -m worker.async_worker
+    python -m worker.async_worker --concurrency 128
+"""
+
+import argparse
+import asyncio
+import os
+import queue
+import signal
+import socket
+import threading
+import time
+import uuid
+
+import structlog
+from celery.utils.time import get_exponential_backoff_interval
+from kombu import Connection
+
+from backend.app import models
+from backend.app.board import card_from_lead, lead_board
+from backend.app.database import AsyncSessionLocal, async_engine
+from backend.app.dedup import AsyncDedupIndex
+from backend.app.events import card_event, publish_lead_update
+from backend.app.logging_config import get_logger, shutdown_logging
+from backend.app.metrics import EMAIL_PROCESSING_LATENCY, EMAIL_PROCESSING_TOTAL, LEAD_THROUGHPUT
+from backend.app.observability import stage_timer
+from backend.app.prompt_history import prompt_history_sink
+from backend.app.redis_pool import async_pipeline, close_async_redis, get_async_redis
+from worker import tasks
+from worker.consumer import TRANSPORT_OPTIONS, observe_queue_wait, queues
+
+logger = get_logger(__name__)
+
+ASYNC_WORKER_CONCURRENCY = int(os.getenv("ASYNC_WORKER_CONCURRENCY", "64"))
+# classify_email's policy: retry_kwargs={'max_retries': 3}, retry_backoff=True (capped at 600 s, full jitter)
+ASYNC_WORKER_MAX_RETRIES = int(os.getenv("ASYNC_WORKER_MAX_RETRIES", "3"))
+ASYNC_WORKER_RETRY_BACKOFF_MAX = 600
+ASYNC_WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("ASYNC_WORKER_SHUTDOWN_TIMEOUT", "30"))
+BROKER_POLL_INTERVAL = 0.05  # How often the consumer thread sends acks while no message arrives
+
+# Result status -> EMAIL_PROCESSING_TOTAL label, as classify_batch reports them
+STATUS_LABELS = {"processed": "success"}
+
+
+class AsyncClassifier:
+    """classify_email on asyncio clients. Create it inside the loop that will use it."""
+
+    def __init__(self, scorer=None, redis_client=None, session_factory=AsyncSessionLocal,
+                 enqueue_enrichment=None, max_retries: int = ASYNC_WORKER_MAX_RETRIES):
+        self.scorer = scorer or tasks.ai_scorer
+        self.redis = redis_client or get_async_redis()
+        self.dedup = AsyncDedupIndex(self.redis)
+        self.session_factory = session_factory
+        self.enqueue_enrichment = enqueue_enrichment or tasks.enrich_leads.delay
+        self.max_retries = max_retries
+
+    async def classify(self, email: dict) -> dict:
+        """One attempt: dedup, score, insert, publish."""
+        with stage_timer("dedup"):
+            duplicate_id = await self.dedup.find_duplicate(email["sender"], email["subject"])
+        if duplicate_id is not None:
+            logger.info("Email deduplicated (fuzzy match)", email_id=email["email_id"])
+            return {"lead_id": duplicate_id, "status": "deduplicated"}
+
+        with stage_timer("score"):
+            result = await self.scorer.score_email(subject=email["subject"], body=email["body"],
+                                                   sender=email["sender"])
+        score, stage = result
+        lead = models.Lead(
+            email_id=email["email_id"],
+            sender=email["sender"],
+            subject=email["subject"],
+            body=email["body"],
+            score=score,
+            stage=stage,
+            **tasks.score_provenance(email, result)
+        )
+        with stage_timer("db_insert"):
+            async with self.session_factory() as db:
+                db.add(lead)
+                await db.commit()
+
+        with stage_timer("publish"):
+            card = card_from_lead(lead)
+            async with async_pipeline(self.redis) as pipe:
+                self.dedup.add(lead.id, lead.sender, lead.subject, pipe=pipe)
+                publish_lead_update(pipe, card_event(card))
+                lead_board.write(pipe, card)
+            # Celery's publish is blocking socket I/O
+            await asyncio.to_thread(self.enqueue_enrichment, [lead.id])
+        LEAD_THROUGHPUT.labels(stage=stage).inc()
+        logger.info("Email classification successful", email_id=email["email_id"], lead_id=lead.id, stage=stage)
+        return {"lead_id": lead.id, "status": "processed"}
+
+    async def handle(self, email) -> dict:
+        """classify() with classify_email's retry policy; returns the final result and never raises."""
+        if not (isinstance(email, dict) and all(field in email for field in tasks.EMAIL_FIELDS)):
+            logger.error("Invalid email payload", payload=str(email)[:200])
+            EMAIL_PROCESSING_TOTAL.labels(status="invalid").inc()
+            return {"lead_id": None, "status": "invalid"}
+        with structlog.contextvars.bound_contextvars(correlation_id=str(uuid.uuid4())):
+            logger.info("Email classification started", email_id=email["email_id"])
+            for retries in range(self.max_retries + 1):
+                start_time = time.time()
+                status = "failed"
+                try:
+                    result = await self.classify(email)
+                    status = STATUS_LABELS.get(result["status"], result["status"])
+                    return result
+                except Exception:
+                    logger.error("Email classification failed", email_id=email["email_id"], retries=retries,
+                                 exc_info=True)
+                finally:
+                    EMAIL_PROCESSING_TOTAL.labels(status=status).inc()
+                    EMAIL_PROCESSING_LATENCY.labels(status=status).observe(time.time() - start_time)
+                if retries < self.max_retries:
+                    await asyncio.sleep(get_exponential_backoff_interval(
+                        factor=1, retries=retries, maximum=ASYNC_WORKER_RETRY_BACKOFF_MAX, full_jitter=True))
+            return {"lead_id": None, "status": "failed"}
+
+
+class BrokerThread(threading.Thread):
+    """
+    Owns the kombu connection: passes each message to `deliver` on the event
+    loop and acks or requeues the messages the loop hands back via settle().
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, deliver, prefetch: int, url: str = tasks.CELERY_BROKER):
+        super().__init__(name="broker-consumer", daemon=True)
+        self.loop = loop
+        self.deliver = deliver
+        self.prefetch = prefetch
+        self.url = url
+        self.settled = queue.SimpleQueue()
+        self.stopping = threading.Event()  # stop taking messages, keep settling
+        self.closing = threading.Event()   # settle what is left and disconnect
+        self.error = None
+
+    def settle(self, message, requeue: bool = False):
+        """Thread-safe; the ack is sent by the consumer thread, which owns the channel."""
+        self.settled.put((message, requeue))
+
+    def _flush(self):
+        while True:
+            try:
+                message, requeue = self.settled.get_nowait()
+            except queue.Empty:
+                return
+            if requeue:
+                message.requeue()
+            else:
+                message.ack()
+
+    def _on_message(self, body, message):
+        observe_queue_wait(message)
+        self.loop.call_soon_threadsafe(self.deliver, body, message)
+
+    def run(self):
+        try:
+            with Connection(self.url, transport_options=TRANSPORT_OPTIONS) as conn:
+                consumer = conn.Consumer(queues, callbacks=[self._on_message], accept=["json"],
+                                         prefetch_count=self.prefetch)
+                with consumer:
+                    while not self.stopping.is_set():
+                        self._flush()
+                        try:
+                            conn.drain_events(timeout=BROKER_POLL_INTERVAL)
+                        except socket.timeout:
+                            pass
+                while not self.closing.wait(BROKER_POLL_INTERVAL):
+                    self._flush()
+                self._flush()
+        except Exception as e:
+            self.error = e
+            logger.error("Broker consumer failed", exc_info=True)
+
+
+async def run(stop: asyncio.Event, concurrency: int = ASYNC_WORKER_CONCURRENCY,
+              classifier: AsyncClassifier | None = None, url: str = tasks.CELERY_BROKER,
+              shutdown_timeout: float = ASYNC_WORKER_SHUTDOWN_TIMEOUT):
+    """Consumes the raw_emails lanes until `stop` is set, then drains the e-mails in flight."""
+    loop = asyncio.get_running_loop()
+    classifier = classifier or AsyncClassifier()
+    in_flight: set[asyncio.Task] = set()
+
+    async def process(body, message):
+        try:
+            await classifier.handle(body)
+        except asyncio.CancelledError:
+            broker.settle(message, requeue=True)  # cut off by shutdown; another worker takes it
+            raise
+        broker.settle(message)
+
+    def deliver(body, message):
+        if broker.stopping.is_set():
+            broker.settle(message, requeue=True)
+            return
+        task = loop.create_task(process(body, message))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    broker = BrokerThread(loop, deliver, prefetch=concurrency, url=url)
+    broker.start()
+    watcher = loop.create_task(asyncio.to_thread(broker.join))
+    stopped = loop.create_task(stop.wait())
+    try:
+        await asyncio.wait([stopped, watcher], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        stopped.cancel()
+        broker.stopping.set()
+        if in_flight:
+            logger.info("Draining e-mails in flight", in_flight=len(in_flight))
+            _, unfinished = await asyncio.wait(in_flight, timeout=shutdown_timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+        broker.closing.set()
+        await watcher
+    if broker.error is not None:
+        raise broker.error
+
+
+async def serve(concurrency: int = ASYNC_WORKER_CONCURRENCY):
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    # One process now carries what a pool of processes did: allow as many LLM calls as e-mails in flight
+    tasks.ai_scorer.scorer.max_concurrency = concurrency
+    logger.info("Async worker started", concurrency=concurrency)
+    try:
+        await run(stop, concurrency)
+    finally:
+        await tasks.ai_scorer.scorer.aclose()  # also saves the semantic cache
+        await close_async_redis()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", type=int, default=ASYNC_WORKER_CONCURRENCY,
+                        help="e-mails classified at once")
+    args = parser.parse_args()
+
+    tasks.init_worker_process()
+    try:
+        asyncio.run(serve(args.concurrency))
+    finally:
+        prompt_history_sink.close()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    main()
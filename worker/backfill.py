@@ -0,0 +1,227 @@
+"""
+Bulk import of historical mail into the lead pipeline.
+
+Streams an mbox file, a directory of .eml files or a JSONL export (one
+{"email_id", "sender", "subject", "body"} object per line, with an optional
+ISO 8601 "received_at") one message at a time, so memory stays flat however
+large the mailbox is. Each lead is dated by when the message was received
+(its Date header), not by when it was imported. Messages go through
+tasks.classify_batch in batches: fuzzy dedup against the index, concurrent
+scoring bounded by OPENAI_MAX_CONCURRENCY and the shared rate limiter, one
+bulk INSERT per batch. E-mails whose id is already stored are skipped before
+scoring, so re-running an import is cheap.
+
+Progress is checkpointed after every batch; an interrupted run started again
+with the same source and checkpoint resumes after the last finished batch.
+
+    python -m worker.backfill mailbox.mbox
+    python -m worker.backfill exports/ --format eml --batch-size 200
+    python -m worker.backfill dataset/emails.jsonl --checkpoint .backfill.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from datetime import timezone
+from email import policy
+from email.parser import BytesParser
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from backend.app.logging_config import configure_logging, get_logger
+
+logger = get_logger(__name__)
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "100"))
+BACKFILL_CHECKPOINT_FILE = os.getenv("BACKFILL_CHECKPOINT_FILE", ".backfill_checkpoint.json")
+
+EMAIL_FIELDS = ("email_id", "sender", "subject", "body")
+_TAGS = re.compile(r"<[^>]+>")
+_QUOTED_FROM = re.compile(rb">+From ")
+_parser = BytesParser(policy=policy.default)
+
+
+class BackfillCheckpoint:
+    """How many records of a source have been fully processed, kept in a small JSON file."""
+
+    def __init__(self, path: str = BACKFILL_CHECKPOINT_FILE):
+        self.path = path
+
+    def load(self, source: str) -> int:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0
+        # A checkpoint left by another import does not apply to this one
+        return state["position"] if state.get("source") == os.path.abspath(source) else 0
+
+    def save(self, source: str, position: int, stats: dict):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"source": os.path.abspath(source), "position": position, "stats": stats}, f)
+        os.replace(tmp, self.path)
+
+
+def email_from_message(raw: bytes) -> dict:
+    message = _parser.parsebytes(raw)
+    part = message.get_body(preferencelist=("plain", "html"))
+    body = ""
+    if part is not None:
+        try:
+            body = part.get_content()
+        except (LookupError, UnicodeDecodeError):
+            body = part.get_payload(decode=True).decode("utf-8", errors="replace")
+        if part.get_content_subtype() == "html":
+            body = _TAGS.sub(" ", body)
+    sender, subject = str(message.get("From", "")), str(message.get("Subject", ""))
+    email_id = str(message.get("Message-ID", "")).strip().strip("<>")
+    if not email_id:
+        # Stable fallback so a re-import of the same message is still recognised
+        digest = hashlib.sha1(f"{sender}\0{subject}\0{message.get('Date', '')}\0{body}".encode()).hexdigest()
+        email_id = f"backfill-{digest}"
+    email = {"email_id": email_id, "sender": sender, "subject": subject, "body": body.strip()}
+    if received_at := received_at_from_message(message):
+        email["received_at"] = received_at
+    return email
+
+
+def received_at_from_message(message) -> str | None:
+    """The Date header as an ISO 8601 UTC timestamp, or None when it is missing or unparsable."""
+    try:
+        date = getattr(message.get("Date"), "datetime", None)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return date.astimezone(timezone.utc).isoformat()
+
+
+def read_mbox(path: str, start: int = 0) -> Iterator[dict]:
+    """Yields e-mails from an mbox file, reading it line by line; the first `start` messages are not parsed."""
+    current, lines, after_blank = -1, [], True
+    with open(path, "rb") as f:
+        for line in f:
+            if after_blank and line.startswith(b"From "):
+                if lines:
+                    yield email_from_message(b"".join(lines))
+                current, lines = current + 1, []
+            elif current >= start:
+                # mboxrd quoting: ">From " in a body was written for "From "
+                lines.append(line[1:] if _QUOTED_FROM.match(line) else line)
+            after_blank = line in (b"\n", b"\r\n")
+    if lines:
+        yield email_from_message(b"".join(lines))
+
+
+def read_eml_dir(path: str, start: int = 0) -> Iterator[dict]:
+    """Yields e-mails from every .eml file under `path`, in sorted path order."""
+    files = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(path)
+        for name in names if name.lower().endswith(".eml")
+    )
+    for file in files[start:]:
+        with open(file, "rb") as f:
+            yield email_from_message(f.read())
+
+
+def read_jsonl(path: str, start: int = 0) -> Iterator[dict]:
+    with open(path, encoding="utf-8") as f:
+        # Skipped lines are only counted, not decoded
+        for line in islice((line for line in f if line.strip()), start, None):
+            record = json.loads(line)
+            email = {field: record.get(field) or "" for field in EMAIL_FIELDS}
+            if record.get("received_at"):
+                email["received_at"] = record["received_at"]
+            yield email
+
+
+READERS = {"mbox": read_mbox, "eml": read_eml_dir, "jsonl": read_jsonl}
+
+
+def detect_format(path: str) -> str:
+    if os.path.isdir(path):
+        return "eml"
+    return "jsonl" if path.endswith((".jsonl", ".ndjson")) else "mbox"
+
+
+def batched(records: Iterable[dict], size: int) -> Iterator[list[dict]]:
+    records = iter(records)
+    while batch := list(islice(records, size)):
+        yield batch
+
+
+def stored_email_ids(email_ids: list[str]) -> set[str]:
+    from sqlalchemy import select
+
+    from backend.app import models
+    from backend.app.database import SessionLocal
+
+    with SessionLocal() as db:
+        return set(db.scalars(select(models.Lead.email_id).where(models.Lead.email_id.in_(email_ids))))
+
+
+def backfill(source: str, fmt: str | None = None, checkpoint: BackfillCheckpoint | None = None,
+             batch_size: int = BACKFILL_BATCH_SIZE, limit: int | None = None,
+             classify: Callable[[list[dict]], list[dict]] | None = None,
+             known_ids: Callable[[list[str]], set[str]] = stored_email_ids) -> dict:
+    """Imports `source` from its checkpoint on; returns counts per status plus throughput."""
+    if classify is None:
+        from worker.tasks import classify_batch as classify
+    checkpoint = checkpoint or BackfillCheckpoint()
+    position = checkpoint.load(source)
+    records = READERS[fmt or detect_format(source)](source, start=position)
+    if limit is not None:
+        records = islice(records, limit)
+
+    stats = {"read": 0, "skipped": 0}
+    started = time.perf_counter()
+    for batch in batched(records, batch_size):
+        stored = known_ids([e["email_id"] for e in batch])
+        fresh, seen = [], set()
+        for email in batch:
+            if email["email_id"] in stored or email["email_id"] in seen:
+                stats["skipped"] += 1
+            else:
+                seen.add(email["email_id"])
+                fresh.append(email)
+        for result in classify(fresh) if fresh else []:
+            stats[result["status"]] = stats.get(result["status"], 0) + 1
+        stats["read"] += len(batch)
+        position += len(batch)
+        # Only advance once the whole batch is stored (or handed to classify_email for retries)
+        checkpoint.save(source, position, stats)
+        elapsed = time.perf_counter() - started
+        logger.info("Backfill batch done", position=position, read=stats["read"],
+                    per_second=round(stats["read"] / elapsed, 1))
+
+    elapsed = time.perf_counter() - started
+    return {**stats, "position": position, "elapsed_s": round(elapsed, 3),
+            "per_second": round(stats["read"] / elapsed, 1) if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("source", help="mbox file, directory of .eml files or .jsonl file")
+    parser.add_argument("--format", choices=sorted(READERS), help="detected from the path when omitted")
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    parser.add_argument("--checkpoint", default=BACKFILL_CHECKPOINT_FILE)
+    parser.add_argument("--limit", type=int, help="stop after this many messages")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the top")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    result = backfill(args.source, args.format, BackfillCheckpoint(args.checkpoint), args.batch_size, args.limit)
+    print(json.dumps({"event": "Backfill finished", **result}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Batching consumer for the raw_emails priority lanes.
+
+Drains up to CLASSIFY_BATCH_SIZE messages, or whatever arrived within
+CLASSIFY_BATCH_WAIT_MS of the first one, and classifies them together with
+tasks.classify_batch. Messages are acked once their batch is processed.
+An e-mail that fails on its own, or every e-mail of a batch that crashed on
+the database or Redis, is published again to the lane it came from with its
+delivery_count header raised; after CLASSIFY_MAX_DELIVERIES deliveries it
+goes to the raw_emails.dead queue instead.
+
+The ingestor triages mail into raw_emails.high and raw_emails.low; the
+broker is polled in priority order, so the low lane is only read when the
+high lane (and the legacy raw_emails queue, drained during upgrades) is empty.
+
+    python -m worker.consumer
+"""
+
+import os
+import socket
+import time
+import uuid
+
+import structlog
+from kombu import Connection, Exchange, Queue
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.app.metrics import QUEUE_WAIT
+from worker.tasks import CELERY_BROKER, classify_batch, init_worker_process, logger
+
+CLASSIFY_BATCH_SIZE = int(os.getenv("CLASSIFY_BATCH_SIZE", "50"))
+CLASSIFY_BATCH_WAIT_MS = int(os.getenv("CLASSIFY_BATCH_WAIT_MS", "200"))
+CLASSIFY_MAX_DELIVERIES = int(os.getenv("CLASSIFY_MAX_DELIVERIES", "5"))
+
+exchange = Exchange("leads", type="direct")
+queue = Queue("raw_emails", exchange, routing_key="raw")
+# Highest priority first; kombu's Redis transport polls them in this order
+queues = [Queue("raw_emails.high", exchange, routing_key="raw.high"), queue,
+          Queue("raw_emails.low", exchange, routing_key="raw.low")]
+queue_names = {q.routing_key: q.name for q in queues}
+dead_letter_queue = Queue("raw_emails.dead", exchange, routing_key="raw.dead")
+TRANSPORT_OPTIONS = {"queue_order_strategy": "priority"}
+
+
+def observe_queue_wait(message):
+    enqueued_at = message.headers.get("enqueued_at")
+    if enqueued_at is not None:
+        name = queue_names.get(message.delivery_info.get("routing_key"), queue.name)
+        QUEUE_WAIT.labels(queue=name).observe(max(0.0, time.time() - enqueued_at))
+
+
+def redeliver(producer, body, message, max_deliveries: int = CLASSIFY_MAX_DELIVERIES) -> bool:
+    """
+    Publishes a failed message again on its own lane, counting the delivery,
+    or on the dead-letter queue once it has been delivered max_deliveries
+    times. Returns False when it was dead-lettered; the caller still acks it.
+    """
+    deliveries = int(message.headers.get("delivery_count", 1))
+    if deliveries >= max_deliveries:
+        logger.error("Email dead-lettered", email_id=body.get("email_id") if isinstance(body, dict) else None,
+                     deliveries=deliveries)
+        producer.publish(body, exchange=exchange, routing_key=dead_letter_queue.routing_key,
+                         declare=[dead_letter_queue], headers={**message.headers, "failed_at": time.time()})
+        return False
+    routing_key = message.delivery_info.get("routing_key", queue.routing_key)
+    target = next((q for q in queues if q.routing_key == routing_key), queue)
+    producer.publish(body, exchange=exchange, routing_key=target.routing_key, declare=[target],
+                     headers={**message.headers, "enqueued_at": time.time(), "delivery_count": deliveries + 1})
+    return True
+
+
+def on_message(pending: list):
+    def callback(body, message):
+        observe_queue_wait(message)
+        pending.append((body, message))
+    return callback
+
+
+def fill_batch(conn, pending: list, batch_size: int, max_wait: float):
+    """Waits for a first message, then up to max_wait seconds for the batch to fill."""
+    deadline = None
+    while len(pending) < batch_size:
+        if pending and deadline is None:
+            deadline = time.monotonic() + max_wait
+        timeout = 1.0 if deadline is None else deadline - time.monotonic()
+        if timeout <= 0:
+            return
+        try:
+            conn.drain_events(timeout=timeout)
+        except socket.timeout:
+            if deadline is not None:
+                return
+
+
+def consume(batch_size: int = CLASSIFY_BATCH_SIZE, wait_ms: int = CLASSIFY_BATCH_WAIT_MS):
+    pending = []
+    with Connection(CELERY_BROKER, transport_options=TRANSPORT_OPTIONS) as conn:
+        consumer = conn.Consumer(queues, callbacks=[on_message(pending)],
+                                 accept=["json"], prefetch_count=batch_size * 2)
+        producer = conn.Producer(serializer="json")
+        with consumer:
+            while True:
+                fill_batch(conn, pending, batch_size, wait_ms / 1000)
+                batch, pending[:] = pending[:batch_size], pending[batch_size:]
+                if not batch:
+                    continue
+                retried = set()
+
+                def retry(i):
+                    retried.add(i)
+                    redeliver(producer, *batch[i])
+
+                with structlog.contextvars.bound_contextvars(correlation_id=str(uuid.uuid4())):
+                    try:
+                        classify_batch([body for body, _ in batch], retry=retry)
+                    except (SQLAlchemyError, RedisError, OSError):
+                        logger.error("Email batch crashed, redelivering", size=len(batch), exc_info=True)
+                        for i in range(len(batch)):
+                            if i not in retried:
+                                retry(i)
+                for _, message in batch:
+                    message.ack()
+
+
+if __name__ == "__main__":
+    init_worker_process()
+    consume()
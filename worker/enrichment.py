@@ -0,0 +1,75 @@
+"""
+Sentiment and noun/adjective extraction for lead bodies, run as its own
+pipeline stage after the lead is stored.
+
+Models are loaded once per worker process and texts are tagged in batches.
+By default this uses NLTK's averaged perceptron tagger (what TextBlob wraps,
+minus re-loading it for every blob) and TextBlob's lexicon sentiment; set
+ENRICH_SPACY_MODEL to tag with a spaCy pipeline through nlp.pipe instead.
+Bodies are cut to ENRICH_MAX_CHARS before any of this runs.
+"""
+
+import os
+import re
+
+ENRICH_MAX_CHARS = int(os.getenv("ENRICH_MAX_CHARS", "5000"))
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "64"))
+ENRICH_N_PROCESS = int(os.getenv("ENRICH_N_PROCESS", "1"))
+ENRICH_SPACY_MODEL = os.getenv("ENRICH_SPACY_MODEL", "")  # e.g. "en_core_web_sm"
+
+_WORD = re.compile(r"\w+(?:['-]\w+)*")
+
+
+def truncate(text: str, max_chars: int = ENRICH_MAX_CHARS) -> str:
+    """Cuts long bodies at the last word boundary under max_chars."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    return cut[:space] if space > max_chars // 2 else cut
+
+
+def keep_tag(tag: str) -> bool:
+    return tag.startswith("NN") or tag.startswith("JJ")
+
+
+class Enricher:
+    def __init__(self, spacy_model: str = ENRICH_SPACY_MODEL, batch_size: int = ENRICH_BATCH_SIZE,
+                 n_process: int = ENRICH_N_PROCESS, max_chars: int = ENRICH_MAX_CHARS,
+                 tagger=None, analyzer=None):
+        self.spacy_model = spacy_model
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self.max_chars = max_chars
+        self._tagger = tagger
+        self._analyzer = analyzer
+        self._nlp = None
+
+    def _load(self):
+        # Deferred to first use so the models are loaded in the pool process, once
+        if self._analyzer is None:
+            from textblob.en.sentiments import PatternAnalyzer
+            self._analyzer = PatternAnalyzer()
+        if self.spacy_model:
+            if self._nlp is None:
+                import spacy
+                self._nlp = spacy.load(self.spacy_model, disable=["parser", "ner", "lemmatizer"])
+        elif self._tagger is None:
+            from nltk.tag import PerceptronTagger
+            self._tagger = PerceptronTagger()
+
+    def _tags(self, texts: list[str]) -> list[list[tuple[str, str]]]:
+        if self.spacy_model:
+            docs = self._nlp.pipe(texts, batch_size=self.batch_size, n_process=self.n_process)
+            return [[(token.text, token.tag_) for token in doc if not token.is_punct] for doc in docs]
+        return self._tagger.tag_sents([_WORD.findall(text) for text in texts])
+
+    def enrich_many(self, bodies: list[str]) -> list[tuple[str, dict]]:
+        """(intent, entities) per body, in order: sentiment polarity and {word: tag} for nouns/adjectives."""
+        self._load()
+        texts = [truncate(body or "", self.max_chars) for body in bodies]
+        results = []
+        for text, tags in zip(texts, self._tags(texts)):
+            polarity = self._analyzer.analyze(text)[0]  # -1 to 1
+            results.append((str(polarity), {word: tag for word, tag in tags if keep_tag(tag)}))
+        return results
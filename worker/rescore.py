@@ -0,0 +1,274 @@
+"""
+Re-scores stored leads after a prompt or model change.
+
+Every lead records what produced its score: score_model, score_prompt_version
+and the content_hash of its subject and body. This job walks the leads table
+in id order, RESCORE_CHUNK_SIZE rows at a time, and only scores the leads
+whose provenance differs from the current Scorer (OPENAI_MODEL and
+scorer.PROMPT_VERSION), so running it again after it finished costs only
+the reads.
+
+Scoring goes through the usual TieredScorer (pre-classifier, score cache,
+shared rate limiter) with at most RESCORE_CONCURRENCY LLM calls in flight,
+leaving room for live traffic, on one event loop for the whole run.
+RESCORE_BUDGET_USD caps the OpenAI spend per target (model and prompt
+version) across runs: a chunk is only started if its estimated worst-case
+cost still fits, and is cut short to the leads that fit otherwise; the
+actual spend is taken from the token usage the API reports.
+
+Results are written with the lead's version as a guard. Leads whose score
+and stage come out the same only get their provenance updated. The others
+get a version bump, a lead_updates delta with just the fields that changed
+and a board update. Stages set by hand (anything past QUALIFIED) are kept;
+only their score changes.
+
+Progress is checkpointed after every chunk; an interrupted run resumes after
+the last finished chunk. A finished checkpoint, or one for another target,
+starts from the top again.
+
+    python -m worker.rescore
+    python -m worker.rescore --dry-run            # count stale leads and estimate the cost
+    python -m worker.rescore --budget-usd 5 --concurrency 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from sqlalchemy import bindparam, select, update
+
+from backend.app.board import card_from_lead, lead_board
+from backend.app.events import lead_event, publish_lead_update
+from backend.app.logging_config import configure_logging, get_logger
+from backend.app.metrics import LEADS_RESCORED
+from backend.app.models import Lead
+from backend.app.rate_limit import estimate_tokens
+from backend.app.redis_pool import close_async_redis, pipeline
+from backend.app.score_cache import content_hash
+from backend.scorer import Scorer, TieredScorer
+
+logger = get_logger(__name__)
+
+RESCORE_CHUNK_SIZE = int(os.getenv("RESCORE_CHUNK_SIZE", "200"))
+RESCORE_CONCURRENCY = int(os.getenv("RESCORE_CONCURRENCY", "4"))
+RESCORE_BUDGET_USD = float(os.getenv("RESCORE_BUDGET_USD", "0"))  # 0 = no limit
+RESCORE_CHECKPOINT_FILE = os.getenv("RESCORE_CHECKPOINT_FILE", ".rescore_checkpoint.json")
+# USD per 1000 tokens of the scoring model (defaults: gpt-4o-mini list prices)
+OPENAI_PROMPT_COST_PER_1K = float(os.getenv("OPENAI_PROMPT_COST_PER_1K", "0.00015"))
+OPENAI_COMPLETION_COST_PER_1K = float(os.getenv("OPENAI_COMPLETION_COST_PER_1K", "0.0006"))
+
+# Stages the scorer assigns; any other stage was set by a person and is kept
+SCORED_STAGES = {"NEW", "QUALIFIED"}
+COMPLETION_TOKENS = 60  # estimate_tokens' allowance for the JSON answer
+OUTCOMES = ("current", "unchanged", "changed", "conflict", "failed")
+table = Lead.__table__
+
+
+class RescoreCheckpoint:
+    """Last lead id finished for a target, plus running totals, kept in a small JSON file."""
+
+    def __init__(self, path: str = RESCORE_CHECKPOINT_FILE):
+        self.path = path
+
+    def load(self, target: str) -> tuple[int, dict]:
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return 0, {}
+        if state.get("target") != target:
+            return 0, {}
+        if state.get("finished"):
+            # A new pass picks up conflicts and failures; the spend keeps counting against the budget
+            return 0, {"cost_usd": state["stats"].get("cost_usd", 0.0)}
+        return state["after_id"], state["stats"]
+
+    def save(self, target: str, after_id: int, stats: dict, finished: bool = False):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"target": target, "after_id": after_id, "finished": finished, "stats": stats}, f)
+        os.replace(tmp, self.path)
+
+
+def cost_usd(prompt_tokens: int, completion_tokens: int) -> float:
+    return (prompt_tokens * OPENAI_PROMPT_COST_PER_1K + completion_tokens * OPENAI_COMPLETION_COST_PER_1K) / 1000
+
+
+def estimate_cost(prompt: str, rows: list) -> float:
+    """Upper bound: as if every lead missed the caches and the pre-classifier."""
+    prompt_tokens = sum(estimate_tokens(prompt, row["subject"] or "", row["body"] or "", completion=0) for row in rows)
+    return cost_usd(prompt_tokens, COMPLETION_TOKENS * len(rows))
+
+
+def within_budget(prompt: str, rows: list, budget_usd: float) -> list:
+    """The leading rows whose estimated cost adds up to at most `budget_usd`."""
+    total = 0.0
+    for n, row in enumerate(rows):
+        total += estimate_cost(prompt, [row])
+        if total > budget_usd:
+            return rows[:n]
+    return rows
+
+
+def provenance(scorer: Scorer, row) -> dict:
+    return {
+        "score_model": scorer.model,
+        "score_prompt_version": scorer.prompt_version,
+        "content_hash": content_hash(row["subject"] or "", row["body"] or ""),
+    }
+
+
+def is_current(scorer: Scorer, row) -> bool:
+    return all(row[key] == value for key, value in provenance(scorer, row).items())
+
+
+def write_results(db, redis_client, scorer: Scorer, rows: list, results: list) -> list[str]:
+    """Stores one chunk of new scores and publishes the leads that changed; returns an outcome per row."""
+    outcomes, unchanged, changed = [], [], []
+    for row, result in zip(rows, results):
+        if isinstance(result, BaseException):
+            # Provenance stays stale, so the next pass tries again
+            logger.warning("Lead rescore failed", lead_id=row["id"], error=str(result))
+            outcomes.append("failed")
+            continue
+        score, stage = result
+        if row["stage"] not in SCORED_STAGES:
+            stage = row["stage"]
+        values = provenance(scorer, row)
+        if score == row["score"] and stage == row["stage"]:
+            unchanged.append({"lead_id": row["id"], **values})
+            outcomes.append("unchanged")
+            continue
+        version = row["version"] + 1
+        # Core UPDATE guarded like the ORM's version_id_col: a concurrent change wins and is retried next pass
+        updated = db.execute(
+            update(table).where(table.c.id == row["id"], table.c.version == row["version"])
+            .values(score=score, stage=stage, version=version, **values)
+        ).rowcount
+        if not updated:
+            outcomes.append("conflict")
+            continue
+        fields = {key: value for key, value in (("score", score), ("stage", stage)) if value != row[key]}
+        card = card_from_lead({**row, **values, "score": score, "stage": stage, "version": version})
+        changed.append((lead_event(row["id"], version, **fields), card, row["stage"]))
+        outcomes.append("changed")
+    if unchanged:
+        # Same answer under the new prompt: no version bump, nothing for clients to apply
+        db.execute(update(table).where(table.c.id == bindparam("lead_id")), unchanged)
+    db.commit()
+    if changed:
+        with pipeline(redis_client) as pipe:
+            for event, card, old_stage in changed:
+                publish_lead_update(pipe, event)
+                lead_board.write(pipe, card, old_stage=old_stage)
+    return outcomes
+
+
+def rescore(checkpoint: RescoreCheckpoint | None = None, chunk_size: int = RESCORE_CHUNK_SIZE,
+            concurrency: int = RESCORE_CONCURRENCY, budget_usd: float = RESCORE_BUDGET_USD,
+            limit: int | None = None, dry_run: bool = False, scorer: TieredScorer | None = None,
+            session_factory=None, redis_client=None) -> dict:
+    """Re-scores stale leads from the checkpoint on; returns counts per outcome plus spend and throughput."""
+    owns_scorer = scorer is None
+    if owns_scorer:
+        scorer = TieredScorer(Scorer(max_concurrency=concurrency, fallback_on_error=False))
+    if session_factory is None:
+        from backend.app.database import SessionLocal as session_factory
+    llm = scorer.scorer
+    target = f"{llm.model}:{llm.prompt_version}"
+    checkpoint = checkpoint or RescoreCheckpoint()
+    after_id, saved = (0, {}) if dry_run else checkpoint.load(target)
+    stats = {"read": 0, **dict.fromkeys(OUTCOMES, 0), "cost_usd": 0.0, **saved}
+    if dry_run:
+        stats.update(stale=0, estimated_cost_usd=0.0)
+
+    status, read = "finished", 0
+    # One loop for every chunk, so the LLM client and the Redis pools behind the caches are reused
+    loop = asyncio.new_event_loop()
+    started = time.perf_counter()
+    try:
+        while limit is None or read < limit:
+            with session_factory() as db:
+                rows = db.execute(
+                    select(table).where(table.c.id > after_id).order_by(table.c.id)
+                    .limit(chunk_size if limit is None else min(chunk_size, limit - read))
+                ).mappings().all()
+            if not rows:
+                break
+            stale = [row for row in rows if not is_current(llm, row)]
+            if dry_run:
+                stats["stale"] += len(stale)
+                stats["estimated_cost_usd"] += estimate_cost(llm.prompt, stale)
+            elif stale:
+                if budget_usd:
+                    affordable = within_budget(llm.prompt, stale, budget_usd - stats["cost_usd"])
+                    if not affordable:
+                        status = "budget_exhausted"
+                        break
+                    if len(affordable) < len(stale):
+                        # Score what still fits, then stop
+                        status = "budget_exhausted"
+                        stale = affordable
+                        rows = [row for row in rows if row["id"] <= stale[-1]["id"]]
+                used = dict(llm.usage)
+                emails = [{"sender": row["sender"] or "", "subject": row["subject"] or "", "body": row["body"] or ""}
+                          for row in stale]
+                # No connection is held while the LLM answers; the version guard covers changes made meanwhile
+                results = loop.run_until_complete(scorer.score_many(emails, return_exceptions=True))
+                stats["cost_usd"] += cost_usd(llm.usage["prompt_tokens"] - used["prompt_tokens"],
+                                              llm.usage["completion_tokens"] - used["completion_tokens"])
+                with session_factory() as db:
+                    outcomes = write_results(db, redis_client, llm, stale, results)
+                for outcome in outcomes:
+                    stats[outcome] += 1
+                    LEADS_RESCORED.labels(outcome=outcome).inc()
+            if not dry_run:
+                LEADS_RESCORED.labels(outcome="current").inc(len(rows) - len(stale))
+            stats["current"] += len(rows) - len(stale)
+            stats["read"] += len(rows)
+            read += len(rows)
+            after_id = rows[-1]["id"]
+            if not dry_run:
+                checkpoint.save(target, after_id, stats)
+            logger.info("Rescore chunk done", target=target, after_id=after_id, read=stats["read"],
+                        rescored=len(stale), cost_usd=round(stats["cost_usd"], 4))
+            if status == "budget_exhausted":
+                break
+        else:
+            status = "stopped"  # --limit reached; the next run continues from the checkpoint
+    finally:
+        if owns_scorer:
+            loop.run_until_complete(llm.aclose())  # also saves the semantic cache
+        loop.run_until_complete(close_async_redis())
+        loop.close()
+
+    if status == "finished" and not dry_run:
+        checkpoint.save(target, after_id, stats, finished=True)
+    elapsed = time.perf_counter() - started
+    return {**stats, "target": target, "status": status, "after_id": after_id, "elapsed_s": round(elapsed, 3),
+            "per_second": round(read / elapsed, 1) if elapsed else 0.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunk-size", type=int, default=RESCORE_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=RESCORE_CONCURRENCY, help="LLM calls in flight")
+    parser.add_argument("--budget-usd", type=float, default=RESCORE_BUDGET_USD, help="0 for no limit")
+    parser.add_argument("--checkpoint", default=RESCORE_CHECKPOINT_FILE)
+    parser.add_argument("--limit", type=int, help="stop after reading this many leads")
+    parser.add_argument("--dry-run", action="store_true", help="only count stale leads and estimate the cost")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the top")
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+    result = rescore(RescoreCheckpoint(args.checkpoint), args.chunk_size, args.concurrency, args.budget_usd,
+                     args.limit, args.dry_run)
+    print(json.dumps({"event": "Rescore finished", **result}))
+
+
+if __name__ == "__main__":
+    main()
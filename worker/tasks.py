@@ -1,73 +1,145 @@
-import redis
+import os
+import threading
 import time
 import uuid
+from datetime import datetime, timezone
+from typing import Callable
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
-from backend.app.database import SessionLocal, engine, Base
-from backend.app import scorer, models
-from backend.app.schemas import LeadOut
-from backend.app.observability import configure_opentelemetry
+from backend.app.database import SessionLocal, engine
+from backend.app import models
+from backend import scorer
+from backend.app.observability import configure_opentelemetry, stage_timer
 from backend.app.metrics import EMAIL_PROCESSING_TOTAL, EMAIL_PROCESSING_LATENCY, LEAD_THROUGHPUT
-from backend.app.logging_config import configure_logging, get_logger
+from backend.app.logging_config import configure_logging, get_logger, shutdown_logging
+from backend.app.dedup import DedupIndex, is_duplicate
+from backend.app.prompt_history import prompt_history_sink
+from backend.app.events import card_event, lead_event, publish_lead_update
+from backend.app.board import CARD_EXCLUDED, card_from_lead, lead_board
+from backend.app.score_cache import content_hash
+from backend.app import partitions
+from backend.app.redis_pool import REDIS_URL, close_async_redis, get_redis, pipeline
+from worker.enrichment import Enricher
 import structlog
-from fuzzywuzzy import fuzz
 import asyncio
-from textblob import TextBlob
 
 configure_logging()
 logger = get_logger(__name__)
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
-
-app = Celery("inbound", broker="redis://redis:6379/0", backend="redis://redis:6379/0")
+CELERY_BROKER = os.getenv("CELERY_BROKER_URL", REDIS_URL)
+app = Celery("inbound", broker=CELERY_BROKER, backend=os.getenv("CELERY_RESULT_BACKEND", CELERY_BROKER))
 app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
 )
 
-# Configure OpenTelemetry for Celery worker
-configure_opentelemetry(app_name="worker", celery_app=app, db_engine=engine)
+redis_client = get_redis()
+dedup_index = DedupIndex(redis_client)
+ai_scorer = scorer.TieredScorer(scorer.Scorer())
+enricher = Enricher()
+EMAIL_FIELDS = ("email_id", "sender", "subject", "body")
+
+_event_loop = threading.local()
+# A loop inherited through fork shares its selector with the parent's
+os.register_at_fork(after_in_child=_event_loop.__dict__.clear)
+
+def run_async(coro):
+    """
+    Runs `coro` on this thread's event loop, which is kept for the life of the
+    process, so the LLM client and the asyncio Redis pools bound to it are
+    reused by every task instead of being rebuilt by an asyncio.run per task.
+    """
+    loop = getattr(_event_loop, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = _event_loop.loop = asyncio.new_event_loop()
+    return loop.run_until_complete(coro)
+
+async def _close_clients():
+    await ai_scorer.scorer.aclose()  # also saves the semantic cache
+    await close_async_redis()
+
+def close_event_loop():
+    """Closes the LLM client and the asyncio Redis pools, then the loop they live on."""
+    run_async(_close_clients())
+    _event_loop.loop.close()
+
+def score_provenance(email: dict, result: tuple[float, str]) -> dict:
+    """
+    Lead columns recording what scored `email`, compared by worker.rescore
+    after a prompt or model change. A fallback score was not decided by the
+    model, so it gets no provenance and the next rescore pass picks it up.
+    """
+    if scorer.is_fallback(result):
+        return {"score_model": None, "score_prompt_version": None, "content_hash": None}
+    return {
+        "score_model": ai_scorer.scorer.model,
+        "score_prompt_version": ai_scorer.scorer.prompt_version,
+        "content_hash": content_hash(email["subject"], email["body"]),
+    }
+
+def received_at(email: dict) -> datetime:
+    """When `email` was received, as naive UTC like created_at: its "received_at" (set by worker.backfill) or now."""
+    value = email.get("received_at")
+    if value:
+        try:
+            received = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            logger.warning("Invalid received_at, using the current time", email_id=email.get("email_id"), value=value)
+        else:
+            if received.tzinfo is not None:
+                received = received.astimezone(timezone.utc).replace(tzinfo=None)
+            return received
+    return datetime.utcnow()
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    # Per pool process: the span exporter's thread would not survive the fork.
+    # Processes that classify outside Celery (worker.consumer) call this themselves.
+    configure_opentelemetry(app_name="worker", celery_app=app, db_engine=engine)
+
+@worker_process_shutdown.connect
+def flush_prompt_history(**kwargs):
+    # Pool processes exit without running atexit hooks
+    prompt_history_sink.close()
 
-redis_client = redis.Redis(host="redis", port=6379, db=0)
-LEAD_UPDATES_CHANNEL = "lead_updates"
+@worker_process_shutdown.connect
+def close_scorer(**kwargs):
+    close_event_loop()
+
+@worker_process_shutdown.connect
+def flush_logs(**kwargs):
+    # Last, so log lines from the hooks above are written too
+    shutdown_logging()
 
 @app.task(bind=True, autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={'max_retries': 3})
 def classify_email(self, email):
     start_time = time.time()
     status = "failed"
     correlation_id = str(uuid.uuid4()) # Generate a new correlation ID for the task
-    with structlog.contextvars.bind_contextvars(correlation_id=correlation_id):
+    with structlog.contextvars.bound_contextvars(correlation_id=correlation_id):
         logger.info("Email classification started", email_id=email["email_id"])
         try:
             """
             email = dict(email_id, sender, subject, body)
             """
-            db: Session = SessionLocal()
-            # Deduplication check with fuzzy matching
-            existing_leads = db.query(models.Lead).all()
-            is_duplicate = False
-            for existing_lead in existing_leads:
-                sender_match = fuzz.ratio(email["sender"].lower(), existing_lead.sender.lower())
-                subject_match = fuzz.ratio(email["subject"].lower(), existing_lead.subject.lower())
-                if sender_match > 80 and subject_match > 70: # Thresholds for fuzzy matching
-                    is_duplicate = True
-                    break
-
-            if is_duplicate:
-                db.close()
+            # Deduplication check with fuzzy matching, restricted to indexed candidates
+            with stage_timer("dedup"):
+                duplicate_id = dedup_index.find_duplicate(email["sender"], email["subject"])
+            if duplicate_id is not None:
                 EMAIL_PROCESSING_TOTAL.labels(status='deduplicated').inc()
                 logger.info("Email deduplicated (fuzzy match)", email_id=email["email_id"])
-                return {"lead_id": existing_lead.id, "status": "deduplicated"}
+                return {"lead_id": duplicate_id, "status": "deduplicated"}
 
-            score, stage = asyncio.run(scorer.score_email(email["subject"], email["body"])) # Call async function
-            
-            # Sentiment Analysis and Entity Extraction
-            blob = TextBlob(email["body"])
-            sentiment = blob.sentiment.polarity # -1 to 1
-            entities = {str(word): str(tag) for word, tag in blob.tags if tag.startswith('NN') or tag.startswith('JJ')}
+            db: Session = SessionLocal()
 
+            with stage_timer("score"):
+                result = run_async(ai_scorer.score_email(subject=email["subject"], body=email["body"], sender=email["sender"])) # Call async function
+                score, stage = result
+
+            # intent and entities are filled in afterwards by enrich_leads
             lead = models.Lead(
                 email_id=email["email_id"],
                 sender=email["sender"],
@@ -75,17 +147,23 @@ def classify_email(self, email):
                 body=email["body"],
                 score=score,
                 stage=stage,
-                intent=str(sentiment),
-                entities=entities
+                created_at=received_at(email),
+                **score_provenance(email, result)
             )
-            db.add(lead)
-            db.commit()
-            db.refresh(lead)
-            
-            # Publish update to Redis Pub/Sub
-            lead_data = LeadOut.from_orm(lead).json()
-            redis_client.publish(LEAD_UPDATES_CHANNEL, lead_data)
-            
+            with stage_timer("db_insert"):
+                db.add(lead)
+                db.commit()
+                db.refresh(lead)
+
+            # Index for dedup, publish to the lead_updates stream and update the board in one round-trip
+            with stage_timer("publish"):
+                card = card_from_lead(lead)
+                with pipeline(redis_client) as pipe:
+                    dedup_index.add(lead.id, lead.sender, lead.subject, pipe=pipe)
+                    publish_lead_update(pipe, card_event(card))
+                    lead_board.write(pipe, card)
+                enrich_leads.delay([lead.id])
+
             db.close()
             status = "success"
             LEAD_THROUGHPUT.labels(stage=stage).inc()
@@ -98,3 +176,205 @@ def classify_email(self, email):
             EMAIL_PROCESSING_TOTAL.labels(status=status).inc()
             EMAIL_PROCESSING_LATENCY.labels(status=status).observe(time.time() - start_time)
 
+@app.task(queue="enrichment", autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={'max_retries': 3})
+def enrich_leads(lead_ids):
+    """
+    Adds sentiment and entities to already published leads and publishes just
+    those fields. Runs on the "enrichment" queue so NLP never delays scoring.
+    """
+    db: Session = SessionLocal()
+    try:
+        leads = db.scalars(select(models.Lead).where(models.Lead.id.in_(lead_ids))).all()
+        with stage_timer("enrich", leads=len(leads)):
+            enriched = enricher.enrich_many([lead.body for lead in leads])
+        for lead, (intent, entities) in zip(leads, enriched):
+            lead.intent = intent
+            lead.entities = entities
+        with stage_timer("db_update", leads=len(leads)):
+            # The flush bumps each version; read them before commit expires the rows
+            db.flush()
+            events = [lead_event(lead.id, lead.version, intent=lead.intent, entities=lead.entities) for lead in leads]
+            cards = [card_from_lead(lead) for lead in leads]
+            db.commit()
+    finally:
+        db.close()
+    with stage_timer("publish", leads=len(events)), pipeline(redis_client) as pipe:
+        for event, card in zip(events, cards):
+            publish_lead_update(pipe, event)
+            lead_board.write(pipe, card)
+    logger.info("Leads enriched", leads=len(events))
+    return {"enriched": len(events)}
+
+@app.task
+def rebuild_dedup_index():
+    """Indexes every stored lead; run once after deploy or if Redis was flushed."""
+    db: Session = SessionLocal()
+    try:
+        rows = db.query(models.Lead.id, models.Lead.sender, models.Lead.subject).yield_per(1000)
+        count = dedup_index.rebuild(rows)
+    finally:
+        db.close()
+    logger.info("Dedup index rebuilt", leads=count)
+    return {"indexed": count}
+
+@app.task
+def rebuild_lead_board():
+    """Loads every lead into the Redis board; the API reads Postgres until this has run once."""
+    db: Session = SessionLocal()
+    try:
+        columns = [c for c in models.Lead.__table__.columns if c.key not in CARD_EXCLUDED]
+        rows = db.execute(select(*columns).execution_options(yield_per=1000)).mappings()
+        count = lead_board.rebuild(redis_client, (card_from_lead(dict(row)) for row in rows))
+    finally:
+        db.close()
+    logger.info("Lead board rebuilt", leads=count)
+    return {"loaded": count}
+
+@app.task
+def rescore_leads(budget_usd=None):
+    """Re-scores leads made stale by a prompt or model change; see worker.rescore. Resumes its checkpoint."""
+    from worker.rescore import RESCORE_BUDGET_USD, rescore
+    return rescore(budget_usd=RESCORE_BUDGET_USD if budget_usd is None else budget_usd, redis_client=redis_client)
+
+@app.task
+def maintain_prompt_history():
+    """Creates upcoming prompt_history partitions and drops expired ones; schedule it daily."""
+    return partitions.maintain(engine)
+
+def insert_leads(db: Session, rows: list[dict]) -> list[int | None]:
+    """
+    Bulk INSERT ... RETURNING id for a batch of lead rows. If the batch is
+    rejected, rows are retried one by one so a single bad row only fails itself.
+    """
+    if not rows:
+        return []
+    stmt = insert(models.Lead).returning(models.Lead.id, sort_by_parameter_order=True)
+    try:
+        ids = db.scalars(stmt, rows).all()
+        db.commit()
+        return list(ids)
+    except Exception:
+        db.rollback()
+        logger.warning("Bulk lead insert failed, inserting row by row", rows=len(rows), exc_info=True)
+    ids = []
+    for row in rows:
+        try:
+            ids.append(db.scalar(insert(models.Lead).returning(models.Lead.id), row))
+            db.commit()
+        except Exception:
+            db.rollback()
+            logger.error("Lead insert failed", email_id=row["email_id"], exc_info=True)
+            ids.append(None)
+    return ids
+
+def classify_batch(emails: list[dict], retry: Callable[[int], None] | None = None) -> list[dict]:
+    """
+    Classifies a micro-batch of e-mails: one pipelined dedup lookup (plus a
+    check for duplicates inside the batch), concurrent scoring, one bulk
+    insert and one pipelined Redis round-trip for index updates and publishes.
+
+    Returns one result per e-mail, in order. E-mails that fail on their own
+    are passed by index to `retry` instead of failing the batch; the consumer
+    puts them back on their lane. Without it they are handed to
+    classify_email individually, with its retry policy.
+    """
+    start_time = time.time()
+    results: list[dict | None] = [None] * len(emails)
+    valid = []
+    for i, email in enumerate(emails):
+        if isinstance(email, dict) and all(field in email for field in EMAIL_FIELDS):
+            valid.append(i)
+        else:
+            logger.error("Invalid email payload", payload=str(email)[:200])
+            results[i] = {"lead_id": None, "status": "invalid"}
+
+    with stage_timer("dedup", emails=len(valid)):
+        known = dedup_index.find_duplicates([(emails[i]["sender"], emails[i]["subject"]) for i in valid])
+    fresh, duplicate_of = [], {}
+    for i, lead_id in zip(valid, known):
+        if lead_id is not None:
+            results[i] = {"lead_id": lead_id, "status": "deduplicated"}
+            continue
+        earlier = next((j for j in fresh if is_duplicate(
+            emails[i]["sender"], emails[i]["subject"], emails[j]["sender"], emails[j]["subject"])), None)
+        if earlier is None:
+            fresh.append(i)
+        else:
+            duplicate_of[i] = earlier
+
+    with stage_timer("score", emails=len(fresh)):
+        scores = run_async(ai_scorer.score_many([emails[i] for i in fresh], return_exceptions=True)) if fresh else []
+    rows, row_owners, failed = [], [], []
+    for i, scored in zip(fresh, scores):
+        email = emails[i]
+        try:
+            if isinstance(scored, BaseException):
+                raise scored
+            score, stage = scored
+        except Exception:
+            logger.error("Email classification failed", email_id=email["email_id"], exc_info=True)
+            failed.append(i)
+            continue
+        rows.append({
+            "email_id": email["email_id"],
+            "sender": email["sender"],
+            "subject": email["subject"],
+            "body": email["body"],
+            "score": score,
+            "stage": stage,
+            "source": "EMAIL",
+            "created_at": received_at(email),
+            "version": 1,
+            **score_provenance(email, scored),
+        })
+        row_owners.append(i)
+
+    db: Session = SessionLocal()
+    try:
+        with stage_timer("db_insert", emails=len(rows)):
+            lead_ids = insert_leads(db, rows)
+    finally:
+        db.close()
+
+    with stage_timer("publish", emails=len(rows)), pipeline(redis_client) as pipe:
+        for i, row, lead_id in zip(row_owners, rows, lead_ids):
+            if lead_id is None:
+                failed.append(i)
+                continue
+            dedup_index.add(lead_id, row["sender"], row["subject"], pipe=pipe)
+            card = card_from_lead({"id": lead_id, **row})
+            publish_lead_update(pipe, card_event(card))
+            lead_board.write(pipe, card)
+            results[i] = {"lead_id": lead_id, "status": "processed"}
+            LEAD_THROUGHPUT.labels(stage=row["stage"]).inc()
+    enriched_ids = [r["lead_id"] for r in results if r is not None and r["status"] == "processed"]
+    if enriched_ids:
+        enrich_leads.delay(enriched_ids)
+
+    for i, earlier in duplicate_of.items():
+        if results[earlier] is not None and results[earlier]["status"] == "processed":
+            results[i] = {"lead_id": results[earlier]["lead_id"], "status": "deduplicated"}
+        else:
+            failed.append(i)  # Retried once the original is settled
+
+    for i in failed:
+        if retry is None:
+            classify_email.delay(emails[i])
+        else:
+            retry(i)
+        results[i] = {"lead_id": None, "status": "requeued"}
+
+    elapsed = time.time() - start_time
+    for result in results:
+        status = {"processed": "success", "requeued": "failed"}.get(result["status"], result["status"])
+        EMAIL_PROCESSING_TOTAL.labels(status=status).inc()
+        EMAIL_PROCESSING_LATENCY.labels(status=status).observe(elapsed)
+    logger.info("Email batch classified", size=len(emails),
+                processed=sum(r["status"] == "processed" for r in results), requeued=len(failed))
+    return results
+
+@app.task(bind=True)
+def classify_emails_batch(self, emails):
+    correlation_id = str(uuid.uuid4())
+    with structlog.contextvars.bound_contextvars(correlation_id=correlation_id):
+        return classify_batch(emails)
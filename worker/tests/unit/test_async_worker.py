@@ -0,0 +1,117 @@
+import asyncio
+
+import fakeredis
+import pytest
+from kombu import Connection
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from backend.app.database import Base
+from backend.app.metrics import EMAIL_PROCESSING_TOTAL
+from backend.app.models import Lead
+from worker import async_worker
+from worker.async_worker import AsyncClassifier
+from worker.consumer import exchange, queues
+
+
+class FlakyScorer:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.calls = 0
+
+    async def score_email(self, subject, body, sender=""):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("LLM unavailable")
+        await asyncio.sleep(0.01)
+        return 0.9, "QUALIFIED"
+
+
+def email(n: int, subject: str | None = None) -> dict:
+    # Senders far enough apart that only the deliberate duplicate matches
+    return {"email_id": f"e{n}", "sender": f"{'abcdefghij'[n] * 6}@acme{n}.com",
+            "subject": subject or f"Quote request {n}", "body": "Send me a quote"}
+
+
+@pytest.fixture
+def make_classifier(monkeypatch, tmp_path):
+    monkeypatch.setattr(async_worker, "get_exponential_backoff_interval", lambda **kwargs: 0)
+    enriched = []
+
+    async def factory(scorer):
+        # A file, so concurrent e-mails get their own connections
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'leads.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        classifier = AsyncClassifier(scorer=scorer, redis_client=fakeredis.FakeAsyncRedis(),
+                                     session_factory=async_sessionmaker(engine, expire_on_commit=False),
+                                     enqueue_enrichment=enriched.extend)
+        return classifier, enriched
+    return factory
+
+
+def test_handle_retries_then_stores_publishes_and_dedups(make_classifier):
+    async def scenario():
+        classifier, enriched = await make_classifier(FlakyScorer(failures=2))
+        failed = EMAIL_PROCESSING_TOTAL.labels(status="failed")
+        before = failed._value.get()
+        first = await classifier.handle(email(1))
+        duplicate = await classifier.handle({**email(1), "email_id": "e1-again", "subject": "RE: Quote request 1"})
+        invalid = await classifier.handle({"email_id": "broken"})
+        async with classifier.session_factory() as db:
+            leads = (await db.scalars(select(Lead))).all()
+        events = await classifier.redis.xlen("lead_updates")
+        return first, duplicate, invalid, leads, events, enriched, failed._value.get() - before, classifier.scorer
+
+    first, duplicate, invalid, leads, events, enriched, failures, scorer = asyncio.run(scenario())
+    assert first == {"lead_id": 1, "status": "processed"}
+    assert duplicate == {"lead_id": 1, "status": "deduplicated"}
+    assert invalid["status"] == "invalid"
+    assert (scorer.calls, failures) == (3, 2)
+    assert [(lead.email_id, lead.stage, lead.score_model) for lead in leads] == [("e1", "QUALIFIED", "gpt-4o-mini")]
+    assert (events, enriched) == (1, [1])
+
+
+def test_handle_gives_up_after_max_retries(make_classifier):
+    async def scenario():
+        classifier, _ = await make_classifier(FlakyScorer(failures=10))
+        return await classifier.handle(email(2)), classifier.scorer.calls
+
+    assert asyncio.run(scenario()) == ({"lead_id": None, "status": "failed"}, async_worker.ASYNC_WORKER_MAX_RETRIES + 1)
+
+
+def test_run_classifies_concurrently_and_acks_every_message(make_classifier):
+    url = "memory://async-worker-test"
+    with Connection(url) as conn:
+        producer = conn.Producer(serializer="json")
+        for n in range(1, 9):
+            producer.publish(email(n), exchange=exchange, routing_key="raw.high", declare=queues)
+
+    async def scenario():
+        scorer = FlakyScorer()
+        classifier, _ = await make_classifier(scorer)
+        in_flight = peak = 0
+        handle = classifier.handle
+        stop = asyncio.Event()
+        results = []
+
+        async def tracked(body):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            try:
+                results.append(await handle(body))
+            finally:
+                in_flight -= 1
+            if len(results) == 8:
+                stop.set()
+
+        classifier.handle = tracked
+        await asyncio.wait_for(async_worker.run(stop, concurrency=4, classifier=classifier, url=url), timeout=10)
+        return results, peak
+
+    results, peak = asyncio.run(scenario())
+    assert sorted(r["lead_id"] for r in results) == list(range(1, 9))
+    assert 1 < peak <= 4
+    with Connection(url) as conn:
+        assert queues[0].bind(conn.default_channel).queue_declare(passive=True).message_count == 0
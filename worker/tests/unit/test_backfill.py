@@ -0,0 +1,95 @@
+import json
+from email.message import EmailMessage
+
+from worker import backfill
+
+
+def message(n: int, body: str = "Can we get a quote?") -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = f"lead{n}@acme.com"
+    msg["Subject"] = f"Question {n}"
+    msg["Message-ID"] = f"<msg-{n}@acme.com>"
+    msg.set_content(body)
+    return msg
+
+
+def write_mbox(path, messages):
+    with open(path, "wb") as f:
+        for msg in messages:
+            f.write(b"From MAILER-DAEMON Thu Jan  1 00:00:00 2025\n")
+            f.write(msg.as_bytes().replace(b"\nFrom ", b"\n>From "))
+            f.write(b"\n")
+
+
+class FakePipeline:
+    def __init__(self, fail_after=None):
+        self.batches = []
+        self.fail_after = fail_after
+
+    def __call__(self, emails):
+        if self.fail_after is not None and len(self.batches) == self.fail_after:
+            raise RuntimeError("worker crashed")
+        self.batches.append([e["email_id"] for e in emails])
+        return [{"lead_id": i, "status": "processed"} for i, _ in enumerate(emails)]
+
+
+def test_readers_parse_every_format(tmp_path):
+    messages = [message(1), message(2, "Hi\nFrom the sales team\n")]
+    write_mbox(tmp_path / "inbox.mbox", messages)
+    (tmp_path / "eml").mkdir()
+    for msg in messages:
+        (tmp_path / "eml" / f"{msg['Message-ID'][1:6]}.eml").write_bytes(msg.as_bytes())
+    (tmp_path / "inbox.jsonl").write_text("\n".join(json.dumps(
+        {"email_id": f"msg-{n}@acme.com", "sender": f"lead{n}@acme.com", "subject": f"Question {n}", "body": "x",
+         "label": "hot"}) for n in (1, 2)) + "\n\n")
+
+    mbox = list(backfill.read_mbox(str(tmp_path / "inbox.mbox")))
+    assert [e["email_id"] for e in mbox] == ["msg-1@acme.com", "msg-2@acme.com"]
+    assert mbox[1]["body"] == "Hi\nFrom the sales team"
+    assert list(backfill.read_eml_dir(str(tmp_path / "eml"))) == mbox
+    jsonl = list(backfill.read_jsonl(str(tmp_path / "inbox.jsonl")))
+    assert [sorted(e) for e in jsonl] == [sorted(backfill.EMAIL_FIELDS)] * 2
+
+    assert [e["email_id"] for e in backfill.read_mbox(str(tmp_path / "inbox.mbox"), start=1)] == ["msg-2@acme.com"]
+    assert [e["email_id"] for e in backfill.read_jsonl(str(tmp_path / "inbox.jsonl"), start=1)] == ["msg-2@acme.com"]
+
+
+def test_message_date_is_kept_as_received_at(tmp_path):
+    msg = message(1)
+    msg["Date"] = "Fri, 01 Mar 2024 09:30:00 -0300"
+    assert backfill.email_from_message(msg.as_bytes())["received_at"] == "2024-03-01T12:30:00+00:00"
+    assert "received_at" not in backfill.email_from_message(message(2).as_bytes())
+
+    (tmp_path / "inbox.jsonl").write_text(json.dumps(
+        {"email_id": "e1", "sender": "a@acme.com", "subject": "Hi", "body": "x", "received_at": "2024-03-01T12:30:00Z"}))
+    [email] = backfill.read_jsonl(str(tmp_path / "inbox.jsonl"))
+    assert email["received_at"] == "2024-03-01T12:30:00Z"
+
+
+def test_messages_without_id_get_a_stable_one():
+    msg = message(1)
+    del msg["Message-ID"]
+    first = backfill.email_from_message(msg.as_bytes())
+    assert first["email_id"].startswith("backfill-")
+    assert backfill.email_from_message(msg.as_bytes()) == first
+
+
+def test_interrupted_run_resumes_from_checkpoint(tmp_path):
+    source = tmp_path / "inbox.mbox"
+    write_mbox(source, [message(n) for n in range(7)])
+    checkpoint = backfill.BackfillCheckpoint(str(tmp_path / "checkpoint.json"))
+
+    crashing = FakePipeline(fail_after=2)
+    try:
+        backfill.backfill(str(source), checkpoint=checkpoint, batch_size=2, classify=crashing,
+                          known_ids=lambda ids: set())
+    except RuntimeError:
+        pass
+    assert checkpoint.load(str(source)) == 4
+
+    pipeline = FakePipeline()
+    result = backfill.backfill(str(source), checkpoint=checkpoint, batch_size=2, classify=pipeline,
+                               known_ids=lambda ids: {"msg-5@acme.com"})
+    assert pipeline.batches == [["msg-4@acme.com"], ["msg-6@acme.com"]]
+    assert (result["read"], result["skipped"], result["processed"], result["position"]) == (3, 1, 2, 7)
+    assert checkpoint.load(str(tmp_path / "other.mbox")) == 0
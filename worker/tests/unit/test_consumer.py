@@ -0,0 +1,32 @@
+from kombu import Connection
+
+from worker.consumer import dead_letter_queue, exchange, queues, redeliver
+
+
+def drain(conn, queue):
+    received = []
+    with conn.Consumer([queue], callbacks=[lambda body, message: received.append(message)], accept=["json"]):
+        while True:
+            try:
+                conn.drain_events(timeout=0.1)
+            except TimeoutError:
+                return received
+
+
+def test_redeliver_returns_to_the_lane_then_dead_letters():
+    email = {"email_id": "e1", "sender": "jane@acme.com", "subject": "Quote", "body": "Price?"}
+    low = queues[2]
+    with Connection("memory://consumer-test") as conn:
+        producer = conn.Producer(serializer="json")
+        producer.publish(email, exchange=exchange, routing_key=low.routing_key, declare=[low])
+
+        counts = []
+        while (messages := drain(conn, low)):
+            [message] = messages
+            counts.append(message.headers.get("delivery_count"))
+            redeliver(producer, message.payload, message, max_deliveries=3)
+            message.ack()
+
+        [dead] = drain(conn, dead_letter_queue)
+    assert counts == [None, 2, 3]
+    assert dead.payload == email and dead.headers["delivery_count"] == 3
@@ -0,0 +1,53 @@
+import fakeredis
+
+from backend.app.dedup import DedupIndex, band_keys, is_duplicate, normalize_sender, normalize_subject, sender_blocks
+
+
+def test_normalize_sender_strips_display_name_and_case():
+    assert normalize_sender("Jane Doe <Jane.Doe@Example.com>") == "jane.doe@example.com"
+    assert normalize_sender("  JANE@example.com ") == "jane@example.com"
+
+
+def test_normalize_subject_drops_reply_prefixes():
+    assert normalize_subject("RE: Fwd:  Pricing   question") == "pricing question"
+
+
+def test_band_keys_are_stable_and_shared_by_near_duplicates():
+    keys = band_keys("Pricing question for Acme")
+    assert keys == band_keys("Pricing question for Acme")
+    assert set(keys) & set(band_keys("Re: pricing question for ACME"))
+    assert not set(keys) & set(band_keys("Invoice overdue"))
+
+
+def test_sender_blocks_are_shared_across_a_typo_on_either_side():
+    blocks = set(sender_blocks("jane.doe@acme.com"))
+    assert blocks & set(sender_blocks("jane.doe@acme.co"))
+    assert blocks & set(sender_blocks("jane.dow@acme.com"))
+    assert blocks & set(sender_blocks("hane.doe@acme.com"))
+    assert not blocks & set(sender_blocks("bob@acme.com"))
+
+
+def test_is_duplicate_keeps_original_thresholds():
+    assert is_duplicate("jane@acme.com", "Pricing question", "JANE@acme.com", "Re: Pricing question")
+    assert not is_duplicate("jane@acme.com", "Pricing question", "bob@other.org", "Pricing question")
+    assert not is_duplicate("jane@acme.com", "Pricing question", "jane@acme.com", "Invoice overdue")
+
+
+def test_index_finds_fuzzy_sender_with_short_subject():
+    index = DedupIndex(fakeredis.FakeRedis())
+    index.add(1, "ann@a.com", "Hi")
+    index.add(2, "bob@a.com", "Hi")
+
+    # Neither the address nor the subject trigrams match the stored lead exactly
+    assert is_duplicate("ann@a.co", "Hi!", "ann@a.com", "Hi")
+    assert index.find_duplicates([("ann@a.co", "Hi!"), ("carol@b.org", "Hi!")]) == [1, None]
+
+
+def test_sender_blocks_keep_only_the_newest_leads(monkeypatch):
+    monkeypatch.setattr("backend.app.dedup.SENDER_BLOCK_SIZE", 3)
+    index = DedupIndex(fakeredis.FakeRedis())
+    for lead_id in range(1, 6):
+        index.add(lead_id, "jane@acme.com", f"Order {lead_id * 1000}")
+
+    assert index.redis.zrange("dedup:sender:a:jane@acme.com", 0, -1) == [b"3", b"4", b"5"]
+    assert index.candidates("jane@acme.com", "Invoice overdue") == [3, 4, 5]
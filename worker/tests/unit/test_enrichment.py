@@ -0,0 +1,31 @@
+from worker.enrichment import Enricher, truncate
+
+
+class FakeTagger:
+    def __init__(self):
+        self.batches = []
+
+    def tag_sents(self, sentences):
+        self.batches.append(sentences)
+        return [[(w, "NN" if w[0].isupper() else "VB") for w in words] for words in sentences]
+
+
+class FakeAnalyzer:
+    def analyze(self, text):
+        return (0.5 if "great" in text else 0.0, 0.0)
+
+
+def test_truncate_cuts_at_word_boundary():
+    assert truncate("short body", 100) == "short body"
+    assert truncate("alpha beta gamma delta", 13) == "alpha beta"
+    assert len(truncate("x" * 50, 10)) == 10
+
+
+def test_enrich_many_tags_the_whole_batch_at_once():
+    tagger = FakeTagger()
+    enricher = Enricher(tagger=tagger, analyzer=FakeAnalyzer(), max_chars=30)
+    results = enricher.enrich_many(["a great Product for Sales", None, "word " * 100])
+    assert results[0] == ("0.5", {"Product": "NN", "Sales": "NN"})
+    assert results[1] == ("0.0", {})
+    assert len(tagger.batches) == 1
+    assert len(tagger.batches[0][2]) == 6  # Truncated before tagging
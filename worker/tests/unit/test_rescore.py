@@ -0,0 +1,152 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.app.database import Base
+from backend.app.events import LEAD_UPDATES_STREAM, decode_event
+from backend.app.models import Lead
+from backend.app.score_cache import content_hash
+from backend.scorer import FALLBACK_SCORE
+from worker import tasks
+from worker import rescore as rescore_module
+from worker.rescore import RescoreCheckpoint, is_current, rescore
+
+
+class StubScorer:
+    """TieredScorer stand-in answering from a subject -> (score, stage) table."""
+
+    def __init__(self, answers: dict, model="gpt-4o-mini", prompt_version="v2", on_score=None):
+        self.scorer = SimpleNamespace(model=model, prompt_version=prompt_version, prompt="Classify.",
+                                      usage={"prompt_tokens": 0, "completion_tokens": 0})
+        self.answers = answers
+        self.on_score = on_score
+        self.scored = []
+        self.loops = set()
+
+    async def score_many(self, emails, pack_size=1, return_exceptions=False):
+        self.loops.add(asyncio.get_running_loop())
+        self.scored.extend(e["subject"] for e in emails)
+        self.scorer.usage["prompt_tokens"] += 1000 * len(emails)
+        if self.on_score:
+            self.on_score(emails)
+        return [self.answers[e["subject"]] for e in emails]
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine)
+
+
+def add_leads(session_factory, *leads, body="Can we get a quote?"):
+    rows = []
+    for n, (stage, score, prompt_version) in enumerate(leads, start=1):
+        subject = f"Lead {n}"
+        rows.append({"email_id": f"e{n}", "sender": f"a{n}@acme.com", "subject": subject, "body": body,
+                     "score": score, "stage": stage, "version": 1, "score_model": "gpt-4o-mini",
+                     "score_prompt_version": prompt_version, "content_hash": content_hash(subject, body)})
+    with session_factory() as db:
+        db.execute(insert(Lead), rows)
+        db.commit()
+
+
+def stored(session_factory):
+    with session_factory() as db:
+        return {row.subject: row for row in db.execute(select(Lead.__table__).order_by(Lead.id))}
+
+
+def test_rescores_stale_leads_and_publishes_only_changes(session_factory, tmp_path):
+    add_leads(session_factory,
+              ("NEW", 0.2, "v1"),        # Lead 1: becomes QUALIFIED
+              ("QUALIFIED", 0.6, "v1"),  # Lead 2: same answer
+              ("WON", 0.6, "v1"),        # Lead 3: moved by hand, keeps its stage
+              ("NEW", 0.2, "v2"),        # Lead 4: already scored by this prompt
+              ("NEW", 0.2, "v1"))        # Lead 5: changed by someone else while scoring
+
+    def concurrent_edit(emails):
+        if emails[-1]["subject"] != "Lead 5":
+            return
+        with session_factory() as db:
+            db.execute(update(Lead).where(Lead.subject == "Lead 5").values(stage="CONTACTED", version=2))
+            db.commit()
+
+    scorer = StubScorer({"Lead 1": (0.9, "QUALIFIED"), "Lead 2": (0.6, "QUALIFIED"), "Lead 3": (0.2, "NEW"),
+                         "Lead 5": (0.9, "QUALIFIED")}, on_score=concurrent_edit)
+    client = fakeredis.FakeRedis()
+    result = rescore(RescoreCheckpoint(str(tmp_path / "cp.json")), chunk_size=2, scorer=scorer,
+                     session_factory=session_factory, redis_client=client)
+
+    assert scorer.scored == ["Lead 1", "Lead 2", "Lead 3", "Lead 5"]
+    assert len(scorer.loops) == 1  # every chunk on the run's one event loop
+    assert (result["status"], result["current"], result["changed"], result["unchanged"], result["conflict"]) == \
+        ("finished", 1, 2, 1, 1)
+    leads = stored(session_factory)
+    assert (leads["Lead 1"].score, leads["Lead 1"].stage, leads["Lead 1"].version) == (0.9, "QUALIFIED", 2)
+    assert (leads["Lead 2"].score_prompt_version, leads["Lead 2"].version) == ("v2", 1)
+    assert (leads["Lead 3"].score, leads["Lead 3"].stage) == (0.2, "WON")
+    assert (leads["Lead 5"].stage, leads["Lead 5"].score_prompt_version) == ("CONTACTED", "v1")
+
+    events = [json.loads(decode_event(fields)) for _, fields in client.xrange(LEAD_UPDATES_STREAM)]
+    assert events == [{"id": 1, "version": 2, "score": 0.9, "stage": "QUALIFIED"}, {"id": 3, "version": 2, "score": 0.2}]
+    assert client.zscore("board:score:QUALIFIED", "000000000001") == 0.9
+    assert client.zscore("board:score:NEW", "000000000001") is None
+
+
+def test_budget_stops_between_chunks_and_the_next_run_resumes(session_factory, tmp_path, monkeypatch):
+    monkeypatch.setattr(rescore_module, "OPENAI_PROMPT_COST_PER_1K", 1.0)
+    monkeypatch.setattr(rescore_module, "OPENAI_COMPLETION_COST_PER_1K", 0.0)
+    # ~1000 prompt tokens each, as the stub reports
+    add_leads(session_factory, *[("NEW", 0.2, "v1")] * 5, body="x" * 3960)
+    checkpoint = RescoreCheckpoint(str(tmp_path / "cp.json"))
+    scorer = StubScorer({f"Lead {n}": (0.9, "QUALIFIED") for n in range(1, 6)})
+
+    dry = rescore(checkpoint, chunk_size=2, dry_run=True, scorer=scorer, session_factory=session_factory)
+    assert (dry["stale"], scorer.scored) == (5, [])
+
+    # The second chunk only fits one of its two leads
+    first = rescore(checkpoint, chunk_size=2, budget_usd=3.5, scorer=scorer,
+                    session_factory=session_factory, redis_client=fakeredis.FakeRedis())
+    assert (first["status"], first["changed"], first["cost_usd"], first["after_id"]) == ("budget_exhausted", 3, 3.0, 3)
+
+    stuck = rescore(checkpoint, chunk_size=2, budget_usd=3.5, scorer=scorer,
+                    session_factory=session_factory, redis_client=fakeredis.FakeRedis())
+    assert (stuck["status"], stuck["changed"], stuck["after_id"]) == ("budget_exhausted", 3, 3)
+
+    second = rescore(checkpoint, chunk_size=2, budget_usd=10, scorer=scorer,
+                     session_factory=session_factory, redis_client=fakeredis.FakeRedis())
+    assert (second["status"], second["changed"], second["cost_usd"]) == ("finished", 5, 5.0)
+    assert scorer.scored == [f"Lead {n}" for n in range(1, 6)]
+
+    # A finished target starts over, finds nothing stale and keeps the spend
+    third = rescore(checkpoint, chunk_size=2, budget_usd=10, scorer=scorer,
+                    session_factory=session_factory, redis_client=fakeredis.FakeRedis())
+    assert (third["current"], third["changed"], third["cost_usd"]) == (5, 0, 5.0)
+    assert len(scorer.scored) == 5
+
+
+def test_fallback_scored_lead_is_picked_up_by_the_next_rescore(session_factory, tmp_path):
+    add_leads(session_factory, ("NEW", 0.2, "v1"))
+    email = {"email_id": "e2", "sender": "b@acme.com", "subject": "Lead 2", "body": "Can we get a quote?"}
+    scorer = StubScorer({"Lead 2": (0.9, "QUALIFIED")}, prompt_version="v1")
+    # What the worker stores when the LLM failed and the scorer answered its fallback
+    values = tasks.score_provenance(email, FALLBACK_SCORE)
+    assert values == {"score_model": None, "score_prompt_version": None, "content_hash": None}
+    with session_factory() as db:
+        db.execute(insert(Lead), [{**email, "score": 0.0, "stage": "NEW", "version": 1, **values}])
+        db.commit()
+    assert not is_current(scorer.scorer, {**email, **values})
+
+    result = rescore(RescoreCheckpoint(str(tmp_path / "cp.json")), scorer=scorer,
+                     session_factory=session_factory, redis_client=fakeredis.FakeRedis())
+
+    assert scorer.scored == ["Lead 2"]
+    assert (result["current"], result["changed"]) == (1, 1)
+    lead = stored(session_factory)["Lead 2"]
+    assert (lead.score, lead.stage, lead.score_prompt_version) == (0.9, "QUALIFIED", "v1")